@@ -2,8 +2,9 @@
 
 #include <Arduino.h>
 
+#include "decoder.h"
+
 // #define DEBUG
-// #define VERBOSE_DEBUG
 // #define READONLY
 
 
@@ -24,19 +25,33 @@ namespace configs {
   /// @brief The pin to which the audio gate control is connected
   inline constexpr uint8_t gateControlPin = 2;
 
-  /// @brief The threshold at which a change in "digital" signal level is
-  /// detected
-  inline constexpr uint16_t levelChangeThreshold = 100;
-
-  /// @brief The byte (bit sequence: 10110010) which, when received, indicates
-  /// that the next byte received will be the channel
-  inline constexpr byte preamble = 178;
-
   /// @brief The duration of digital signal pulses in milliseconds
   inline constexpr uint32_t pulseWidthMillis = 5;
 
   /// @brief The pin on which the incoming LiFi signal is sampled
   inline constexpr uint8_t receivePin = A0;
+
+  /// @brief The interval at which the sampling timer interrupt fires, in
+  /// microseconds
+  inline constexpr uint32_t samplePeriodMicros =
+    pulseWidthMillis * 1000UL / decoding::samplesPerBit;
+
+  /// @brief The number of readings the sample ring buffer holds (a power of
+  /// two, so indices wrap with a mask)
+  inline constexpr uint8_t sampleBufferSize = 64;
+}
+
+/// @brief Ring buffer of readings filled by the sampling timer interrupt and
+/// drained by the main loop
+namespace samples {
+  /// @brief The readings in the ring buffer
+  extern volatile uint16_t buffer[configs::sampleBufferSize];
+
+  /// @brief The index at which the interrupt writes the next reading
+  extern volatile uint8_t head;
+
+  /// @brief The index from which the main loop reads the next reading
+  extern volatile uint8_t tail;
 }
 
 /**
@@ -46,15 +61,10 @@ namespace configs {
 void setup();
 
 /**
- * @brief Blocks until the preamble is detected
+ * @brief Decode all readings waiting in the sample ring buffer, updating the
+ * transmission channel and audio gate whenever a channel is received
  */
-void awaitPreamble();
-
-/**
- * @brief Read the next byte transmitted representing the incoming channel
- * @return The channel on which incoming audio will be transmitted
- */
-byte getTransmissionChannel();
+void decodeSamples();
 
 /**
  * @brief Increment the channel on which audio is being received and toggle
@@ -62,43 +72,6 @@ byte getTransmissionChannel();
  */
 void incrementChannel();
 
-/**
- * @brief Shift the next bit received into the end of the given byte
- * @param receivedByte The byte tinto which the received bit will be shifted
- * @return The byte with the next bit shifted into it
- */
-inline byte readBitIntoByte(byte receivedByte) {
-  static uint16_t currentReading;
-  static bool previousBit = 0;
-  static uint16_t previousReading = 0;
-
-  delay(configs::pulseWidthMillis);
-  currentReading = analogRead(configs::receivePin);
-  receivedByte <<= 1;
-  if (
-    (previousBit &&
-      (currentReading > (previousReading - configs::levelChangeThreshold))) // Signal stayed HIGH
-    ||
-    (!previousBit &&
-      (currentReading >= (previousReading + configs::levelChangeThreshold))) // Signal became HIGH
-  ) {
-    receivedByte |= 1;
-    previousBit = 1;
-  }
-  else previousBit = 0; // Signal is LOW
-  previousReading = currentReading;
-
-#ifdef VERBOSE_DEBUG
-    char outString[7];
-    sprintf(outString, "%i %i %i", currentReading, previousBit, receivedByte);
-    Serial.println(outString);
-#endif
-
-  return receivedByte;
-}
-
-
-
 /**
  * @brief Read a number of samples from the analog pin at a given interval
  * before sending them over serial, continues forever
@@ -108,6 +81,12 @@ inline byte readBitIntoByte(byte receivedByte) {
  */
 void readContinual(uint32_t delayMillis, uint64_t sampleSize);
 
+/**
+ * @brief Configure a timer to interrupt every samplePeriodMicros and the ADC
+ * to convert the receive pin's signal, to fill the sample ring buffer
+ */
+void startSampling();
+
 /**
  * @brief Toggle the audio gate control pin
  */
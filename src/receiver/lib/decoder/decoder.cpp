@@ -0,0 +1,107 @@
+#include "decoder.h"
+
+
+namespace decoding {
+  bool ChannelDecoder::pushSample(uint16_t reading, uint8_t &channel) {
+    if (samplesSinceEdge < UINT16_MAX) samplesSinceEdge++;
+
+    // Realign the bit clock to the transmitter's bit boundary on every edge,
+    // which lags the reading that detects it by about half of edgeLag
+    if (detectEdge(reading)) {
+      measurePeriod();
+      phase = (edgeLag / 2) << clockFractionBits;
+      bitSampled = false;
+      runBits = 0;
+    }
+    else {
+      phase += 1 << clockFractionBits;
+      if (phase >= period) {
+        phase -= period;
+        bitSampled = false;
+      }
+    }
+
+    // Read the bit in the middle of its period
+    if (bitSampled || phase < period / 2) return false;
+    bitSampled = true;
+    if (++runBits > maxRunBits && level) {
+      level = false; // A falling edge was missed
+      runBits = 0;
+    }
+    return pushBit(level, channel);
+  }
+
+
+  void ChannelDecoder::reset() {
+    bitsRead = 0;
+    level = false;
+    readingChannel = false;
+    runBits = 0;
+    window = 0;
+  }
+
+
+  bool ChannelDecoder::detectEdge(uint16_t reading) {
+    for (uint8_t i = 0; i < edgeLag; i++) {
+      readings[i] = readings[i + 1];
+    }
+    readings[edgeLag] = reading;
+    if (readingsSeen <= edgeLag) {
+      readingsSeen++;
+      return false;
+    }
+    if (edgeHoldoff) {
+      edgeHoldoff--;
+      return false;
+    }
+
+    int32_t change = static_cast<int32_t>(reading) - readings[0];
+    if (!level && change >= levelChangeThreshold) {
+      level = true; // Signal became HIGH
+    }
+    else if (level && change <= -static_cast<int32_t>(levelChangeThreshold)) {
+      level = false; // Signal became LOW
+    }
+    else return false;
+
+    // A signal rising or falling over several samples is a single edge
+    edgeHoldoff = samplesPerBit / 2;
+    return true;
+  }
+
+
+  void ChannelDecoder::measurePeriod() {
+    uint32_t interval = static_cast<uint32_t>(samplesSinceEdge) << clockFractionBits;
+    samplesSinceEdge = 0;
+    uint32_t bits = (interval + period / 2) / period;
+    if (bits < 1 || bits > maxRunBits) return; // Not within a transmission
+
+    // Move a quarter of the way towards the measured period
+    int32_t measured = static_cast<int32_t>(interval / bits);
+    int32_t adjusted = period + (measured - static_cast<int32_t>(period)) / 4;
+    if (adjusted < nominalPeriod - maxPeriodDeviation) {
+      adjusted = nominalPeriod - maxPeriodDeviation;
+    }
+    else if (adjusted > nominalPeriod + maxPeriodDeviation) {
+      adjusted = nominalPeriod + maxPeriodDeviation;
+    }
+    period = static_cast<uint16_t>(adjusted);
+  }
+
+
+  bool ChannelDecoder::pushBit(bool bit, uint8_t &channel) {
+    window = static_cast<uint8_t>((window << 1) | bit);
+    if (!readingChannel) {
+      if (window == preamble) {
+        readingChannel = true;
+        bitsRead = 0;
+      }
+      return false;
+    }
+    if (++bitsRead < 8) return false;
+
+    channel = window;
+    reset(); // The transmitter returns the signal LOW after the channel
+    return true;
+  }
+}
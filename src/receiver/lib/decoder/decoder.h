@@ -0,0 +1,99 @@
+#pragma once
+
+#include <stdint.h>
+
+/// @brief Platform-independent decoding of channel codes from oversampled
+/// LiFi signal readings, shared by the firmware and the native test build
+namespace decoding {
+  /// @brief The number of samples between which a change in reading is
+  /// measured to detect an edge
+  inline constexpr uint8_t edgeLag = 2;
+
+  /// @brief The threshold at which a change in "digital" signal level is
+  /// detected
+  inline constexpr uint16_t levelChangeThreshold = 100;
+
+  /// @brief The number of consecutive bits at one level after which the
+  /// level is assumed to have been misread and is reset to LOW, longer than
+  /// any run in a preamble and channel
+  inline constexpr uint8_t maxRunBits = 12;
+
+  /// @brief The byte (bit sequence: 10110010) which, when received, indicates
+  /// that the next byte received will be the channel
+  inline constexpr uint8_t preamble = 178;
+
+  /// @brief The number of samples taken per transmitted bit
+  inline constexpr uint8_t samplesPerBit = 8;
+
+  /// @brief The number of fractional bits in fixed-point clock values
+  inline constexpr uint8_t clockFractionBits = 4;
+
+  /// @brief The nominal bit period in fixed-point samples
+  inline constexpr uint16_t nominalPeriod = samplesPerBit << clockFractionBits;
+
+  /// @brief The largest deviation of the recovered bit period from nominal,
+  /// as a fraction of nominal
+  inline constexpr uint16_t maxPeriodDeviation = nominalPeriod / 4;
+
+  /**
+   * @brief Decodes channel codes from a stream of oversampled readings,
+   * recovering the transmitter's bit clock from signal edges and matching
+   * the preamble over a sliding window of bits
+   *
+   * Each edge realigns the bit clock's phase, and the interval between
+   * edges refines its period, so bits are read mid-period even when the
+   * transmitter's clock runs fast or slow.
+   */
+  class ChannelDecoder {
+  public:
+    /**
+     * @brief Push the next reading through the decoder
+     * @param reading The next analog reading of the incoming signal
+     * @param channel Set to the decoded channel when one is completed
+     * @return Whether a channel was completed by this reading
+     */
+    bool pushSample(uint16_t reading, uint8_t &channel);
+
+    /**
+     * @brief Reset the decoder to await the next preamble with the signal
+     * assumed LOW
+     */
+    void reset();
+
+  private:
+    /**
+     * @brief Detect an edge between the newest reading and the reading
+     * edgeLag samples before it, updating the signal level
+     * @param reading The newest reading
+     * @return Whether an edge was detected
+     */
+    bool detectEdge(uint16_t reading);
+
+    /**
+     * @brief Refine the recovered bit period from the interval since the
+     * previous edge
+     */
+    void measurePeriod();
+
+    /**
+     * @brief Shift a recovered bit into the preamble window or channel
+     * @param bit The recovered bit
+     * @param channel Set to the decoded channel when one is completed
+     * @return Whether a channel was completed by this bit
+     */
+    bool pushBit(bool bit, uint8_t &channel);
+
+    bool bitSampled = false;
+    uint8_t bitsRead = 0;
+    uint8_t edgeHoldoff = 0;
+    bool level = false;
+    uint16_t period = nominalPeriod;
+    uint16_t phase = 0;
+    bool readingChannel = false;
+    uint16_t readings[edgeLag + 1] = {};
+    uint8_t readingsSeen = 0;
+    uint8_t runBits = 0;
+    uint16_t samplesSinceEdge = 0;
+    uint8_t window = 0;
+  };
+}
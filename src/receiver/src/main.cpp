@@ -4,6 +4,10 @@
 uint8_t channels::receiver = 1;
 uint8_t channels::transmitter = 9;
 
+volatile uint16_t samples::buffer[configs::sampleBufferSize];
+volatile uint8_t samples::head = 0;
+volatile uint8_t samples::tail = 0;
+
 
 void setup() {
   pinMode(configs::gateControlPin, OUTPUT);
@@ -17,37 +21,36 @@ void setup() {
     FALLING
   );
 
-#if defined(DEBUG) || defined(READONLY) || defined(VERBOSE_DEBUG)
+#if defined(DEBUG) || defined(READONLY)
   Serial.begin(9600);
   Serial.print("Receiver initialized on channel: ");
   Serial.println(channels::receiver);
 #endif
-}
-
 
-void awaitPreamble() {
-  byte samplePreamble = 0;
-  while (samplePreamble != configs::preamble) {
-    samplePreamble = readBitIntoByte(samplePreamble);
-  }
+#ifndef READONLY
+  startSampling();
+#endif
 }
 
 
-byte getTransmissionChannel() {
-  constexpr uint8_t firstBitPosition = 0;
-  constexpr uint8_t lastBitPosition = 7;
+void decodeSamples() {
+  static decoding::ChannelDecoder decoder;
+  constexpr uint8_t indexMask = configs::sampleBufferSize - 1;
 
-  byte channel = 0;
-  for (int i = firstBitPosition; i <= lastBitPosition; i++) {
-    channel = readBitIntoByte(channel);
-  }
+  uint8_t channel;
+  while (samples::tail != samples::head) {
+    uint16_t reading = samples::buffer[samples::tail];
+    samples::tail = (samples::tail + 1) & indexMask;
+    if (!decoder.pushSample(reading, channel)) continue;
 
 #ifdef DEBUG
-  Serial.print("Transmission channel: ");
-  Serial.println(channel);
+    Serial.print("Transmission channel: ");
+    Serial.println(channel);
 #endif
 
-  return channel;
+    channels::transmitter = channel;
+    toggleAudio();
+  }
 }
 
 
@@ -83,6 +86,45 @@ void readContinual(uint32_t delayMillis, uint64_t sampleSize) {
 }
 
 
+void startSampling() {
+#ifndef __AVR__
+#error "The sampling timer is only implemented for AVR MCUs"
+#endif
+  constexpr uint32_t timerTicksPerMicro = F_CPU / 8UL / 1000000UL;
+
+  // Let the core select the receive pin's ADC channel and reference, then
+  // start the first conversion for the interrupt to collect
+  analogRead(configs::receivePin);
+  ADCSRA |= _BV(ADSC);
+
+  // Timer 1 in CTC mode with a prescaler of 8
+  noInterrupts();
+  TCCR1A = 0;
+  TCCR1B = _BV(WGM12) | _BV(CS11);
+  TCNT1 = 0;
+  OCR1A = timerTicksPerMicro * configs::samplePeriodMicros - 1;
+  TIMSK1 |= _BV(OCIE1A);
+  interrupts();
+}
+
+
+/**
+ * @brief Sampling timer interrupt, which collects the ADC's latest
+ * conversion into the sample ring buffer and starts the next
+ */
+ISR(TIMER1_COMPA_vect) {
+  constexpr uint8_t indexMask = configs::sampleBufferSize - 1;
+
+  uint16_t reading = ADC;
+  ADCSRA |= _BV(ADSC);
+  uint8_t nextHead = (samples::head + 1) & indexMask;
+  if (nextHead != samples::tail) { // Drop the reading if the buffer is full
+    samples::buffer[samples::head] = reading;
+    samples::head = nextHead;
+  }
+}
+
+
 void toggleAudio() {
   if (channels::transmitter != channels::receiver && channels::transmitter > 0) {
     digitalWrite(configs::gateControlPin, LOW); // Close the audio gate
@@ -98,7 +140,5 @@ void loop() {
   readContinual(configs::pulseWidthMillis, 1000);
 #endif
 
-  awaitPreamble();
-  channels::transmitter = getTransmissionChannel();
-  toggleAudio();
-}
\ No newline at end of file
+  decodeSamples();
+}
@@ -0,0 +1,25 @@
+#include <cstdio>
+
+#include "decoder.h"
+
+
+/**
+ * @brief Entry point of the native build, which replays readings given as
+ * whitespace-separated integers on stdin through the channel decoder and
+ * prints the index of the reading completing each channel and the channel
+ * @return The exit status
+ */
+int main() {
+  decoding::ChannelDecoder decoder;
+  unsigned long reading = 0;
+  unsigned long index = 0;
+  uint8_t channel = 0;
+
+  while (std::scanf("%lu", &reading) == 1) {
+    if (decoder.pushSample(static_cast<uint16_t>(reading), channel)) {
+      std::printf("%lu %u\n", index, channel);
+    }
+    index++;
+  }
+  return 0;
+}
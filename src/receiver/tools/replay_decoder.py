@@ -0,0 +1,212 @@
+""" A harness which builds the receiver's decoding logic for the host and
+    replays captured or synthetic signal traces through it, reporting decode
+    rate and timing tolerance
+
+Run from anywhere with `python tools/replay_decoder.py`. The native build
+uses PlatformIO's `native` environment if `pio` is installed, otherwise the
+host C++ compiler directly.
+
+Exports
+-------
+build_decoder: Build the native decoder program
+load_capture: Load a trace captured by the receiver's READONLY mode
+replay: Replay readings through the native decoder program
+synthesize_trace: Generate the readings of a channel transmission
+"""
+
+
+from argparse import ArgumentParser
+from math import pi, sin
+from os import environ
+from pathlib import Path
+from random import Random
+from shutil import which
+from subprocess import run
+from tempfile import mkdtemp
+
+
+RECEIVER_DIR = Path(__file__).resolve().parent.parent
+SAMPLES_PER_BIT = 8  # Must match decoding::samplesPerBit
+PREAMBLE = 178  # Must match decoding::preamble
+
+
+def build_decoder() -> Path:
+    """Build the native decoder program
+
+    Returns
+    -------
+    The path of the built program
+
+    Raises
+    ------
+    CalledProcessError: If the build fails
+    """
+    if which("pio"):
+        run(["pio", "run", "-e", "native", "-d", str(RECEIVER_DIR)], check=True)
+        return RECEIVER_DIR / ".pio" / "build" / "native" / "program"
+    program = Path(mkdtemp()) / "decoder"
+    run(
+        [
+            environ.get("CXX", "c++"), "-std=gnu++17", "-O2",
+            "-I", str(RECEIVER_DIR / "lib" / "decoder"),
+            str(RECEIVER_DIR / "lib" / "decoder" / "decoder.cpp"),
+            str(RECEIVER_DIR / "src" / "native_main.cpp"),
+            "-o", str(program)
+        ],
+        check=True
+    )
+    return program
+
+
+def load_capture(path: str, capture_period_ms: float, pulse_width_ms: float = 5) -> list[int]:
+    """Load a trace captured by the receiver's READONLY mode, holding each
+    reading to resample it to the decoder's sample period
+
+    Parameters
+    ----------
+    path: The path of the capture, with one reading per line
+    capture_period_ms: The interval between captured readings in ms
+    pulse_width_ms (Optional): The transmitter's pulse width in ms
+
+    Returns
+    -------
+    The resampled readings
+    """
+    sample_period_ms = pulse_width_ms / SAMPLES_PER_BIT
+    with open(path, encoding="utf-8") as capture:
+        captured = [int(line) for line in capture if line.strip().isdigit()]
+    count = int(len(captured) * capture_period_ms / sample_period_ms)
+    return [
+        captured[min(int(i * sample_period_ms / capture_period_ms), len(captured) - 1)]
+        for i in range(count)
+    ]
+
+
+def replay(program: Path, readings: list[int]) -> list[tuple[int, int]]:
+    """Replay readings through the native decoder program
+
+    Parameters
+    ----------
+    program: The path of the native decoder program
+    readings: The readings to replay
+
+    Returns
+    -------
+    A list of tuples of the index of the reading completing each channel and
+    the channel
+    """
+    result = run(
+        [str(program)],
+        input=" ".join(map(str, readings)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return [
+        (int(index), int(channel))
+        for index, channel in (line.split() for line in result.stdout.splitlines())
+    ]
+
+
+def synthesize_trace(
+    channel: int,
+    random: Random,
+    bit_skew: float = 0.0,
+    phase_offset: float = 0.0,
+    step: int = 250,
+    rise_samples: float = 1.0,
+    audio_amplitude: int = 40,
+    noise: int = 8
+) -> list[int]:
+    """Generate the readings of a channel transmission over speech-band audio
+
+    Parameters
+    ----------
+    channel: The channel transmitted
+    random: The random number generator for audio and noise
+    bit_skew (Optional): The fraction by which the transmitter's bit period
+        differs from the receiver's
+    phase_offset (Optional): The fraction of a bit period by which the
+        transmission is offset from the receiver's sample clock
+    step (Optional): The change in reading caused by the signal going HIGH
+    rise_samples (Optional): The time constant of the circuit's response to
+        a level change, in samples
+    audio_amplitude (Optional): The amplitude of the audio on the signal
+    noise (Optional): The amplitude of random noise on the readings
+
+    Returns
+    -------
+    The readings
+    """
+    bits = [(PREAMBLE >> i) & 1 for i in range(7, -1, -1)]
+    bits += [(channel >> i) & 1 for i in range(7, -1, -1)]
+    bit_length = SAMPLES_PER_BIT * (1 + bit_skew)
+    lead = random.randint(4, 12) * SAMPLES_PER_BIT + phase_offset * SAMPLES_PER_BIT
+    total = int(lead + bit_length * (len(bits) + 6))
+    frequencies = [random.uniform(5, 40) for _ in range(3)]  # Cycles per bit
+    phases = [random.uniform(0, 2 * pi) for _ in frequencies]
+    readings = []
+    level = 0.0
+    for i in range(total):
+        position = (i - lead) / bit_length
+        target = bits[int(position)] if 0 <= position < len(bits) else 0
+        level += (target - level) / max(rise_samples, 1)
+        audio = sum(
+            sin(2 * pi * frequency * i / SAMPLES_PER_BIT + phase)
+            for frequency, phase in zip(frequencies, phases)
+        ) * audio_amplitude / len(frequencies)
+        reading = 400 + step * level + audio + random.uniform(-noise, noise)
+        readings.append(max(0, min(1023, int(reading))))
+    return readings
+
+
+def sweep(program: Path, trials: int, seed: int) -> None:
+    """Print decode rates over ranges of bit period skew and phase offset
+
+    Parameters
+    ----------
+    program: The path of the native decoder program
+    trials: The number of transmissions per setting
+    seed: The seed for the random number generator
+    """
+    random = Random(seed)
+    skews = [-0.2, -0.15, -0.1, -0.05, 0.0, 0.05, 0.1, 0.15, 0.2]
+    offsets = [0.0, 0.25, 0.5, 0.75]
+    print("skew   " + "".join(f"phase {offset:<6}" for offset in offsets))
+    tolerated = []
+    for skew in skews:
+        rates = []
+        for offset in offsets:
+            decoded = 0
+            for _ in range(trials):
+                channel = random.randint(0, 9)
+                results = replay(program, synthesize_trace(channel, random, skew, offset))
+                decoded += [found for _, found in results] == [channel]
+            rates.append(decoded / trials)
+        print(f"{skew:+.2f}  " + "".join(f"{rate:<12.0%}" for rate in rates))
+        if min(rates) >= 0.95:
+            tolerated.append(skew)
+    if tolerated:
+        print(
+            f"Decode rate >= 95% at every phase for bit period skew",
+            f"{min(tolerated):+.0%} to {max(tolerated):+.0%}"
+        )
+    else:
+        print("Decode rate < 95% at every tested skew")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--capture", help="A trace captured in READONLY mode to replay")
+    parser.add_argument("--capture-period-ms", type=float, default=5)
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    decoder_program = build_decoder()
+    if args.capture:
+        for index, channel in replay(
+            decoder_program, load_capture(args.capture, args.capture_period_ms)
+        ):
+            print(f"Channel {channel} decoded at reading {index}")
+    else:
+        sweep(decoder_program, args.trials, args.seed)
@@ -2,19 +2,27 @@
 
 Modules
 -------
-interface: Interface for a client that can communicate over multiple ports
-    asynchronously
+interface: Interfaces for a client that can communicate over multiple ports
+    asynchronously, and for leasing its ports
 mass_serial_client: A serial client that can communicate over multiple
     ports asynchronously
+socket_mass_client: A socket client that can communicate with multiple
+    network-bridged transmitters asynchronously
 
 Exports
 -------
 Classes:
     AsyncMassClient: Interface for a client that can communicate over multiple
         ports asynchronously
+    BridgeSocket: A persistent TCP connection to a network bridge node
+    ILeaseClient: Interface for a client leasing ports from an authority
+        shared with other servers
     MassSerialClient: A serial client that can communicate over multiple ports
         asynchronously
+    SocketMassClient: A socket client that can communicate with multiple
+        network-bridged transmitters asynchronously
 """
 
-from .interface import IAsyncMassClient
+from .interface import IAsyncMassClient, ILeaseClient
 from .serial_mass_client import SerialMassClient
+from .socket_mass_client import BridgeSocket, SocketMassClient
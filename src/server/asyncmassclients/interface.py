@@ -1,15 +1,18 @@
-""" Interface for a client that can communicate over multiple
-    ports asynchronously
+""" Interfaces for a client that can communicate over multiple
+    ports asynchronously, and for leasing its ports
 
 Exports
 -------
 AsyncMassClient: Interface for a client that can communicate over multiple
     ports asynchronously
+ILeaseClient: Interface for a client leasing ports from an authority shared
+    with other servers
 """
 
 from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
 from multiprocessing.pool import AsyncResult
-from typing import Any
+from typing import Any, Callable
 
 
 class IAsyncMassClient(ABC):
@@ -18,6 +21,7 @@ class IAsyncMassClient(ABC):
 
     Attributes
     ----------
+    health: A dictionary mapping available port names to their health
     ports: A dictionary of available ports mapping port names to port objects
 
     Abstract Methods
@@ -28,7 +32,9 @@ class IAsyncMassClient(ABC):
     mass_open: Open multiple ports
     mass_read: Read from multiple ports
     mass_write: Write to multiple ports
+    mass_write_each: Write a different message to each of multiple ports
     open: Open a port
+    pause_heartbeat: Pause background health checks of ports
     read: Read from a port
     write: Write to a port
     """
@@ -43,6 +49,14 @@ class IAsyncMassClient(ABC):
             for creating all new clients
         """
 
+    @property
+    @abstractmethod
+    def health(self) -> dict[str, dict[str, Any]]:
+        """A dictionary mapping available port names to their health: whether
+        the port is healthy, its smoothed round-trip time in seconds (or None
+        if unmeasured), and its number of consecutive failed health checks
+        """
+
     @property
     @abstractmethod
     def ports(self) -> dict[str, Any]:
@@ -128,7 +142,8 @@ class IAsyncMassClient(ABC):
     def mass_write(
         self,
         message: bytes,
-        ports: list[Any] | None = None
+        ports: list[Any] | None = None,
+        reset_input: bool = False
     ) -> list[tuple[str, AsyncResult]]:
         """Write to multiple ports asynchronously
 
@@ -137,6 +152,8 @@ class IAsyncMassClient(ABC):
         message: The bytes to write to each port
         ports (Optional): The list of port objects to write to, or None to
             write to all
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
 
         Returns
         -------
@@ -144,6 +161,28 @@ class IAsyncMassClient(ABC):
         number of bytes written
         """
 
+    @abstractmethod
+    def mass_write_each(
+        self,
+        messages: dict[str, bytes],
+        reset_input: bool = False
+    ) -> list[tuple[str, AsyncResult]]:
+        """Write a different message to each of multiple ports
+        asynchronously, in a single batch
+
+        Parameters
+        ----------
+        messages: A dictionary mapping the names of the ports to write to to
+            the bytes to write to each
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
+
+        Returns
+        -------
+        A list of tuples containing the port name and the async result of
+        number of bytes written, for each port which is available
+        """
+
     @abstractmethod
     def open(self, port_name: str) -> Any | None:
         """Open a port
@@ -157,6 +196,17 @@ class IAsyncMassClient(ABC):
         The port object if it was able to be opened, otherwise None
         """
 
+    @abstractmethod
+    def pause_heartbeat(self) -> AbstractContextManager:
+        """Pause background health checks of ports, so that they do not
+        interleave with other traffic
+
+        Returns
+        -------
+        A context manager holding the health checks paused, entered once any
+        health check in flight has finished
+        """
+
     @abstractmethod
     def read(self, port: Any, num_bytes: int = 0) -> bytes | None:
         """Read from a port
@@ -172,15 +222,59 @@ class IAsyncMassClient(ABC):
         """
 
     @abstractmethod
-    def write(self, port: Any, message: bytes) -> int | None:
+    def write(
+        self,
+        port: Any,
+        message: bytes,
+        reset_input: bool = False
+    ) -> int | None:
         """Write to a port
 
         Parameters
         ----------
         port: The port object to write to
         message: The bytes to write
+        reset_input (Optional): Whether to discard unread input from the port
+            first, so stale replies are not read as replies to this write
 
         Returns
         -------
         The number of bytes written if successful, otherwise None
         """
+
+
+class ILeaseClient(ABC):
+    """Interface for a client leasing ports from an authority shared with
+    other servers, so that servers never contend for a port
+
+    Abstract Methods
+    -------
+    acquire: Acquire a lease on a resource
+    release: Release a lease on a resource
+    """
+
+    @abstractmethod
+    def acquire(
+        self, resource: str, on_lost: Callable[[str], None] | None = None
+    ) -> bool:
+        """Acquire a lease on a resource, holding it until released
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        on_lost (Optional): Called with the resource's name if the lease is
+            lost to another server
+
+        Returns
+        -------
+        Whether the lease was acquired
+        """
+
+    @abstractmethod
+    def release(self, resource: str) -> None:
+        """Release a lease on a resource
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        """
@@ -6,21 +6,40 @@ MassSerialClient: A serial client that can communicate over multiple ports
     asynchronously
 """
 
+from contextlib import contextmanager
 from inspect import signature
 from multiprocessing.pool import AsyncResult, ThreadPool
-from time import sleep
+from random import randint
+from threading import Lock, RLock, Thread
+from time import monotonic, perf_counter, sleep
+from typing import Any, Iterator
 
 from serial import Serial, SerialBase, SerialException, SerialTimeoutException  # type: ignore[import-untyped]
 from serial.tools.list_ports import comports  # type: ignore[import-untyped]
 
-from .interface import IAsyncMassClient
+from tracer import TRACER
+
+from .interface import IAsyncMassClient, ILeaseClient
 
 
 class SerialMassClient(IAsyncMassClient):
     """A serial client that can communicate over multiple ports asynchronously
 
+    If a heartbeat interval is given, a background thread pings each idle
+    port in turn with a non-digit byte, which transmitters echo XOR'd without
+    transmitting it, tracking a smoothed round-trip time. Ports which miss
+    several pings in a row are quarantined as unhealthy until they answer
+    again, and ports which raise errors are closed. The echo of a missed ping
+    may still arrive later, so it is discarded if it is the next byte read.
+
+    If a lease client, such as a coordination client, is given, a port is
+    only opened once this server holds its lease, so servers sharing a
+    machine never contend for a port, and a port whose lease is lost to
+    another server is closed.
+
     Attributes
     ----------
+    health: A dictionary mapping available port names to their health
     ports: A dictionary of available ports mapping port names to port objects
 
     Methods
@@ -31,24 +50,66 @@ class SerialMassClient(IAsyncMassClient):
     mass_open: Open multiple ports
     mass_read: Read from multiple ports
     mass_write: Write to multiple ports
+    mass_write_each: Write a different message to each of multiple ports
     open: Open a port
+    pause_heartbeat: Pause background health checks of ports
     read: Read from a port
     write: Write to a port
     """
 
     def __init__(
         self,
-        template: Serial | None = None
+        template: Serial | None = None,
+        heartbeat_interval: float | None = None,
+        heartbeat_timeout: float = 0.05,
+        max_missed_heartbeats: int = 2,
+        rtt_smoothing: float = 0.25,
+        coordinator: ILeaseClient | None = None
     ) -> None:
         """Parameters
         ----------
         template (Optional): A template (ideally closed) serial port
             whose parameters will be used for opening all new ports
+        heartbeat_interval (Optional): The seconds between pings of each idle
+            port, or None to disable the heartbeat
+        heartbeat_timeout (Optional): The seconds to wait for a ping's echo,
+            which is also the longest a paused heartbeat delays other traffic
+        max_missed_heartbeats (Optional): The number of consecutive missed
+            pings after which a port is quarantined
+        rtt_smoothing (Optional): The weight of each new round-trip time in
+            its moving average
+        coordinator (Optional): The lease client, such as a coordination
+            client, through which to lease ports, or None to open any port
         """
         self.__available_ports: dict[str, Serial] = {}
         self.__constructor_parameters = signature(SerialBase).parameters
+        self.__coordinator = coordinator
+        self.__health: dict[str, dict[str, Any]] = {}
+        self.__health_lock = Lock()
+        self.__heartbeat_interval = heartbeat_interval
+        self.__heartbeat_lock = RLock()
+        self.__heartbeat_timeout = heartbeat_timeout
+        self.__last_activity: dict[str, float] = {}
+        self.__late_echoes: dict[str, bytes] = {}
+        self.__max_missed_heartbeats = max_missed_heartbeats
+        self.__rtt_smoothing = rtt_smoothing
         self.__template: Serial
         self.template = template
+        if heartbeat_interval:
+            Thread(target=self.__heartbeat, name="heartbeat", daemon=True).start()
+
+    @property
+    def health(self) -> dict[str, dict[str, Any]]:
+        """A dictionary mapping available port names to their health: whether
+        the port is healthy, its smoothed round-trip time in seconds (or None
+        if unmeasured), and its number of consecutive missed pings
+        """
+        with self.__health_lock:
+            return {
+                port_name: dict(health)
+                for port_name, health in self.__health.items()
+                if port_name in self.__available_ports
+            }
 
     @property
     def ports(self) -> dict[str, Serial]:
@@ -81,7 +142,13 @@ class SerialMassClient(IAsyncMassClient):
             port = self.__available_ports.pop(port)
         else:
             self.__available_ports.pop(port.port) # type: ignore
+        with self.__health_lock:
+            self.__health.pop(port.port, None)  # type: ignore
+        self.__last_activity.pop(port.port, None)  # type: ignore
+        self.__late_echoes.pop(port.port, None)  # type: ignore
         port.close()
+        if self.__coordinator:
+            self.__coordinator.release(f"port:{port.port}")
 
     def get_port(self, port_name: str) -> Serial | None:
         """Get a serial port by name
@@ -131,7 +198,8 @@ class SerialMassClient(IAsyncMassClient):
                     self.close(self.__available_ports[port_name])
 
         # Asynchronously attempt to open ports
-        pool = ThreadPool(processes=len(port_names))
+        with TRACER.span("ThreadPool create", "serial"):
+            pool = ThreadPool(processes=len(port_names))
         async_results: list[AsyncResult] = []
         for port_name in port_names:
             async_results.append(
@@ -141,7 +209,8 @@ class SerialMassClient(IAsyncMassClient):
                 )
             )
         pool.close()
-        pool.join()
+        with TRACER.span("ThreadPool join", "serial"):
+            pool.join()
 
         # Collect available ports
         for result in async_results:
@@ -174,7 +243,8 @@ class SerialMassClient(IAsyncMassClient):
             raise RuntimeError("No ports available")
 
         # Asynchronously read from ports
-        pool = ThreadPool(processes=len(ports))
+        with TRACER.span("ThreadPool create", "serial"):
+            pool = ThreadPool(processes=len(ports))
         async_results = []
         for port in ports:
             async_results.append(
@@ -187,13 +257,15 @@ class SerialMassClient(IAsyncMassClient):
                 )
             )
         pool.close()
-        pool.join()
+        with TRACER.span("ThreadPool join", "serial"):
+            pool.join()
         return async_results
 
     def mass_write(
         self,
         message: bytes,
-        ports: list[Serial] | None = None
+        ports: list[Serial] | None = None,
+        reset_input: bool = False
     ) -> list[tuple[str, AsyncResult]]:
         """Write to multiple ports asynchronously
 
@@ -202,19 +274,52 @@ class SerialMassClient(IAsyncMassClient):
         message: The bytes to write to each port
         ports (Optional): The list of serial ports to write to, or None to
             write to all
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
 
         Returns
         -------
         A list of tuples containing the port name and the async result of
-        number of bytes written
+        number of bytes written, for each port which is available
         """
         if not ports:
             ports = list(self.__available_ports.values())
+        return self.mass_write_each(
+            {port.port: message for port in ports},  # type: ignore
+            reset_input
+        )
+
+    def mass_write_each(
+        self,
+        messages: dict[str, bytes],
+        reset_input: bool = False
+    ) -> list[tuple[str, AsyncResult]]:
+        """Write a different message to each of multiple ports
+        asynchronously, in a single batch
+
+        Parameters
+        ----------
+        messages: A dictionary mapping the names of the ports to write to to
+            the bytes to write to each
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
+
+        Returns
+        -------
+        A list of tuples containing the port name and the async result of
+        number of bytes written, for each port which is available
+        """
+        ports = [
+            self.__available_ports[port_name]
+            for port_name in messages
+            if port_name in self.__available_ports
+        ]
         if not ports:
             raise RuntimeError("No ports available")
 
         # Asynchronously write to ports
-        pool = ThreadPool(processes=len(ports))
+        with TRACER.span("ThreadPool create", "serial"):
+            pool = ThreadPool(processes=len(ports))
         async_results = []
         for port in ports:
             async_results.append(
@@ -222,12 +327,13 @@ class SerialMassClient(IAsyncMassClient):
                     port.port,
                     pool.apply_async(
                         func=self.write,
-                        args=(port, message)
+                        args=(port, messages[port.port], reset_input)  # type: ignore
                     )
                 )
             )
         pool.close()
-        pool.join()
+        with TRACER.span("ThreadPool join", "serial"):
+            pool.join()
         return async_results
 
     def open(self, port_name: str) -> Serial | None:
@@ -241,6 +347,11 @@ class SerialMassClient(IAsyncMassClient):
         -------
         The serial port if it was opened, otherwise None
         """
+        if self.__coordinator and not self.__coordinator.acquire(
+            f"port:{port_name}", self.__lease_lost
+        ):
+            return None  # Another server owns the port
+        TRACER.begin("open %s", "serial", port_name)
         try:
             args = {}
             for key, value in self.__template.__dict__.items():
@@ -249,14 +360,36 @@ class SerialMassClient(IAsyncMassClient):
                 if key in self.__constructor_parameters and key != 'port':
                     args[key] = value
             port = Serial(port=port_name, **args)
+            with self.__health_lock:
+                self.__health[port.port] = {  # type: ignore
+                    "healthy": True, "rtt": None, "failures": 0
+                }
             self.__available_ports[port.port] = port  # type: ignore
             sleep(1)  # Wait for port to finish opening
             return port
         except (OSError, SerialException, SerialTimeoutException):
+            if self.__coordinator:
+                self.__coordinator.release(f"port:{port_name}")
             return None
+        finally:
+            TRACER.end("open %s", "serial", port_name)
+
+    @contextmanager
+    def pause_heartbeat(self) -> Iterator[None]:
+        """Pause background health checks of ports, so that they do not
+        interleave with other traffic
+
+        Returns
+        -------
+        A context manager holding the health checks paused, entered once any
+        ping in flight has finished
+        """
+        with self.__heartbeat_lock:
+            yield
 
     def read(self, port: Serial, num_bytes: int = 0) -> bytes | None:
-        """Read from a port
+        """Read from a port, discarding the late echo of a missed ping if it
+        is the first byte read
 
         Parameters
         ----------
@@ -267,30 +400,141 @@ class SerialMassClient(IAsyncMassClient):
         -------
         The bytes read if successful, otherwise None
         """
+        late_echo = self.__late_echoes.pop(port.port, None)  # type: ignore
         try:
-            if num_bytes > 0:
-                bytes_read = port.read(num_bytes)
-            else:
-                bytes_read = port.read_all()
+            with TRACER.span("read %s", "serial", port.port):
+                if num_bytes > 0:
+                    bytes_read = port.read(num_bytes)
+                    if late_echo and bytes_read[:1] == late_echo:
+                        bytes_read = bytes_read[1:] + port.read(1)
+                else:
+                    bytes_read = port.read_all()
+                    if late_echo:
+                        bytes_read = bytes_read.removeprefix(late_echo)
             return bytes_read
         except (OSError, SerialException, SerialTimeoutException):
             return None
 
-    def write(self, port: Serial, message: bytes) -> int | None:
+    def write(
+        self,
+        port: Serial,
+        message: bytes,
+        reset_input: bool = False
+    ) -> int | None:
         """Write to a port
 
         Parameters
         ----------
         port: The serial port to write to
         message: The bytes to write
+        reset_input (Optional): Whether to discard unread input from the port
+            first, so stale replies are not read as replies to this write
 
         Returns
         -------
         The number of bytes written if successful, otherwise None
         """
+        self.__last_activity[port.port] = monotonic()  # type: ignore
         try:
-            bytes_sent = port.write(message)
-            port.flush()
+            if reset_input:
+                port.reset_input_buffer()
+            with TRACER.span("write %s", "serial", port.port):
+                bytes_sent = port.write(message)
+            with TRACER.span("flush %s", "serial", port.port):
+                port.flush()
             return bytes_sent
         except (OSError, SerialException, SerialTimeoutException):
             return None
+
+    def __heartbeat(self) -> None:
+        """Ping each idle port in turn, spreading the pings over the
+        heartbeat interval
+        """
+        while True:
+            port_names = list(self.__available_ports)
+            if not port_names:
+                sleep(self.__heartbeat_interval)  # type: ignore
+                continue
+            for port_name in port_names:
+                sleep(self.__heartbeat_interval / len(port_names))  # type: ignore
+                idle_since = monotonic() - self.__heartbeat_interval  # type: ignore
+                if self.__last_activity.get(port_name, 0) > idle_since:
+                    continue  # Recent traffic shows the port is in use
+                with self.__heartbeat_lock:
+                    port = self.__available_ports.get(port_name)
+                    if port:
+                        with TRACER.span("ping %s", "serial", port_name):
+                            self.__ping(port)
+
+    def __lease_lost(self, resource: str) -> None:
+        """Close a port whose lease was lost to another server
+
+        Parameters
+        ----------
+        resource: The name of the port's lease
+        """
+        port_name = resource.removeprefix("port:")
+        with self.__heartbeat_lock:
+            if port_name in self.__available_ports:
+                self.close(port_name)
+
+    def __ping(self, port: Serial) -> None:
+        """Ping a port with a non-digit byte and update its health from the
+        echo, closing it if it raises an error
+
+        Bytes other than the echo, such as the late echo of an earlier ping,
+        are discarded, and if the echo is missed it is discarded by the next
+        read should it arrive late.
+
+        Parameters
+        ----------
+        port: The serial port to ping
+        """
+        port_name: str = port.port  # type: ignore
+        message_int = randint(58, 126)
+        expected_echo = bytes((message_int ^ 49,))
+        echoed = False
+        try:
+            port.reset_input_buffer()
+            self.__late_echoes.pop(port_name, None)
+            start_time = perf_counter()
+            port.write(bytes((message_int,)))
+            port.flush()
+            deadline = start_time + self.__heartbeat_timeout
+            while perf_counter() < deadline:
+                if port.in_waiting and port.read(1) == expected_echo:
+                    echoed = True
+                    break
+                sleep(0.001)
+            rtt = perf_counter() - start_time
+        except (OSError, SerialException, SerialTimeoutException):
+            print(
+                f"ERROR: Transmitter on port {port_name} disconnected.",
+                "Please check the connection and refresh ports.",
+                sep="\n"
+            )
+            self.close(port)
+            return
+
+        with self.__health_lock:
+            health = self.__health.get(port_name)
+            if health is None:
+                return  # Closed while pinging
+            if not echoed:
+                self.__late_echoes[port_name] = expected_echo
+                health["failures"] += 1
+                if health["healthy"] and health["failures"] >= self.__max_missed_heartbeats:
+                    health["healthy"] = False
+                    print(
+                        f"WARNING: Transmitter on port {port_name} stopped",
+                        "responding and will be skipped until it recovers"
+                    )
+                return
+            if not health["healthy"]:
+                print(f"Transmitter on port {port_name} recovered")
+            health["healthy"] = True
+            health["failures"] = 0
+            if health["rtt"] is None:
+                health["rtt"] = rtt
+            else:
+                health["rtt"] += self.__rtt_smoothing * (rtt - health["rtt"])
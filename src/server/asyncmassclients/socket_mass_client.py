@@ -0,0 +1,760 @@
+""" A socket client that can communicate with multiple network-bridged
+    transmitters asynchronously
+
+Exports
+-------
+BridgeSocket: A persistent TCP connection to a network bridge node, exposing
+    the subset of the serial port interface used by the mass clients
+SocketMassClient: A socket client that can communicate with multiple
+    network-bridged transmitters asynchronously
+"""
+
+from contextlib import AbstractContextManager, nullcontext
+from multiprocessing.pool import AsyncResult, ThreadPool
+from socket import (
+    AF_INET, IPPROTO_TCP, SO_BROADCAST, SOCK_DGRAM, SOL_SOCKET, TCP_NODELAY,
+    create_connection, socket, timeout as SocketTimeout
+)
+from time import monotonic
+from typing import Any
+
+
+from .interface import IAsyncMassClient, ILeaseClient
+
+
+DISCOVERY_PORT = 50917  # UDP port on which bridge nodes answer discovery probes
+DISCOVERY_PROBE = b"VOLF?"  # Datagram broadcast to discover bridge nodes
+DISCOVERY_REPLY = b"VOLF!"  # Prefix of a bridge node's reply, followed by its TCP port
+
+
+class BridgeSocket:
+    """A persistent TCP connection to a network bridge node, exposing the
+    subset of the serial port interface used by the mass clients
+
+    Attributes
+    ----------
+    address: The (host, port) tuple of the bridge node
+    is_open: Whether the connection is currently open
+    nodelay: Whether Nagle's algorithm is disabled on the connection
+    port: The name of the bridge node in the form "host:port"
+    timeout: The read timeout in seconds
+    write_timeout: The write (and connect) timeout in seconds
+
+    Methods
+    -------
+    close: Close the connection
+    flush: Flush written data (a no-op, as writes are not buffered)
+    open: Open the connection
+    read: Read a number of bytes from the connection
+    read_all: Read all bytes currently available on the connection
+    reset_input_buffer: Discard all bytes currently available on the
+        connection
+    write: Write bytes to the connection
+    """
+
+    def __init__(
+        self,
+        port: str | None = None,
+        timeout: float | None = 1,
+        write_timeout: float | None = 1,
+        nodelay: bool = True
+    ) -> None:
+        """Parameters
+        ----------
+        port (Optional): The name of the bridge node in the form "host:port",
+            or None to create a closed template connection
+        timeout (Optional): The read timeout in seconds
+        write_timeout (Optional): The write (and connect) timeout in seconds
+        nodelay (Optional): Whether to disable Nagle's algorithm
+        """
+        self.port = port
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self.nodelay = nodelay
+        self.__socket: socket | None = None
+        if port:
+            self.open()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """The (host, port) tuple of the bridge node"""
+        if not self.port:
+            raise ValueError("Bridge socket has no port")
+        host, _, port = self.port.rpartition(":")
+        return host, int(port)
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the connection is currently open"""
+        return self.__socket is not None
+
+    def close(self) -> None:
+        """Close the connection"""
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+
+    def flush(self) -> None:
+        """Flush written data (a no-op, as writes are not buffered)"""
+
+    def open(self) -> None:
+        """Open the connection
+
+        Raises
+        ------
+        OSError: If the connection could not be established
+        """
+        self.close()
+        connection = create_connection(self.address, timeout=self.write_timeout)
+        if self.nodelay:
+            connection.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+        self.__socket = connection
+
+    def read(self, size: int = 1) -> bytes:
+        """Read a number of bytes from the connection
+
+        Parameters
+        ----------
+        size (Optional): The number of bytes to read
+
+        Returns
+        -------
+        The bytes read, which may be fewer than requested if the timeout
+        elapsed
+
+        Raises
+        ------
+        OSError: If the connection is closed or broken
+        """
+        connection = self.__get_socket()
+        connection.settimeout(self.timeout)
+        data = bytearray()
+        deadline = None if self.timeout is None else monotonic() + self.timeout
+        while len(data) < size:
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                connection.settimeout(remaining)
+            try:
+                received = connection.recv(size - len(data))
+            except SocketTimeout:
+                break
+            if not received:
+                self.close()
+                raise ConnectionResetError(f"Bridge {self.port} closed the connection")
+            data += received
+        return bytes(data)
+
+    def read_all(self) -> bytes:
+        """Read all bytes currently available on the connection
+
+        Returns
+        -------
+        The bytes read
+
+        Raises
+        ------
+        OSError: If the connection is closed or broken
+        """
+        connection = self.__get_socket()
+        connection.setblocking(False)
+        data = bytearray()
+        try:
+            while received := connection.recv(4096):
+                data += received
+        except BlockingIOError:
+            pass
+        finally:
+            connection.settimeout(self.timeout)
+        return bytes(data)
+
+    def reset_input_buffer(self) -> None:
+        """Discard all bytes currently available on the connection
+
+        Raises
+        ------
+        OSError: If the connection is closed or broken
+        """
+        self.read_all()
+
+    def write(self, data: bytes) -> int:
+        """Write bytes to the connection
+
+        Parameters
+        ----------
+        data: The bytes to write
+
+        Returns
+        -------
+        The number of bytes written
+
+        Raises
+        ------
+        OSError: If the connection is closed or broken
+        """
+        connection = self.__get_socket()
+        connection.settimeout(self.write_timeout)
+        connection.sendall(data)
+        return len(data)
+
+    def __get_socket(self) -> socket:
+        """Get the underlying socket
+
+        Returns
+        -------
+        The underlying socket
+
+        Raises
+        ------
+        OSError: If the connection is not open
+        """
+        if self.__socket is None:
+            raise ConnectionError(f"Bridge {self.port} is not open")
+        return self.__socket
+
+
+class SocketMassClient(IAsyncMassClient):
+    """A socket client that can communicate with multiple network-bridged
+    transmitters asynchronously
+
+    Bridge nodes relay each byte received to their transmitter MCU and relay
+    the MCU's XOR'd echo back over the TCP connection, so the protocol is the
+    same as over serial. If UDP fan-out is enabled, writes are sent as
+    datagrams to the same port number as the bridge's TCP port, and the echo
+    is still returned over TCP.
+
+    If a lease client, such as a coordination client, is given, a port is
+    only opened once this server holds its lease, so servers sharing a
+    machine never contend for a bridge node, and a port whose lease is lost
+    to another server is closed.
+
+    Attributes
+    ----------
+    health: A dictionary mapping available port names to their health
+    hosts: The static list of bridge node names ("host:port") to connect to,
+        or None to discover them with a broadcast probe
+    ports: A dictionary of available ports mapping port names to bridge
+        sockets
+    template: The template bridge socket whose parameters will be used for
+        opening all new connections
+
+    Methods
+    -------
+    close: Close a port
+    discover: Discover bridge nodes with a broadcast probe
+    get_port: Get a port object by name
+    mass_close: Close multiple ports
+    mass_open: Open multiple ports
+    mass_read: Read from multiple ports
+    mass_write: Write to multiple ports
+    mass_write_each: Write a different message to each of multiple ports
+    open: Open a port
+    pause_heartbeat: Pause background health checks of ports
+    read: Read from a port
+    shutdown: Close all ports and release the worker pool and UDP socket
+    write: Write to a port
+    """
+
+    def __init__(
+        self,
+        template: BridgeSocket | None = None,
+        hosts: list[str] | None = None,
+        udp_fanout: bool = False,
+        discovery_address: str = "<broadcast>",
+        discovery_port: int = DISCOVERY_PORT,
+        discovery_timeout: float = 0.5,
+        max_workers: int = 64,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30,
+        coordinator: ILeaseClient | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        template (Optional): A template (ideally closed) bridge socket whose
+            parameters will be used for opening all new connections
+        hosts (Optional): A static list of bridge node names ("host:port") to
+            connect to, or None to discover them with a broadcast probe
+        udp_fanout (Optional): Whether to send writes as UDP datagrams instead
+            of over the TCP connections
+        discovery_address (Optional): The address to send discovery probes to
+        discovery_port (Optional): The UDP port to send discovery probes to
+        discovery_timeout (Optional): How long to wait for discovery replies in
+            seconds
+        max_workers (Optional): The number of persistent worker threads used
+            for asynchronous operations
+        initial_backoff (Optional): The delay in seconds before retrying a
+            bridge node which failed to connect, doubled on each failure
+        max_backoff (Optional): The maximum delay in seconds before retrying a
+            bridge node which failed to connect
+        coordinator (Optional): The lease client, such as a coordination
+            client, through which to lease ports, or None to open any port
+        """
+        self.hosts = hosts
+        self.__available_ports: dict[str, BridgeSocket] = {}
+        self.__coordinator = coordinator
+        self.__discovery_address = discovery_address
+        self.__discovery_port = discovery_port
+        self.__discovery_timeout = discovery_timeout
+        self.__initial_backoff = initial_backoff
+        self.__max_backoff = max_backoff
+        self.__max_workers = max_workers
+        self.__pool: ThreadPool | None = None
+        self.__retry_delays: dict[str, float] = {}
+        self.__retry_times: dict[str, float] = {}
+        self.__udp_socket: socket | None = None
+        if udp_fanout:
+            self.__udp_socket = socket(AF_INET, SOCK_DGRAM)
+        self.__template: BridgeSocket
+        self.template = template
+
+    @property
+    def health(self) -> dict[str, dict[str, Any]]:
+        """A dictionary mapping available port names to their health.
+        Bridge nodes have no heartbeat, so a port is healthy while its
+        connection is open or may be reopened, and its round-trip time is
+        unmeasured
+        """
+        now = monotonic()
+        return {
+            port_name: {
+                "healthy": port.is_open or now >= self.__retry_times.get(port_name, 0),
+                "rtt": None,
+                "failures": 0
+            }
+            for port_name, port in list(self.__available_ports.items())
+        }
+
+    @property
+    def ports(self) -> dict[str, BridgeSocket]:
+        """A dictionary of available ports mapping port names to bridge
+        sockets
+        """
+        return self.__available_ports
+
+    @property
+    def template(self) -> BridgeSocket:
+        """The template bridge socket whose parameters will be used for
+            opening all new connections
+        """
+        return self.__template
+
+    @template.setter
+    def template(self, template: BridgeSocket | None) -> None:
+        if not template:
+            template = BridgeSocket(timeout=1, write_timeout=1)
+        elif template.is_open:
+            template.close()
+        self.__template = template
+
+    def close(self, port: str | BridgeSocket) -> None:
+        """Close a port
+
+        Parameters
+        ----------
+        port: The bridge socket to close
+        """
+        if isinstance(port, str):
+            port = self.__available_ports.pop(port)
+        else:
+            self.__available_ports.pop(port.port)  # type: ignore
+        port.close()
+        if self.__coordinator:
+            self.__coordinator.release(f"port:{port.port}")
+
+    def discover(self) -> list[str]:
+        """Discover bridge nodes with a broadcast probe
+
+        Returns
+        -------
+        The names ("host:port") of the bridge nodes which replied
+        """
+        found: list[str] = []
+        with socket(AF_INET, SOCK_DGRAM) as probe:
+            probe.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+            probe.sendto(
+                DISCOVERY_PROBE,
+                (self.__discovery_address, self.__discovery_port)
+            )
+            deadline = monotonic() + self.__discovery_timeout
+            while (remaining := deadline - monotonic()) > 0:
+                probe.settimeout(remaining)
+                try:
+                    reply, (host, _) = probe.recvfrom(64)
+                except SocketTimeout:
+                    break
+                if not reply.startswith(DISCOVERY_REPLY):
+                    continue
+                try:
+                    name = f"{host}:{int(reply[len(DISCOVERY_REPLY):])}"
+                except ValueError:
+                    continue  # A malformed reply, not from a bridge node
+                if name not in found:
+                    found.append(name)
+        return found
+
+    def get_port(self, port_name: str) -> BridgeSocket | None:
+        """Get a bridge socket by name
+
+        Parameters
+        ----------
+        port_name: The name of the port to get
+
+        Returns
+        -------
+        The bridge socket if it exists, otherwise None
+        """
+        return self.__available_ports.get(port_name)
+
+    def mass_close(self, ports: list[str | BridgeSocket] | None = None) -> None:
+        """Close multiple ports
+
+        Parameters
+        ----------
+        ports (Optional): The list of bridge sockets to close, or None to close
+            all
+        """
+        if not ports:
+            ports = list(self.__available_ports.values())
+        for port in ports:
+            self.close(port)
+
+    def mass_open(
+        self,
+        port_names: list[str] | None = None
+    ) -> dict[str, BridgeSocket]:
+        """Open multiple ports asynchronously
+
+        Parameters
+        ----------
+        port_names (Optional): The list of port names to open, or None to open
+            all static hosts or, if there are none, all discovered hosts
+
+        Returns
+        -------
+        A dictionary of available ports mapping port names to bridge sockets
+        """
+
+        # Make sure target ports are closed
+        if not port_names:
+            self.mass_close()
+            port_names = list(self.hosts) if self.hosts else self.discover()
+        else:
+            for port_name in port_names:
+                if port_name in self.__available_ports:
+                    self.close(self.__available_ports[port_name])
+        if not port_names:
+            return self.__available_ports
+
+        # Asynchronously attempt to open ports
+        async_results = [
+            self.__get_pool().apply_async(func=self.open, args=(port_name,))
+            for port_name in port_names
+        ]
+
+        # Collect available ports
+        for result in async_results:
+            port: BridgeSocket | None = result.get()
+            if port is not None:
+                self.__available_ports[port.port] = port  # type: ignore
+        return self.__available_ports
+
+    def mass_read(
+        self,
+        num_bytes: int = 0,
+        ports: list[BridgeSocket] | None = None
+    ) -> list[tuple[str, AsyncResult]]:
+        """Read from multiple ports asynchronously
+
+        Parameters
+        ----------
+        num_bytes: The number of bytes to read from each port, or 0 to read all
+        ports (Optional): The list of bridge sockets to read from, or None to
+            read from all
+
+        Returns
+        -------
+        A list of tuples containing the port name and the async result of bytes
+        read
+        """
+        if not ports:
+            ports = list(self.__available_ports.values())
+        if not ports:
+            raise RuntimeError("No ports available")
+
+        # Asynchronously read from ports
+        pool = self.__get_pool()
+        async_results = [
+            (port.port, pool.apply_async(func=self.read, args=(port, num_bytes)))
+            for port in ports
+        ]
+        for _, result in async_results:
+            result.wait()
+        return async_results  # type: ignore[return-value]
+
+    def mass_write(
+        self,
+        message: bytes,
+        ports: list[BridgeSocket] | None = None,
+        reset_input: bool = False
+    ) -> list[tuple[str, AsyncResult]]:
+        """Write to multiple ports asynchronously
+
+        Parameters
+        ----------
+        message: The bytes to write to each port
+        ports (Optional): The list of bridge sockets to write to, or None to
+            write to all
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
+
+        Returns
+        -------
+        A list of tuples containing the port name and the async result of
+        number of bytes written, for each port which is available
+        """
+        if not ports:
+            ports = list(self.__available_ports.values())
+        return self.mass_write_each(
+            {port.port: message for port in ports},  # type: ignore
+            reset_input
+        )
+
+    def mass_write_each(
+        self,
+        messages: dict[str, bytes],
+        reset_input: bool = False
+    ) -> list[tuple[str, AsyncResult]]:
+        """Write a different message to each of multiple ports
+        asynchronously, in a single batch
+
+        Parameters
+        ----------
+        messages: A dictionary mapping the names of the ports to write to to
+            the bytes to write to each
+        reset_input (Optional): Whether to discard unread input from each
+            port first, so stale replies are not read as replies to this write
+
+        Returns
+        -------
+        A list of tuples containing the port name and the async result of
+        number of bytes written, for each port which is available
+        """
+        ports = [
+            self.__available_ports[port_name]
+            for port_name in messages
+            if port_name in self.__available_ports
+        ]
+        if not ports:
+            raise RuntimeError("No ports available")
+
+        # Asynchronously write to ports, as datagrams if fanning out over UDP
+        pool = self.__get_pool()
+        write = self.write if self.__udp_socket is None else self.__write_datagram
+        async_results = [
+            (
+                port.port,
+                pool.apply_async(
+                    func=write, args=(port, messages[port.port], reset_input)  # type: ignore
+                )
+            )
+            for port in ports
+        ]
+        for _, result in async_results:
+            result.wait()
+        return async_results  # type: ignore[return-value]
+
+    def open(self, port_name: str) -> BridgeSocket | None:
+        """Open a port, unless it is still backing off from a failed attempt
+
+        Parameters
+        ----------
+        port_name: The name of the port to open
+
+        Returns
+        -------
+        The bridge socket if it was opened, otherwise None
+        """
+        if monotonic() < self.__retry_times.get(port_name, 0):
+            return None
+        if self.__coordinator and not self.__coordinator.acquire(
+            f"port:{port_name}", self.__lease_lost
+        ):
+            return None  # Another server owns the port
+        try:
+            port = BridgeSocket(
+                port=port_name,
+                timeout=self.__template.timeout,
+                write_timeout=self.__template.write_timeout,
+                nodelay=self.__template.nodelay
+            )
+        except (OSError, ValueError):
+            self.__back_off(port_name)
+            if self.__coordinator:
+                self.__coordinator.release(f"port:{port_name}")
+            return None
+        self.__retry_delays.pop(port_name, None)
+        self.__retry_times.pop(port_name, None)
+        self.__available_ports[port_name] = port
+        return port
+
+    def pause_heartbeat(self) -> AbstractContextManager:
+        """Pause background health checks of ports, of which bridge nodes
+        have none
+
+        Returns
+        -------
+        A context manager which does nothing
+        """
+        return nullcontext()
+
+    def read(self, port: BridgeSocket, num_bytes: int = 0) -> bytes | None:
+        """Read from a port
+
+        Parameters
+        ----------
+        port: The bridge socket to read from
+        num_bytes (Optional): The number of bytes to read, or 0 to read all
+
+        Returns
+        -------
+        The bytes read if successful, otherwise None
+        """
+        try:
+            if num_bytes > 0:
+                return port.read(num_bytes)
+            return port.read_all()
+        except OSError:
+            return None
+
+    def shutdown(self) -> None:
+        """Close all ports and release the worker pool and UDP socket, after
+        which the client should not be used
+        """
+        self.mass_close()
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+        if self.__udp_socket is not None:
+            self.__udp_socket.close()
+            self.__udp_socket = None
+
+    def write(
+        self,
+        port: BridgeSocket,
+        message: bytes,
+        reset_input: bool = False
+    ) -> int | None:
+        """Write to a port, reconnecting once if the connection was lost
+
+        Parameters
+        ----------
+        port: The bridge socket to write to
+        message: The bytes to write
+        reset_input (Optional): Whether to discard unread input from the port
+            first, so stale replies are not read as replies to this write
+
+        Returns
+        -------
+        The number of bytes written if successful, otherwise None
+        """
+        try:
+            if reset_input:
+                port.reset_input_buffer()
+            return port.write(message)
+        except OSError:
+            pass
+        if not self.__reconnect(port):
+            return None
+        try:
+            return port.write(message)
+        except OSError:
+            return None
+
+    def __back_off(self, port_name: str) -> None:
+        """Delay the next connection attempt to a port, doubling the delay on
+        each consecutive failure
+
+        Parameters
+        ----------
+        port_name: The name of the port which failed to connect
+        """
+        delay = min(
+            self.__retry_delays.get(port_name, self.__initial_backoff / 2) * 2,
+            self.__max_backoff
+        )
+        self.__retry_delays[port_name] = delay
+        self.__retry_times[port_name] = monotonic() + delay
+
+    def __get_pool(self) -> ThreadPool:
+        """Get the persistent worker pool, creating it if necessary
+
+        Returns
+        -------
+        The persistent worker pool
+        """
+        if self.__pool is None:
+            self.__pool = ThreadPool(processes=self.__max_workers)
+        return self.__pool
+
+    def __lease_lost(self, resource: str) -> None:
+        """Close a port whose lease was lost to another server
+
+        Parameters
+        ----------
+        resource: The name of the port's lease
+        """
+        port_name = resource.removeprefix("port:")
+        if port_name in self.__available_ports:
+            self.close(port_name)
+
+    def __reconnect(self, port: BridgeSocket) -> bool:
+        """Reopen a port's connection, unless it is still backing off from a
+        failed attempt
+
+        Parameters
+        ----------
+        port: The bridge socket to reconnect
+
+        Returns
+        -------
+        Whether the connection was reopened
+        """
+        if monotonic() < self.__retry_times.get(port.port, 0):  # type: ignore
+            return False
+        try:
+            port.open()
+        except OSError:
+            self.__back_off(port.port)  # type: ignore
+            return False
+        self.__retry_delays.pop(port.port, None)  # type: ignore
+        self.__retry_times.pop(port.port, None)  # type: ignore
+        return True
+
+    def __write_datagram(
+        self,
+        port: BridgeSocket,
+        message: bytes,
+        reset_input: bool = False
+    ) -> int | None:
+        """Write to a port as a UDP datagram
+
+        Parameters
+        ----------
+        port: The bridge socket whose node to send the datagram to
+        message: The bytes to write
+        reset_input (Optional): Whether to discard unread input from the
+            port's connection first, so stale replies are not read as replies
+            to this write
+
+        Returns
+        -------
+        The number of bytes written if successful, otherwise None
+        """
+        try:
+            if reset_input:
+                port.reset_input_buffer()
+            return self.__udp_socket.sendto(message, port.address)  # type: ignore
+        except OSError:
+            return None
@@ -0,0 +1,389 @@
+""" Classes for mixing audio captured from several input devices into a single
+    stream, with each input joining and leaving the mix independently
+
+Exports
+-------
+AudioMixer: A mixer summing several inputs with per-input gain and a soft
+    limiter
+MixerInput: A drift-compensating buffer of audio captured from one input
+    device
+"""
+
+
+from threading import Condition
+from time import perf_counter
+
+import numpy as np
+
+
+_INITIAL_CAPACITY = 16384  # Frames preallocated per input, grown if an input's target needs more
+_SAMPLE_SCALE = np.float32(1 / 32768)  # Converts 16-bit samples to floats relative to full scale
+
+class MixerInput:
+    """A drift-compensating buffer of audio captured from one input device
+
+    Captured chunks are pushed from the device's callback and pulled by the
+    mixer at the clock of the mixer's reference input. Each device's clock
+    drifts from the reference's, so the buffer's smoothed fill level steers
+    a resampling ratio, a fraction of a percent either side of one, which
+    holds the fill at its target by linear interpolation. Resampled inputs
+    are silent until first filled to their target, and again after an
+    underrun. Audio is held in a preallocated ring buffer, so pushing from
+    the device's callback does not allocate.
+
+    Attributes
+    ----------
+    active: Whether the input is currently part of the mix
+    device_name: The name of the input device to capture from, or None for
+        the default input device
+    gain: The linear gain applied to the input when mixed
+    name: The name of the input
+    statistics: Underruns, overflows and the current resampling ratio
+
+    Methods
+    -------
+    clear: Discard buffered audio
+    pull: Read frames from the buffer at the reference clock
+    push: Add a captured chunk to the buffer
+    """
+
+    def __init__(
+        self,
+        name: str,
+        device_name: str | None = None,
+        gain: float = 1.0,
+        audio_channels: int = 2,
+        target_frames: int | None = None,
+        max_drift: float = 0.005
+    ) -> None:
+        """Parameters
+        ----------
+        name: The name of the input
+        device_name (Optional): The name of the input device to capture from,
+            or None for the default input device
+        gain (Optional): The linear gain applied to the input when mixed
+        audio_channels (Optional): The number of interleaved audio channels
+        target_frames (Optional): The number of frames to hold buffered, or
+            None for twice the frames pulled at a time
+        max_drift (Optional): The largest deviation of the resampling ratio
+            from one
+        """
+        self.active = False
+        self.device_name = device_name
+        self.gain = gain
+        self.name = name
+        self.statistics: dict[str, float] = {
+            "underruns": 0, "overflows": 0, "ratio": 1.0
+        }
+        self.__audio_channels = audio_channels
+        self.__condition = Condition()
+        self.__fill = 0.0
+        self.__max_drift = max_drift
+        self.__phase = 0.0
+        self.__primed = False
+        self.__ring = np.zeros(
+            (max(_INITIAL_CAPACITY, 5 * (target_frames or 0)), audio_channels),
+            dtype=np.float32
+        )
+        self.__start = 0
+        self.__length = 0
+        self.__target_frames = target_frames
+
+    def clear(self) -> None:
+        """Discard buffered audio and reset the drift estimate"""
+        with self.__condition:
+            self.__start = self.__length = 0
+            self.__fill = 0.0
+            self.__phase = 0.0
+            self.__primed = False
+            self.statistics["ratio"] = 1.0
+
+    def pull(
+        self,
+        frames: int,
+        reference: bool = False,
+        timeout: float | None = None
+    ) -> np.ndarray:
+        """Read frames from the buffer at the reference clock
+
+        Parameters
+        ----------
+        frames: The number of frames to read
+        reference (Optional): Whether this input is the reference clock, read
+            without resampling
+        timeout (Optional): The seconds to wait for enough frames to be
+            buffered, or None not to wait
+
+        Returns
+        -------
+        The frames as floats relative to full scale, silent if not enough
+            were buffered
+        """
+        if self.__target_frames is None:
+            self.__target_frames = 2 * frames
+        with self.__condition:
+            if timeout:
+                self.__condition.wait_for(
+                    lambda: self.__length >= frames, timeout
+                )
+            if reference:
+                return self.__take(
+                    frames, frames, frames, np.arange(frames, dtype=np.float64)
+                )
+
+            if not self.__primed:
+                if self.__length < self.__target_frames:
+                    return np.zeros((frames, self.__audio_channels), dtype=np.float32)
+                self.__primed = True
+                self.__fill = float(self.__length)
+
+            # Steer the resampling ratio towards the target fill, smoothing
+            # out the sawtooth of chunked delivery
+            self.__fill += 0.01 * (self.__length - self.__fill)
+            error = (self.__fill - self.__target_frames) / self.__target_frames
+            ratio = 1 + float(np.clip(
+                self.__max_drift * error, -self.__max_drift, self.__max_drift
+            ))
+            self.statistics["ratio"] = ratio
+            positions = self.__phase + ratio * np.arange(frames)
+            end = self.__phase + ratio * frames
+            consumed = int(end)
+            needed = max(consumed, int(positions[-1]) + 2)
+            if self.__length < needed:
+                self.__primed = False
+            else:
+                self.__phase = end - consumed
+            return self.__take(frames, needed, consumed, positions)
+
+    def push(self, chunk: bytes) -> None:
+        """Add a captured chunk to the buffer, dropping the oldest audio
+        down to the target if the buffer has overflowed
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames captured
+        """
+        samples = np.frombuffer(chunk, dtype=np.int16).reshape(
+            -1, self.__audio_channels
+        )
+        with self.__condition:
+            count = len(samples)
+            if self.__length + count > len(self.__ring):
+                self.__grow(self.__length + count)
+            capacity = len(self.__ring)
+            end = (self.__start + self.__length) % capacity
+            first = min(count, capacity - end)
+            # Copy then scale in place, as scaling while casting allocates
+            for ring_slice, sample_slice in (
+                (self.__ring[end:end + first], samples[:first]),
+                (self.__ring[:count - first], samples[first:])
+            ):
+                ring_slice[:] = sample_slice
+                ring_slice *= _SAMPLE_SCALE
+            self.__length += count
+            if self.__target_frames and self.__length > 4 * self.__target_frames:
+                dropped = self.__length - self.__target_frames
+                self.__start = (self.__start + dropped) % capacity
+                self.__length = self.__target_frames
+                self.__fill = float(self.__target_frames)
+                self.statistics["overflows"] += 1
+            self.__condition.notify()
+
+    def __grow(self, frames: int) -> None:
+        """Reallocate the ring buffer to hold at least a number of frames,
+        unwrapping the buffered audio to its start
+
+        Parameters
+        ----------
+        frames: The number of frames the ring buffer must hold
+        """
+        ring = np.zeros(
+            (max(frames, 2 * len(self.__ring)), self.__audio_channels),
+            dtype=np.float32
+        )
+        ring[:self.__length] = self.__ring.take(
+            np.arange(self.__start, self.__start + self.__length), axis=0, mode="wrap"
+        )
+        self.__ring = ring
+        self.__start = 0
+
+    def __take(
+        self, frames: int, needed: int, consumed: int, positions: np.ndarray
+    ) -> np.ndarray:
+        """Interpolate frames at fractional buffer positions and consume them
+
+        Parameters
+        ----------
+        frames: The number of frames to output
+        needed: The number of buffered frames the positions span
+        consumed: The number of buffered frames to consume
+        positions: The fractional buffer position of each output frame
+
+        Returns
+        -------
+        The interpolated frames, silent if not enough were buffered
+        """
+        if self.__length < needed:
+            self.statistics["underruns"] += 1
+            return np.zeros((frames, self.__audio_channels), dtype=np.float32)
+        indices = positions.astype(np.intp)
+        fractions = (positions - indices).astype(np.float32)[:, None]
+        indices += self.__start
+        output = self.__ring.take(indices, axis=0, mode="wrap")
+        if fractions.any():
+            following = self.__ring.take(indices + 1, axis=0, mode="wrap")
+            output += fractions * (following - output)
+        self.__start = (self.__start + consumed) % len(self.__ring)
+        self.__length -= consumed
+        return output
+
+
+class AudioMixer:
+    """A mixer summing several inputs with per-input gain and a soft limiter
+
+    The first input is the reference clock: mixing waits for its frames, and
+    the other inputs are resampled to keep pace with it. Every input is
+    pulled each chunk, so joining the mix is immediate, and gain changes as
+    inputs join or leave are ramped across a chunk to avoid clicks. The sum
+    passes through a limiter which is linear up to a threshold and
+    approaches full scale smoothly above it.
+
+    Attributes
+    ----------
+    active_inputs: The names of the inputs currently part of the mix
+    inputs: The mixer's inputs mapped by name
+    mix_time: The seconds spent mixing the most recent chunk, excluding
+        waiting for the reference input
+    statistics: The time spent mixing each chunk and each input's statistics
+
+    Methods
+    -------
+    clear: Discard all inputs' buffered audio and reset the statistics
+    mix: Mix a chunk of audio from all active inputs
+    start_input: Add an input to the mix
+    stop_input: Remove an input from the mix
+    """
+
+    def __init__(
+        self,
+        inputs: list[MixerInput],
+        audio_channels: int = 2,
+        limiter_threshold: float = 0.8,
+        timeout: float = 0.5
+    ) -> None:
+        """Parameters
+        ----------
+        inputs: The inputs to mix, the first of which is the reference clock
+        audio_channels (Optional): The number of interleaved audio channels
+        limiter_threshold (Optional): The level relative to full scale above
+            which the limiter compresses the mix
+        timeout (Optional): The seconds to wait for the reference input's
+            frames before mixing silence in their place
+
+        Raises
+        ------
+        ValueError: If no inputs are given or their names are not unique
+        """
+        if not inputs:
+            raise ValueError("A mixer needs at least one input")
+        self.inputs = {mixer_input.name: mixer_input for mixer_input in inputs}
+        if len(self.inputs) != len(inputs):
+            raise ValueError("Mixer input names must be unique")
+        self.__audio_channels = audio_channels
+        self.__gains = np.zeros(len(inputs), dtype=np.float32)
+        self.__limiter_threshold = limiter_threshold
+        self.__mix_count = 0
+        self.__mix_total = 0.0
+        self.__mix_max = 0.0
+        self.__timeout = timeout
+        self.mix_time = 0.0
+
+    @property
+    def active_inputs(self) -> list[str]:
+        """The names of the inputs currently part of the mix"""
+        return [name for name, mixer_input in self.inputs.items() if mixer_input.active]
+
+    @property
+    def statistics(self) -> dict:
+        """The mean and max seconds spent mixing a chunk, excluding waiting
+        for the reference input, and each input's statistics
+        """
+        return {
+            "mix_time_mean": self.__mix_total / self.__mix_count if self.__mix_count else 0.0,
+            "mix_time_max": self.__mix_max,
+            "inputs": {
+                name: dict(mixer_input.statistics)
+                for name, mixer_input in self.inputs.items()
+            }
+        }
+
+    def clear(self) -> None:
+        """Discard all inputs' buffered audio and reset the statistics"""
+        for mixer_input in self.inputs.values():
+            mixer_input.clear()
+        self.__mix_count = 0
+        self.__mix_total = 0.0
+        self.__mix_max = 0.0
+
+    def mix(self, frames: int) -> bytes:
+        """Mix a chunk of audio from all active inputs, waiting for the
+        reference input to capture it
+
+        Parameters
+        ----------
+        frames: The number of frames to mix
+
+        Returns
+        -------
+        The mixed interleaved 16-bit audio frames
+        """
+        inputs = list(self.inputs.values())
+        blocks = [inputs[0].pull(frames, True, self.__timeout)]
+        start_time = perf_counter()
+        blocks.extend(mixer_input.pull(frames) for mixer_input in inputs[1:])
+        stacked = np.stack(blocks)
+        gains = np.array(
+            [mixer_input.gain if mixer_input.active else 0.0 for mixer_input in inputs],
+            dtype=np.float32
+        )
+        if np.array_equal(gains, self.__gains):
+            mixed = np.tensordot(gains, stacked, axes=1)
+        else:  # Ramp changed gains across the chunk
+            ramps = np.linspace(self.__gains, gains, frames, axis=1, dtype=np.float32)
+            mixed = np.einsum("kn,knc->nc", ramps, stacked)
+            self.__gains = gains
+
+        # Soft limit: linear below the threshold, tanh-shaped above it
+        threshold = self.__limiter_threshold
+        magnitudes = np.abs(mixed)
+        over = magnitudes > threshold
+        if over.any():
+            headroom = 1 - threshold
+            mixed[over] = np.sign(mixed[over]) * (
+                threshold + headroom * np.tanh((magnitudes[over] - threshold) / headroom)
+            )
+        chunk = (mixed * 32767).astype(np.int16).tobytes()
+
+        self.mix_time = perf_counter() - start_time
+        self.__mix_count += 1
+        self.__mix_total += self.mix_time
+        self.__mix_max = max(self.__mix_max, self.mix_time)
+        return chunk
+
+    def start_input(self, name: str) -> None:
+        """Add an input to the mix
+
+        Parameters
+        ----------
+        name: The name of the input
+        """
+        self.inputs[name].active = True
+
+    def stop_input(self, name: str) -> None:
+        """Remove an input from the mix
+
+        Parameters
+        ----------
+        name: The name of the input
+        """
+        self.inputs[name].active = False
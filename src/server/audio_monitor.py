@@ -0,0 +1,356 @@
+""" Classes for monitoring outgoing audio for content which causes visible LED
+    flicker, clipping and level problems, and for correcting it
+
+Exports
+-------
+AudioMonitor: A thread analysing a decimated copy of the outgoing audio
+FlickerFilter: An attenuation and high-pass stage for the outgoing audio
+"""
+
+
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+
+_GAIN_STEP = 0.8  # The factor by which auto-correction steps the gain
+
+
+class FlickerFilter:
+    """An attenuation and high-pass stage for the outgoing audio
+
+    The high-pass subtracts a centred moving average from the signal, so it
+    runs vectorized over each chunk with linear phase, carrying its history
+    between chunks at the cost of delaying the audio by half its window. Its
+    window and history are changed together under a lock, so the cutoff may
+    be set from another thread while audio is processed.
+
+    Attributes
+    ----------
+    gain: The factor by which the audio is attenuated
+    highpass_cutoff: The approximate cutoff of the high-pass stage in Hz, or
+        None to disable it
+
+    Methods
+    -------
+    process: Apply the stage to a chunk of audio
+    """
+
+    def __init__(self, sample_rate: int = 44100, audio_channels: int = 2) -> None:
+        """Parameters
+        ----------
+        sample_rate (Optional): The sample rate of the audio
+        audio_channels (Optional): The number of interleaved audio channels
+        """
+        self.gain = 1.0
+        self.__audio_channels = audio_channels
+        self.__highpass_cutoff: float | None = None
+        self.__history = np.zeros((0, audio_channels))
+        self.__lock = Lock()
+        self.__sample_rate = sample_rate
+        self.__window = 0
+
+    @property
+    def highpass_cutoff(self) -> float | None:
+        """The approximate cutoff of the high-pass stage in Hz, or None to
+        disable it
+        """
+        return self.__highpass_cutoff
+
+    @highpass_cutoff.setter
+    def highpass_cutoff(self, cutoff: float | None) -> None:
+        window = 0
+        if cutoff:
+            # A moving average's first null falls at sample_rate / window
+            window = max(3, int(self.__sample_rate / cutoff)) | 1
+        history = np.zeros((max(window - 1, 0), self.__audio_channels))
+        with self.__lock:
+            self.__highpass_cutoff = cutoff
+            self.__window = window
+            self.__history = history
+
+    def process(self, chunk: bytes) -> bytes:
+        """Apply the stage to a chunk of audio
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames to process
+
+        Returns
+        -------
+        The processed frames
+        """
+        gain = self.gain
+        if gain == 1.0 and not self.__window:
+            return chunk
+        frames = np.frombuffer(chunk, dtype=np.int16).reshape(
+            -1, self.__audio_channels
+        ).astype(np.float64)
+        with self.__lock:
+            window = self.__window
+            if window:
+                padded = np.concatenate((self.__history, frames))
+                sums = np.concatenate((
+                    np.zeros((1, self.__audio_channels)), np.cumsum(padded, axis=0)
+                ))
+                averages = (sums[window:] - sums[:-window]) / window
+                delay = (window - 1) // 2
+                frames = padded[delay:delay + len(frames)] - averages
+                self.__history = padded[len(padded) - window + 1:]
+        frames *= gain
+        return np.clip(frames, -32768, 32767).astype(np.int16).tobytes()
+
+
+class AudioMonitor(Thread):
+    """A thread analysing a decimated copy of the outgoing audio
+
+    Chunks are queued without blocking the audio path, and dropped if the
+    analysis falls behind, so its cost is bounded. Each chunk's peak, RMS
+    and clipping are measured at full rate, clipping on the chunk before the
+    filter too, so attenuating a saturated source does not hide its
+    clipping; a mono copy decimated by block
+    averaging feeds overlapped, Hann-windowed rffts which measure the share
+    of energy below the flicker cutoff. Crossing a threshold raises an alert
+    and, if enabled, adjusts the flicker filter. Attenuation applied for
+    clipping is stepped back up once the audio has had headroom for a step
+    for the recovery time. The high-pass stage stays enabled once flicker is
+    found, as the analysed audio is already filtered, so the flicker's end
+    cannot be observed, and voice and music lose little below the cutoff.
+
+    Attributes
+    ----------
+    filter: The attenuation and high-pass stage the monitor adjusts
+    metrics: The most recent measurements and the analysis cost
+
+    Methods
+    -------
+    close: Stop the monitor
+    run: Begin analysing submitted audio
+    submit: Queue a chunk of outgoing audio for analysis
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        flicker_cutoff: float = 100.0,
+        flicker_threshold: float = 0.3,
+        clipping_threshold: float = 0.001,
+        peak_threshold: float = 0.98,
+        decimation: int = 8,
+        fft_size: int = 1024,
+        auto_correct: bool = False,
+        on_alert: Callable[[str, float], None] | None = None,
+        queue_size: int = 8,
+        recovery_time: float = 5.0
+    ) -> None:
+        """Parameters
+        ----------
+        sample_rate (Optional): The sample rate of the audio
+        audio_channels (Optional): The number of interleaved audio channels
+        flicker_cutoff (Optional): The frequency in Hz below which audio
+            content causes visible flicker
+        flicker_threshold (Optional): The share of energy below the flicker
+            cutoff above which an alert is raised
+        clipping_threshold (Optional): The share of clipped samples in a chunk
+            above which an alert is raised
+        peak_threshold (Optional): The peak level, relative to full scale,
+            above which an alert is raised
+        decimation (Optional): The factor by which the analysed copy is
+            decimated
+        fft_size (Optional): The number of decimated samples per rfft, which
+            overlap by half
+        auto_correct (Optional): Whether to enable the high-pass stage on
+            flicker and attenuate on clipping
+        on_alert (Optional): Called with an alert's name and value when a
+            threshold is crossed, printing a warning if None
+        queue_size (Optional): The number of chunks which may wait for
+            analysis before further chunks are dropped
+        recovery_time (Optional): The seconds of audio with headroom after
+            which attenuation applied for clipping is stepped back up
+        """
+        super().__init__(daemon=True)
+        self.filter = FlickerFilter(sample_rate, audio_channels)
+        self.__audio_channels = audio_channels
+        self.__auto_correct = auto_correct
+        self.__clipping_threshold = clipping_threshold
+        self.__decimation = decimation
+        self.__fft_size = fft_size
+        self.__flicker_threshold = flicker_threshold
+        self.__peak_threshold = peak_threshold
+        self.__on_alert = on_alert or self.__print_alert
+        self.__kill_flag = Event()
+        self.__queue: Queue[tuple[bytes, bytes | None]] = Queue(queue_size)
+        self.__active_alerts: set[str] = set()
+        self.__decimated = np.zeros(0)
+        self.__remainder = np.zeros(0)
+        self.__fft_window = np.hanning(fft_size)
+        decimated_rate = sample_rate / decimation
+        self.__flicker_bins = slice(1, int(flicker_cutoff * fft_size / decimated_rate) + 1)
+        self.__flicker_cutoff = flicker_cutoff
+        self.__recovery_frames = int(recovery_time * sample_rate)
+        self.__headroom_frames = 0
+        self.__analysis_count = 0
+        self.__analysis_total = 0.0
+        self.metrics: dict[str, float] = {
+            "peak": 0.0, "rms": 0.0, "clipping": 0.0, "flicker_ratio": 0.0,
+            "analysis_time_mean": 0.0, "analysis_time_max": 0.0,
+            "dropped_chunks": 0
+        }
+
+    def close(self) -> None:
+        """Stop the monitor"""
+        self.__kill_flag.set()
+
+    def run(self) -> None:
+        """Begin analysing submitted audio"""
+        while not self.__kill_flag.is_set():
+            try:
+                chunk, source = self.__queue.get(timeout=0.1)
+            except Empty:
+                continue
+            start_time = perf_counter()
+            self.__analyse(chunk, source)
+            analysis_time = perf_counter() - start_time
+            self.__analysis_count += 1
+            self.__analysis_total += analysis_time
+            self.metrics["analysis_time_mean"] = (
+                self.__analysis_total / self.__analysis_count
+            )
+            self.metrics["analysis_time_max"] = max(
+                self.metrics["analysis_time_max"], analysis_time
+            )
+
+    def submit(self, chunk: bytes, source: bytes | None = None) -> None:
+        """Queue a chunk of outgoing audio for analysis without blocking,
+        dropping it if the analysis has fallen behind
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames
+        source (Optional): The chunk before the filter was applied, or None
+            if it was not filtered
+        """
+        try:
+            self.__queue.put_nowait((chunk, source))
+        except Full:
+            self.metrics["dropped_chunks"] += 1
+
+    def __alert(self, name: str, value: float, active: bool) -> None:
+        """Raise an alert when a threshold is first crossed, and correct the
+        audio if enabled
+
+        Parameters
+        ----------
+        name: The name of the alert
+        value: The measured value
+        active: Whether the value is beyond its threshold
+        """
+        if not active:
+            self.__active_alerts.discard(name)
+            return
+        if name in self.__active_alerts:
+            return
+        self.__active_alerts.add(name)
+        self.__on_alert(name, value)
+        if not self.__auto_correct:
+            return
+        if name == "flicker" and self.filter.highpass_cutoff is None:
+            self.filter.highpass_cutoff = self.__flicker_cutoff
+        elif name == "clipping":
+            self.filter.gain = max(self.filter.gain * _GAIN_STEP, 0.25)
+            self.__headroom_frames = 0
+
+    def __analyse(self, chunk: bytes, source: bytes | None) -> None:
+        """Measure a chunk's levels and feed its decimated copy to the
+        spectral analysis
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames
+        source: The chunk before the filter was applied, or None if it was
+            not filtered
+        """
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if not samples.size:
+            return
+        magnitudes = np.abs(samples.astype(np.int32))
+        peak = float(magnitudes.max()) / 32768
+        rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) / 32768
+        clipping = int(np.count_nonzero(magnitudes >= 32767)) / samples.size
+        if source is not None and source is not chunk:
+            source_samples = np.frombuffer(source, dtype=np.int16)
+            clipping = max(clipping, int(np.count_nonzero(
+                (source_samples >= 32767) | (source_samples == -32768)
+            )) / max(source_samples.size, 1))
+        self.metrics.update(peak=peak, rms=rms, clipping=clipping)
+        self.__alert("peak", peak, peak > self.__peak_threshold)
+        self.__alert("clipping", clipping, clipping > self.__clipping_threshold)
+        if self.__auto_correct and self.filter.gain < 1.0:
+            self.__recover_gain(
+                peak, clipping, samples.size // self.__audio_channels
+            )
+
+        # Mix to mono and decimate by averaging blocks of samples
+        mono = samples.reshape(-1, self.__audio_channels).mean(axis=1)
+        mono = np.concatenate((self.__remainder, mono))
+        usable = mono.size - mono.size % self.__decimation
+        self.__remainder = mono[usable:]
+        self.__decimated = np.concatenate((
+            self.__decimated,
+            mono[:usable].reshape(-1, self.__decimation).mean(axis=1)
+        ))
+
+        # Analyse each full window, advancing by half a window
+        while self.__decimated.size >= self.__fft_size:
+            frame = self.__decimated[:self.__fft_size]
+            self.__decimated = self.__decimated[self.__fft_size // 2:]
+            spectrum = np.abs(np.fft.rfft((frame - frame.mean()) * self.__fft_window)) ** 2
+            total = spectrum[1:].sum()
+            if total < self.__fft_size * 100 ** 2:  # Too quiet to flicker
+                flicker_ratio = 0.0
+            else:
+                flicker_ratio = spectrum[self.__flicker_bins].sum() / total
+            self.metrics["flicker_ratio"] = flicker_ratio
+            self.__alert(
+                "flicker", flicker_ratio, flicker_ratio > self.__flicker_threshold
+            )
+
+    def __recover_gain(self, peak: float, clipping: float, frames: int) -> None:
+        """Step the attenuation back up once the audio has had headroom for a
+        step, without clipping before or after the filter, for the recovery
+        time
+
+        Parameters
+        ----------
+        peak: The chunk's peak level, relative to full scale
+        clipping: The share of the chunk's samples which clipped
+        frames: The number of frames in the chunk
+        """
+        # Wait while the audio clips, or would clip after a step up
+        if clipping or peak * 32768 >= 32767 * _GAIN_STEP:
+            self.__headroom_frames = 0
+            return
+        self.__headroom_frames += frames
+        if self.__headroom_frames >= self.__recovery_frames:
+            self.filter.gain = min(self.filter.gain / _GAIN_STEP, 1.0)
+            self.__headroom_frames = 0
+
+    @staticmethod
+    def __print_alert(name: str, value: float) -> None:
+        """Print an alert as a warning
+
+        Parameters
+        ----------
+        name: The name of the alert
+        value: The measured value
+        """
+        messages = {
+            "clipping": "Outgoing audio is clipping",
+            "flicker": "Outgoing audio has low-frequency content that will cause visible flicker",
+            "peak": "Outgoing audio is peaking near full scale"
+        }
+        print(f"WARNING: {messages.get(name, name)} ({value:.3f})")
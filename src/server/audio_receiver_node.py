@@ -0,0 +1,464 @@
+""" A program for remote transmitter nodes which receives audio packets sent by
+    a UdpAudioSink and plays them to the node's local sound device through an
+    adaptive jitter buffer
+
+Exports
+-------
+JitterBuffer: An adaptive jitter buffer which reorders audio packets,
+    conceals losses and corrects clock drift
+ReceiverNode: A thread receiving audio packets and playing them out through a
+    jitter buffer
+"""
+
+
+from argparse import ArgumentParser
+from math import ceil
+from socket import (
+    AF_INET, INADDR_ANY, IP_ADD_MEMBERSHIP, IPPROTO_IP, SO_REUSEADDR,
+    SOCK_DGRAM, SOL_SOCKET, inet_aton, socket, timeout as SocketTimeout
+)
+from struct import error as StructError, pack
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time_ns
+from typing import Any
+
+import numpy as np
+
+from audiosinks import PACKET_HEADER
+from ima_adpcm import ImaAdpcmDecoder
+
+
+_DRIFT_DEADBAND = 1.0  # Packets the smoothed depth may stray from the target before drift is corrected
+_DRIFT_SMOOTHING = 1 / 32  # Weight of each playout's depth in the smoothed depth
+_SEQUENCE_MODULUS = 1 << 32  # Sequence numbers wrap at 32 bits, as in the packet header
+
+
+class JitterBuffer:
+    """An adaptive jitter buffer which reorders audio packets, conceals losses
+    and corrects clock drift
+
+    The buffer holds packets until its depth reaches the target latency,
+    which grows with the measured interarrival jitter when adaptive. While
+    playing, once the smoothed depth strays more than a deadband above the
+    target a frame is dropped per chunk, or below it one is repeated, until
+    the depth is back at the target, absorbing the drift between the
+    sender's and the local device's clocks without chasing jitter. Missing
+    packets are concealed by repeating the last chunk at decaying volume.
+    Sequence numbers are extended past their 32-bit wraparound with serial
+    number arithmetic, so a long stream is not dropped as late.
+
+    Attributes
+    ----------
+    statistics: Counters and latency figures describing playout so far
+    target_latency: The current target buffering latency in seconds
+
+    Methods
+    -------
+    pop: Get the next chunk to play
+    push: Add a received packet to the buffer
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        target_latency: float = 0.06,
+        max_latency: float = 0.3,
+        adaptive: bool = True,
+        drift_correction: bool = True
+    ) -> None:
+        """Parameters
+        ----------
+        sample_rate (Optional): The sample rate of the received audio
+        audio_channels (Optional): The number of interleaved audio channels
+        target_latency (Optional): The minimum buffering latency in seconds
+        max_latency (Optional): The maximum buffering latency in seconds
+        adaptive (Optional): Whether to raise the target latency with the
+            measured jitter
+        drift_correction (Optional): Whether to drop or repeat frames to hold
+            the buffer at its target depth
+        """
+        self.__adaptive = adaptive
+        self.__drift_correction = drift_correction
+        self.__frame_size = 2 * audio_channels
+        self.__max_latency = max_latency
+        self.__min_latency = target_latency
+        self.__sample_rate = sample_rate
+        self.__lock = Lock()
+        self.__packets: dict[int, tuple[int, bytes]] = {}
+        self.__chunk_duration = 0.0
+        self.__concealed: dict[int, bool] = {}
+        self.__concealment: bytes | None = None
+        self.__consecutive_misses = 0
+        self.__correction = 0
+        self.__jitter = 0.0
+        self.__last_arrival: tuple[float, int] | None = None
+        self.__latencies: list[float] = []
+        self.__next_sequence: int | None = None
+        self.__smoothed_depth: float | None = None
+        self.__counters = {
+            "received": 0, "played": 0, "late": 0, "lost": 0,
+            "concealed": 0, "underruns": 0, "duplicates": 0, "overflow_drops": 0,
+            "frames_dropped": 0, "frames_repeated": 0
+        }
+
+    @property
+    def statistics(self) -> dict[str, float]:
+        """Counters and latency figures describing playout so far, with
+        latencies in seconds from capture to playout
+        """
+        with self.__lock:
+            statistics: dict[str, float] = dict(self.__counters)
+            latencies = sorted(self.__latencies)
+            expected = self.__counters["played"] + self.__counters["concealed"]
+        statistics["jitter"] = self.__jitter
+        statistics["target_latency"] = self.target_latency
+        statistics["late_rate"] = statistics["late"] / expected if expected else 0.0
+        statistics["loss_rate"] = statistics["lost"] / expected if expected else 0.0
+        if latencies:
+            statistics["latency_mean"] = sum(latencies) / len(latencies)
+            statistics["latency_p50"] = latencies[len(latencies) // 2]
+            statistics["latency_p95"] = latencies[int(len(latencies) * 0.95)]
+            statistics["latency_max"] = latencies[-1]
+        return statistics
+
+    @property
+    def target_latency(self) -> float:
+        """The current target buffering latency in seconds"""
+        if not self.__adaptive:
+            return self.__min_latency
+        return min(
+            max(self.__min_latency, self.__chunk_duration + 4 * self.__jitter),
+            self.__max_latency
+        )
+
+    def pop(self) -> bytes | None:
+        """Get the next chunk to play
+
+        Returns
+        -------
+        The next chunk, a concealment chunk if it is missing, or None if the
+        buffer is still filling and silence should be played
+        """
+        with self.__lock:
+            if self.__next_sequence is None:
+                if not self.__packets or len(self.__packets) < self.__target_depth():
+                    return None
+                self.__next_sequence = min(self.__packets)
+            sequence = self.__next_sequence
+            self.__next_sequence += 1
+            packet = self.__packets.pop(sequence, None)
+            if packet is None:
+                return self.__conceal(sequence)
+            self.__consecutive_misses = 0
+            timestamp, chunk = packet
+            self.__counters["played"] += 1
+            self.__latencies.append((time_ns() - timestamp) / 1e9)
+            if len(self.__latencies) > 10000:
+                del self.__latencies[:5000]
+            self.__concealment = chunk
+            if self.__drift_correction:
+                chunk = self.__correct_drift(chunk)
+            return chunk
+
+    def push(self, sequence: int, timestamp: int, chunk: bytes) -> None:
+        """Add a received packet to the buffer
+
+        Parameters
+        ----------
+        sequence: The packet's sequence number
+        timestamp: The packet's capture timestamp in ns since the epoch
+        chunk: The packet's audio payload, ignored if empty or not whole
+            frames
+        """
+        if not chunk or len(chunk) % self.__frame_size:
+            return
+        arrival = monotonic()
+        with self.__lock:
+            sequence = self.__extend(sequence)
+            self.__counters["received"] += 1
+            if not self.__chunk_duration:
+                self.__chunk_duration = (
+                    len(chunk) / self.__frame_size / self.__sample_rate
+                )
+
+            # Estimate interarrival jitter (RFC 3550)
+            if self.__last_arrival is not None:
+                last_arrival, last_sequence = self.__last_arrival
+                transit_difference = (arrival - last_arrival) - (
+                    (sequence - last_sequence) * self.__chunk_duration
+                )
+                self.__jitter += (abs(transit_difference) - self.__jitter) / 16
+            if self.__last_arrival is None or sequence > self.__last_arrival[1]:
+                self.__last_arrival = (arrival, sequence)
+
+            if self.__next_sequence is not None and sequence < self.__next_sequence:
+                if sequence in self.__concealed:
+                    self.__counters["late"] += 1
+                    if self.__concealed.pop(sequence):
+                        self.__counters["lost"] -= 1  # Counted as lost when concealed
+                return
+            if sequence in self.__packets:
+                self.__counters["duplicates"] += 1
+                return
+            self.__packets[sequence] = (timestamp, chunk)
+
+            # Skip ahead if the buffer has overflowed its maximum latency
+            max_depth = ceil(self.__max_latency / self.__chunk_duration)
+            while len(self.__packets) > max_depth:
+                self.__packets.pop(min(self.__packets))
+                self.__counters["overflow_drops"] += 1
+                if self.__next_sequence is not None:
+                    self.__next_sequence = min(self.__packets)
+
+    def __conceal(self, sequence: int) -> bytes | None:
+        """Conceal a missing packet by repeating the last chunk at decaying
+        volume, rebuffering if the stream appears to have stopped
+
+        Parameters
+        ----------
+        sequence: The sequence number of the missing packet
+
+        Returns
+        -------
+        A concealment chunk, or None if the buffer is rebuffering
+        """
+        self.__consecutive_misses += 1
+        if not self.__packets and self.__consecutive_misses > 3:
+            # The sender has stopped, so wait for the buffer to refill
+            self.__next_sequence = None
+            self.__consecutive_misses = 0
+            self.__correction = 0
+            self.__smoothed_depth = None
+            self.__concealment = None
+            return None
+        # A miss is a loss if later packets have arrived, otherwise an underrun
+        lost = bool(self.__packets)
+        self.__counters["concealed"] += 1
+        self.__counters["lost" if lost else "underruns"] += 1
+        self.__concealed[sequence] = lost
+        if len(self.__concealed) > 1000:
+            self.__concealed = {
+                concealed: was_lost
+                for concealed, was_lost in self.__concealed.items()
+                if concealed > sequence - 500
+            }
+        if self.__concealment is None:
+            return None
+        self.__concealment = (
+            np.frombuffer(self.__concealment, dtype=np.int16) >> 1
+        ).tobytes()
+        return self.__concealment
+
+    def __correct_drift(self, chunk: bytes) -> bytes:
+        """Drop or repeat a frame of a chunk to steer the buffer's depth
+        towards its target
+
+        Parameters
+        ----------
+        chunk: The chunk to correct
+
+        Returns
+        -------
+        The corrected chunk
+        """
+        depth = len(self.__packets) + 1  # Including the chunk being played
+        if self.__smoothed_depth is None:
+            self.__smoothed_depth = float(depth)
+        self.__smoothed_depth += (depth - self.__smoothed_depth) * _DRIFT_SMOOTHING
+        error = self.__smoothed_depth - self.__target_depth()
+        if not self.__correction:
+            if error > _DRIFT_DEADBAND:
+                self.__correction = 1
+            elif error < -_DRIFT_DEADBAND:
+                self.__correction = -1
+        elif self.__correction * error <= 0:
+            self.__correction = 0  # Back at the target
+        if self.__correction > 0 and len(chunk) > self.__frame_size:
+            self.__counters["frames_dropped"] += 1
+            return chunk[:-self.__frame_size]
+        if self.__correction < 0:
+            self.__counters["frames_repeated"] += 1
+            return chunk + chunk[-self.__frame_size:]
+        return chunk
+
+    def __extend(self, sequence: int) -> int:
+        """Extend a wrapping sequence number to the one nearest the highest
+        received, so ordering survives wraparound
+
+        Parameters
+        ----------
+        sequence: The sequence number from the packet header
+
+        Returns
+        -------
+        The extended sequence number
+        """
+        if self.__last_arrival is None:
+            return sequence
+        highest = self.__last_arrival[1]
+        difference = (sequence - highest) % _SEQUENCE_MODULUS
+        if difference >= _SEQUENCE_MODULUS // 2:
+            difference -= _SEQUENCE_MODULUS  # Earlier than the highest
+        return highest + difference
+
+    def __target_depth(self) -> int:
+        """Get the number of packets to buffer to meet the target latency
+
+        Returns
+        -------
+        The target number of buffered packets
+        """
+        if not self.__chunk_duration:
+            return 1
+        return max(1, ceil(self.target_latency / self.__chunk_duration))
+
+
+class ReceiverNode(Thread):
+    """A thread receiving audio packets and playing them out through a jitter
+    buffer
+
+    Attributes
+    ----------
+    jitter_buffer: The jitter buffer through which packets are played out
+
+    Methods
+    -------
+    close: Stop the receiver node
+    run: Begin playing out received audio
+    """
+
+    def __init__(
+        self,
+        output: Any,
+        port: int,
+        multicast_group: str | None = None,
+        jitter_buffer: JitterBuffer | None = None,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        idle_chunk_size: int = 256,
+        decoder: ImaAdpcmDecoder | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        output: The blocking output (such as a PyAudio stream or IAudioSink)
+            to which played chunks are written, which paces playout
+        port: The UDP port on which to receive packets
+        multicast_group (Optional): The multicast group to join, if any
+        jitter_buffer (Optional): The jitter buffer to play packets through
+        sample_rate (Optional): The sample rate of the received audio
+        audio_channels (Optional): The number of interleaved audio channels
+        idle_chunk_size (Optional): The number of frames of silence to play
+            while the jitter buffer is filling
+        decoder (Optional): The decoder for packets sent through an
+            AdpcmAudioSink, or None if packets carry raw audio
+        """
+        super().__init__(daemon=True)
+        self.jitter_buffer = jitter_buffer or JitterBuffer(
+            sample_rate=sample_rate, audio_channels=audio_channels
+        )
+        self.__decoder = decoder
+        self.__frame_size = 2 * audio_channels
+        self.__output = output
+        self.__kill_flag = Event()
+        self.__silence = bytes(2 * audio_channels * idle_chunk_size)
+        self.__socket = socket(AF_INET, SOCK_DGRAM)
+        self.__socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.__socket.bind(("", port))
+        self.__socket.settimeout(0.1)
+        if multicast_group:
+            self.__socket.setsockopt(
+                IPPROTO_IP,
+                IP_ADD_MEMBERSHIP,
+                pack("4sl", inet_aton(multicast_group), INADDR_ANY)
+            )
+        self.__receive_thread = Thread(target=self.__receive, daemon=True)
+
+    def close(self) -> None:
+        """Stop the receiver node"""
+        self.__kill_flag.set()
+        self.__receive_thread.join()
+        self.__socket.close()
+
+    def run(self) -> None:
+        """Begin playing out received audio"""
+        self.__receive_thread.start()
+        while not self.__kill_flag.is_set():
+            chunk = self.jitter_buffer.pop()
+            self.__output.write(chunk if chunk is not None else self.__silence)
+
+    def __receive(self) -> None:
+        """Receive packets into the jitter buffer"""
+        while not self.__kill_flag.is_set():
+            try:
+                packet = self.__socket.recv(65536)
+            except SocketTimeout:
+                continue
+            except OSError:
+                break
+            if len(packet) < PACKET_HEADER.size:
+                continue
+            sequence, timestamp = PACKET_HEADER.unpack_from(packet)
+            chunk = packet[PACKET_HEADER.size:]
+            if self.__decoder is not None:
+                try:
+                    chunk = self.__decoder.decode(chunk)
+                except (ValueError, StructError):
+                    continue
+            if not chunk or len(chunk) % self.__frame_size:
+                continue  # A stray or truncated datagram
+            self.jitter_buffer.push(sequence, timestamp, chunk)
+
+
+if __name__ == "__main__":
+    from pyaudio import PyAudio, paInt16
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=50918)
+    parser.add_argument("--multicast-group", default=None)
+    parser.add_argument("--output-device-index", type=int, default=None)
+    parser.add_argument("--audio-channels", type=int, default=2)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--target-latency", type=float, default=0.06)
+    parser.add_argument("--max-latency", type=float, default=0.3)
+    parser.add_argument("--fixed-latency", action="store_true")
+    parser.add_argument("--no-drift-correction", action="store_true")
+    parser.add_argument("--adpcm", action="store_true")
+    args = parser.parse_args()
+
+    audio = PyAudio()
+    stream_out = audio.open(
+        channels=args.audio_channels,
+        format=paInt16,
+        rate=args.sample_rate,
+        output=True,
+        output_device_index=args.output_device_index
+    )
+    node = ReceiverNode(
+        stream_out,
+        args.port,
+        args.multicast_group,
+        JitterBuffer(
+            args.sample_rate,
+            args.audio_channels,
+            args.target_latency,
+            args.max_latency,
+            not args.fixed_latency,
+            not args.no_drift_correction
+        ),
+        args.sample_rate,
+        args.audio_channels,
+        decoder=ImaAdpcmDecoder(args.audio_channels) if args.adpcm else None
+    )
+    node.start()
+    print("Receiving audio on port", args.port)
+    try:
+        while True:
+            sleep(10)
+            print(node.jitter_buffer.statistics)
+    except KeyboardInterrupt:
+        pass
+    node.close()
+    node.join()
+    stream_out.close()
+    audio.terminate()
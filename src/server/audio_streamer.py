@@ -8,10 +8,21 @@ AudioStreamer: A class for streaming audio from a microphone to a LiFi
 """
 
 
+from contextlib import nullcontext
+from pathlib import Path
+from socket import gethostname
 from threading import Event, Thread
-from time import sleep
+from time import perf_counter, sleep
+from typing import Any, Sequence
 
-from pyaudio import PyAudio, paInt16
+from pyaudio import PyAudio, paContinue, paInputOverflowed, paInt16
+
+from audio_mixer import AudioMixer, MixerInput
+from audio_monitor import AudioMonitor
+from audiosinks import IAudioSink
+from chunk_size_tuner import ChunkSizeTuner
+from realtime import RealtimeProfile, jitter_percentiles
+from tracer import TRACER
 
 
 class AudioStreamer(Thread):
@@ -19,7 +30,9 @@ class AudioStreamer(Thread):
 
     Attributes
     ----------
-    transmitting: Whether the audio is currently being streamed
+    chunk_size: The number of frames per chunk currently in use
+    statistics: Statistics of the most recent transmission
+    streaming: Whether the audio is currently being streamed
 
     Methods
     -------
@@ -35,7 +48,14 @@ class AudioStreamer(Thread):
         chunk_size: int = 1024,
         sample_rate: int = 44100,
         input_device_name: str | None = None,
-        output_device_name: str | None = None
+        output_device_name: str | None = None,
+        output_sinks: Sequence[IAudioSink] | None = None,
+        auto_tune: bool = False,
+        tuning_file: str | Path = Path.home() / ".volf_audio_tuning.json",
+        monitor: AudioMonitor | None = None,
+        mixer: AudioMixer | None = None,
+        realtime: RealtimeProfile | None = None,
+        audio_backend: Any | None = None
     ) -> None:
         """Parameters
         ----------
@@ -43,38 +63,72 @@ class AudioStreamer(Thread):
             stream
         chunk_size (Optional): The size of audio chunks to use in the stream
         sample_rate (Optional): The sample rate of the audio stream
+        output_sinks (Optional): Additional destinations, such as remote
+            transmitter nodes, to which streamed audio is written
+        auto_tune (Optional): Whether to tune the chunk size between
+            transmissions to the smallest the devices can sustain, ignoring
+            chunk_size
+        tuning_file (Optional): The file in which tuned chunk sizes are
+            persisted per device
+        monitor (Optional): A monitor to analyse, and filter, the streamed
+            audio for flicker and clipping
+        mixer (Optional): A mixer of several input devices to stream in place
+            of the input device
+        realtime (Optional): A real-time profile to apply to the audio
+            streamer thread and to hold while streaming
+        audio_backend (Optional): The PyAudio instance, or a stand-in such as
+            FakePyAudio, to open streams with, or None to create a PyAudio
+            instance
         """
         super().__init__()
-        self.__audio = PyAudio()
+        self.__audio = audio_backend or PyAudio()
         self.__audio_channels = audio_channels
         self.__chunk_size = chunk_size
         self.__sample_rate = sample_rate
-        input_device_index = None
-        output_device_index = None
+        self.__output_sinks = list(output_sinks or [])
+        self.__monitor = monitor
+        self.__mixer = mixer
+        self.__mixer_streams: list = []
+        self.__realtime = realtime
+        self.__stream_in = None
+        self.__input_device_index = None
+        self.__output_device_index = None
         if input_device_name:
-            input_device_index = self.__get_device_index(input_device_name)
+            self.__input_device_index = self.__get_device_index(input_device_name)
         if output_device_name:
-            output_device_index = self.__get_device_index(
+            self.__output_device_index = self.__get_device_index(
                 output_device_name, True
             )
-        self.__stream_in = self.__audio.open(
-            channels=self.__audio_channels,
-            format=paInt16,
-            frames_per_buffer=self.__chunk_size,
-            rate=self.__sample_rate,
-            input=True,
-            input_device_index=input_device_index
-        )
-        self.__stream_out = self.__audio.open(
-            channels=self.__audio_channels,
-            format=paInt16,
-            rate=self.__sample_rate,
-            output = True,
-            output_device_index=output_device_index
-        )
+        self.__tuner: ChunkSizeTuner | None = None
+        if auto_tune:
+            device_key = ":".join((
+                gethostname(),
+                input_device_name or "default",
+                output_device_name or "default",
+                str(sample_rate),
+                str(audio_channels)
+            ))
+            self.__tuner = ChunkSizeTuner(device_key, tuning_file)
+            self.__chunk_size = self.__tuner.chunk_size
+        self.__statistics: dict[str, float] = {}
+        self.__open_streams()
         self.__kill_flag = Event()
         self.__transmit_flag = Event()
 
+    @property
+    def chunk_size(self) -> int:
+        """The number of frames per chunk currently in use"""
+        return self.__chunk_size
+
+    @property
+    def statistics(self) -> dict[str, float]:
+        """Statistics of the most recent transmission: chunks streamed,
+        underruns, overruns, the mean, 99th percentile and max seconds spent
+        mixing and processing a chunk, and percentiles of the seconds by
+        which chunks arrived off their period
+        """
+        return self.__statistics
+
     @property
     def streaming(self) -> bool:
         """Whether the audio is currently being streamed"""
@@ -111,34 +165,226 @@ class AudioStreamer(Thread):
                 return i
         raise ValueError(f"Device '{device_name}' not found")
 
+    def __open_streams(self) -> None:
+        """Open the input and output streams with the current chunk size"""
+        if self.__mixer:
+            # Smaller callbacks keep the mixer's buffers' fill smooth
+            self.__mixer_streams = [
+                self.__audio.open(
+                    channels=self.__audio_channels,
+                    format=paInt16,
+                    frames_per_buffer=max(self.__chunk_size // 4, 64),
+                    rate=self.__sample_rate,
+                    input=True,
+                    input_device_index=(
+                        self.__get_device_index(mixer_input.device_name)
+                        if mixer_input.device_name else None
+                    ),
+                    start=False,
+                    stream_callback=self.__capture_into(mixer_input)
+                )
+                for mixer_input in self.__mixer.inputs.values()
+            ]
+        else:
+            self.__stream_in = self.__audio.open(
+                channels=self.__audio_channels,
+                format=paInt16,
+                frames_per_buffer=self.__chunk_size,
+                rate=self.__sample_rate,
+                input=True,
+                input_device_index=self.__input_device_index,
+                start=False
+            )
+        self.__stream_out = self.__audio.open(
+            channels=self.__audio_channels,
+            format=paInt16,
+            frames_per_buffer=self.__chunk_size,
+            rate=self.__sample_rate,
+            output = True,
+            output_device_index=self.__output_device_index,
+            start=False
+        )
+
+    @staticmethod
+    def __capture_into(mixer_input: MixerInput):
+        """Get a stream callback pushing captured audio into a mixer input
+
+        Parameters
+        ----------
+        mixer_input: The mixer input to push captured audio into
+
+        Returns
+        -------
+        The stream callback
+        """
+        def callback(in_data, frame_count, time_info, status):
+            mixer_input.push(in_data)
+            return (None, paContinue)
+        return callback
+
+    def __close_input_streams(self) -> None:
+        """Close the input stream or the mixer's input streams"""
+        if self.__stream_in:
+            self.__stream_in.close()
+        for stream in self.__mixer_streams:
+            stream.close()
+
+    def __read_chunk(self) -> bytes | None:
+        """Read a chunk from the input device or the mixer
+
+        Returns
+        -------
+        The chunk of interleaved 16-bit audio frames, or None if the input
+            overflowed
+        """
+        if self.__mixer:
+            with TRACER.span("mixer.mix", "audio"):
+                return self.__mixer.mix(self.__chunk_size)
+        with TRACER.span("stream_in.read", "audio"):
+            try:
+                return self.__stream_in.read(self.__chunk_size)  # type: ignore
+            except OSError as error:
+                if error.errno != paInputOverflowed:
+                    raise
+                return None
+
     def __stream_audio(self) -> None:
-        """Stream audio from the microphone to the transmitter"""
-        self.__stream_in.start_stream()
+        """Stream audio from the microphone, or the mixer, to the
+        transmitter
+        """
+        if self.__mixer:
+            self.__mixer.clear()
+            for stream in self.__mixer_streams:
+                stream.start_stream()
+        else:
+            self.__stream_in.start_stream()  # type: ignore
         self.__stream_out.start_stream()
+        output_capacity = self.__stream_out.get_write_available()
+        chunks = overruns = underruns = 0
+        processing_total = processing_max = 0.0
+        processing_times: list[float] = []
+        chunk_period = self.__chunk_size / self.__sample_rate
+        jitter: list[float] = []
+        last_read_time = None
         print("* transmitting")
         while self.streaming:
-            self.__stream_out.write(self.__stream_in.read(self.__chunk_size))
+            chunk = self.__read_chunk()
+            read_time = perf_counter()
+            if last_read_time is not None:
+                jitter.append(read_time - last_read_time - chunk_period)
+            last_read_time = read_time
+            if chunk is None:
+                overruns += 1
+                continue
+            if chunks and self.__stream_out.get_write_available() >= output_capacity:
+                underruns += 1  # Output buffer ran dry before this chunk
+            processing_start = perf_counter()
+            # Mixing counts as processing, but waiting for the input does not
+            mix_time = self.__mixer.mix_time if self.__mixer else 0.0
+            source = chunk
+            if self.__monitor:
+                with TRACER.span("monitor.filter", "audio"):
+                    chunk = self.__monitor.filter.process(chunk)
+            processing = mix_time + perf_counter() - processing_start
+            with TRACER.span("stream_out.write", "audio"):
+                self.__stream_out.write(chunk)
+            output_time = perf_counter()
+            with TRACER.span("sinks.write", "audio"):
+                for sink in self.__output_sinks:
+                    sink.write(chunk)
+                if self.__monitor:
+                    self.__monitor.submit(chunk, source)
+            processing += perf_counter() - output_time
+            processing_total += processing
+            processing_max = max(processing_max, processing)
+            processing_times.append(processing)
+            chunks += 1
         print("* done transmitting")
-        self.__stream_in.stop_stream()
+        if self.__mixer:
+            for stream in self.__mixer_streams:
+                stream.stop_stream()
+        else:
+            self.__stream_in.stop_stream()  # type: ignore
         self.__stream_out.stop_stream()
+        self.__statistics = {
+            "chunk_size": self.__chunk_size,
+            "chunks": chunks,
+            "overruns": overruns,
+            "underruns": underruns,
+            "processing_mean": processing_total / chunks if chunks else 0.0,
+            "processing_max": processing_max,
+            "processing_p99": (
+                sorted(processing_times)[int(len(processing_times) * 0.99)]
+                if processing_times else 0.0
+            ),
+            **jitter_percentiles(jitter)
+        }
+        if self.__realtime:
+            print(
+                "Loop jitter:",
+                ", ".join(
+                    f"{name.removeprefix('jitter_')} {self.__statistics[name] * 1000:.2f} ms"
+                    for name in ("jitter_p50", "jitter_p99", "jitter_max")
+                )
+            )
+        if self.__tuner:
+            self.__tune(
+                chunks, overruns + underruns, self.__statistics["processing_p99"]
+            )
+
+    def __tune(self, chunks: int, xruns: int, processing_p99: float) -> None:
+        """Record a transmission with the chunk size tuner and reopen the
+        streams if it chooses a new chunk size
+
+        Parameters
+        ----------
+        chunks: The number of chunks streamed
+        xruns: The number of underruns and overruns which occurred
+        processing_p99: The 99th percentile of the seconds spent processing
+            a chunk, so one slow chunk does not mark a size unstable
+        """
+        chunk_period = self.__chunk_size / self.__sample_rate
+        chunk_size = self.__tuner.record(  # type: ignore
+            chunks, xruns, processing_p99 / chunk_period
+        )
+        if chunk_size == self.__chunk_size:
+            return
+        self.__close_input_streams()
+        self.__stream_out.close()
+        self.__chunk_size = chunk_size
+        self.__open_streams()
+        print("Audio chunk size tuned to", chunk_size, "frames")
 
     def close(self) -> None:
         """Close the audio streamer"""
         self.__kill_flag.set()
         self.__transmit_flag.set()
         sleep(0.2)
-        self.__stream_in.close()
+        self.__close_input_streams()
         self.__stream_out.close()
+        for sink in self.__output_sinks:
+            sink.close()
+        if self.__monitor:
+            self.__monitor.close()
         self.__audio.terminate()
 
     def run(self) -> None:
         """Begin the audio streamer thread"""
+        if self.__monitor:
+            self.__monitor.start()
+        if self.__realtime:
+            status = self.__realtime.apply()
+            print(
+                "Audio thread scheduled with", status["policy"],
+                f"priority {status['priority']} on CPUs {status['cpus']}"
+            )
         print("Ready to transmit")
         while not self.__kill_flag.is_set():
             self.__transmit_flag.wait()
             if self.__kill_flag.is_set():
                 break
-            self.__stream_audio()
+            with self.__realtime.streaming() if self.__realtime else nullcontext():
+                self.__stream_audio()
 
     def start_streaming(self) -> None:
         """Start streaming audio"""
@@ -0,0 +1,26 @@
+""" A package of destinations for streamed audio beyond the local sound device
+
+Modules
+-------
+adpcm_audio_sink: An audio sink which compresses chunks with IMA-ADPCM before
+    passing them on to another sink
+interface: Interface for a destination to which audio chunks are written
+udp_audio_sink: An audio sink which sends chunks as sequenced, timestamped
+    UDP packets to remote nodes
+
+Exports
+-------
+Classes:
+    AdpcmAudioSink: An audio sink which compresses chunks with IMA-ADPCM
+        before passing them on to another sink
+    IAudioSink: Interface for a destination to which audio chunks are written
+    UdpAudioSink: An audio sink which sends chunks as sequenced, timestamped
+        UDP packets to remote nodes
+Constants:
+    PACKET_HEADER: The struct of the header preceding each audio packet's
+        payload
+"""
+
+from .adpcm_audio_sink import AdpcmAudioSink
+from .interface import IAudioSink
+from .udp_audio_sink import PACKET_HEADER, UdpAudioSink
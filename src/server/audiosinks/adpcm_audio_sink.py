@@ -0,0 +1,45 @@
+""" An audio sink which compresses chunks with IMA-ADPCM before passing them on
+    to another sink
+
+Exports
+-------
+AdpcmAudioSink: An audio sink which compresses chunks with IMA-ADPCM before
+    passing them on to another sink
+"""
+
+from ima_adpcm import ImaAdpcmEncoder
+
+from .interface import IAudioSink
+
+
+class AdpcmAudioSink(IAudioSink):
+    """An audio sink which compresses chunks with IMA-ADPCM before passing
+    them on to another sink
+
+    Methods
+    -------
+    close: Close the sink and the sink it wraps
+    write: Encode a chunk of audio and write it to the wrapped sink
+    """
+
+    def __init__(self, sink: IAudioSink, audio_channels: int = 2) -> None:
+        """Parameters
+        ----------
+        sink: The sink to which encoded chunks are written
+        audio_channels (Optional): The number of interleaved audio channels
+        """
+        self.__encoder = ImaAdpcmEncoder(audio_channels)
+        self.__sink = sink
+
+    def close(self) -> None:
+        """Close the sink and the sink it wraps"""
+        self.__sink.close()
+
+    def write(self, chunk: bytes) -> None:
+        """Encode a chunk of audio and write it to the wrapped sink
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames to encode
+        """
+        self.__sink.write(self.__encoder.encode(chunk))
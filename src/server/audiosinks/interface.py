@@ -0,0 +1,31 @@
+""" Interface for a destination to which audio chunks are written
+
+Exports
+-------
+IAudioSink: Interface for a destination to which audio chunks are written
+"""
+
+from abc import ABC, abstractmethod
+
+
+class IAudioSink(ABC):
+    """Interface for a destination to which audio chunks are written
+
+    Abstract Methods
+    -------
+    close: Close the sink
+    write: Write a chunk of audio to the sink
+    """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the sink"""
+
+    @abstractmethod
+    def write(self, chunk: bytes) -> None:
+        """Write a chunk of audio to the sink without blocking the audio path
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames to write
+        """
@@ -0,0 +1,142 @@
+""" An audio sink which sends chunks as sequenced, timestamped UDP packets to
+    remote nodes
+
+Exports
+-------
+PACKET_HEADER: The struct of the header preceding each audio packet's payload
+UdpAudioSink: An audio sink which sends chunks as sequenced, timestamped UDP
+    packets to remote nodes
+"""
+
+from heapq import heappop, heappush
+from ipaddress import ip_address
+from random import Random
+from socket import (
+    AF_INET, IP_MULTICAST_TTL, IPPROTO_IP, SOCK_DGRAM, gethostbyname, socket
+)
+from struct import Struct
+from threading import Condition, Thread
+from time import monotonic, time_ns
+
+from .interface import IAudioSink
+
+
+PACKET_HEADER = Struct("!Iq")  # Sequence number, capture timestamp in ns since the epoch
+
+
+class UdpAudioSink(IAudioSink):
+    """An audio sink which sends chunks as sequenced, timestamped UDP packets
+    to remote nodes
+
+    Each packet is a PACKET_HEADER followed by the chunk's interleaved 16-bit
+    frames. Loss and jitter can be simulated for testing, in which case
+    delayed packets are sent from a background thread and may be reordered.
+
+    Attributes
+    ----------
+    addresses: The (host, port) destinations, unicast or multicast
+    packets_sent: The number of packets handed to the network
+
+    Methods
+    -------
+    close: Close the sink
+    write: Packetize a chunk of audio and send it to all destinations
+    """
+
+    def __init__(
+        self,
+        addresses: list[tuple[str, int]],
+        multicast_ttl: int = 1,
+        loss_rate: float = 0.0,
+        jitter: float = 0.0,
+        seed: int | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        addresses: The (host, port) destinations, unicast or multicast, with
+            hosts as IPv4 addresses or host names
+        multicast_ttl (Optional): The time-to-live of multicast packets
+        loss_rate (Optional): The simulated fraction of packets to drop
+        jitter (Optional): The maximum simulated delay of packets in seconds
+        seed (Optional): The seed for simulated loss and jitter
+
+        Raises
+        ------
+        OSError: If a host name could not be resolved
+        """
+        self.addresses = addresses
+        self.packets_sent = 0
+        self.__jitter = jitter
+        self.__loss_rate = loss_rate
+        self.__random = Random(seed)
+        # Resolve host names once, rather than on every packet sent
+        self.__resolved = [(gethostbyname(host), port) for host, port in addresses]
+        self.__sequence = 0
+        self.__socket = socket(AF_INET, SOCK_DGRAM)
+        if any(ip_address(host).is_multicast for host, _ in self.__resolved):
+            self.__socket.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL, multicast_ttl)
+        self.__closed = False
+        self.__delayed: list[tuple[float, int, bytes]] = []
+        self.__delayed_condition = Condition()
+        self.__delay_thread: Thread | None = None
+        if jitter > 0:
+            self.__delay_thread = Thread(target=self.__send_delayed, daemon=True)
+            self.__delay_thread.start()
+
+    def close(self) -> None:
+        """Close the sink, discarding any packets still being delayed"""
+        with self.__delayed_condition:
+            self.__closed = True
+            self.__delayed_condition.notify()
+        if self.__delay_thread is not None:
+            self.__delay_thread.join()
+        self.__socket.close()
+
+    def write(self, chunk: bytes) -> None:
+        """Packetize a chunk of audio and send it to all destinations
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit audio frames to send
+        """
+        packet = PACKET_HEADER.pack(self.__sequence, time_ns()) + chunk
+        self.__sequence = (self.__sequence + 1) & 0xFFFFFFFF
+        if self.__loss_rate and self.__random.random() < self.__loss_rate:
+            return
+        if self.__delay_thread is None:
+            self.__send(packet)
+            return
+        send_time = monotonic() + self.__random.uniform(0, self.__jitter)
+        with self.__delayed_condition:
+            heappush(self.__delayed, (send_time, self.__sequence, packet))
+            self.__delayed_condition.notify()
+
+    def __send(self, packet: bytes) -> None:
+        """Send a packet to all destinations
+
+        Parameters
+        ----------
+        packet: The packet to send
+        """
+        for address in self.__resolved:
+            try:
+                self.__socket.sendto(packet, address)
+            except OSError:
+                continue
+        self.packets_sent += 1
+
+    def __send_delayed(self) -> None:
+        """Send delayed packets once their simulated delay has elapsed"""
+        while True:
+            with self.__delayed_condition:
+                while not self.__closed and (
+                    not self.__delayed or self.__delayed[0][0] > monotonic()
+                ):
+                    timeout = None
+                    if self.__delayed:
+                        timeout = self.__delayed[0][0] - monotonic()
+                    self.__delayed_condition.wait(timeout)
+                if self.__closed:
+                    return
+                _, _, packet = heappop(self.__delayed)
+            self.__send(packet)
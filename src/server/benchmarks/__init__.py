@@ -0,0 +1,25 @@
+""" Benchmarks for the server, run from the server directory with
+    `python -m benchmarks.<module>`
+
+Modules
+-------
+audio_mixer_cost: Benchmark of multi-input mixing cost and drift
+    compensation with simulated inputs whose clocks drift from the
+    reference's
+audio_pipeline: Benchmark suite of the audio pipeline over virtual sound
+    devices, across chunk sizes, channel counts and processing options
+audio_network_jitter: Benchmark of networked audio distribution over
+    localhost with simulated loss and jitter
+coordination_failover: Benchmark of coordinated multi-server operation, with
+    primary and standby server processes sharing simulated network bridge
+    nodes
+ima_adpcm_codec: Benchmark of IMA-ADPCM codec throughput and quality
+latency_calibration_accuracy: Benchmark of latency calibration accuracy
+    against simulated paths of known delay and noise
+realtime_jitter: Benchmark of audio loop jitter under CPU, GIL and garbage
+    collector stress, with and without the real-time profile
+transmit_channel_latency: Benchmark of channel transmission latency to many
+    simulated network bridge nodes
+zone_ptt_latency: Benchmark of PTT latency with concurrent zones over
+    simulated network bridge nodes
+"""
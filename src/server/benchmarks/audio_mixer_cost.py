@@ -0,0 +1,126 @@
+""" Benchmark of multi-input mixing cost and drift compensation with
+    simulated inputs whose clocks drift from the reference's
+
+Exports
+-------
+run_benchmark: Measure per-chunk mixing cost and drift tracking for a number
+    of inputs
+"""
+
+
+from argparse import ArgumentParser
+from math import pi
+
+import numpy as np
+
+from audio_mixer import AudioMixer, MixerInput
+
+
+def run_benchmark(
+    input_count: int,
+    chunk_size: int = 1024,
+    callback_size: int = 256,
+    sample_rate: int = 44100,
+    audio_channels: int = 2,
+    duration: float = 300.0,
+    max_drift_ppm: float = 300.0,
+    callback_jitter: float = 0.002,
+    seed: int = 0
+) -> dict[str, float]:
+    """Measure per-chunk mixing cost and drift tracking for a number of
+    inputs, each delivering chunks at its own slightly wrong sample rate,
+    with its own phase and with jittered callback times
+
+    Parameters
+    ----------
+    input_count: The number of inputs to mix
+    chunk_size (Optional): The number of frames per chunk
+    callback_size (Optional): The number of frames delivered per input
+        callback
+    sample_rate (Optional): The nominal sample rate of the inputs
+    audio_channels (Optional): The number of interleaved audio channels
+    duration (Optional): The seconds of audio to mix
+    max_drift_ppm (Optional): The largest clock drift of an input from the
+        reference, in parts per million
+    callback_jitter (Optional): The standard deviation of callback times in
+        seconds
+    seed (Optional): The seed for the inputs' drifts
+
+    Returns
+    -------
+    The benchmark results
+    """
+    random = np.random.default_rng(seed)
+    drifts = np.concatenate((
+        [0.0], random.uniform(-max_drift_ppm, max_drift_ppm, input_count - 1) * 1e-6
+    ))
+    inputs = [
+        MixerInput(f"input {i}", audio_channels=audio_channels, gain=0.5)
+        for i in range(input_count)
+    ]
+    mixer = AudioMixer(inputs, audio_channels)
+    for mixer_input in inputs:
+        mixer_input.active = True
+
+    # Each input plays a tone, delivered in chunks at its drifted rate
+    chunk_period = chunk_size / sample_rate
+    periods = callback_size / sample_rate / (1 + drifts)
+    # The reference's callbacks pace the mixing, so only the others jitter
+    jitters = np.full(input_count, callback_jitter)
+    jitters[0] = 0
+    nominal_arrivals = random.uniform(0, periods[0], input_count)
+    nominal_arrivals[0] = 0
+    arrivals = nominal_arrivals + random.normal(0, jitters)
+    times = np.arange(callback_size) / sample_rate
+    tone = np.repeat(
+        (8000 * np.sin(2 * pi * 440 * times)).astype(np.int16)[:, None],
+        audio_channels,
+        axis=1
+    ).tobytes()
+    chunks = int(duration / chunk_period)
+    ratios = []
+    for chunk in range(chunks):
+        pull_time = (chunk + 1) * chunk_period
+        for i, mixer_input in enumerate(inputs):
+            while arrivals[i] <= pull_time:
+                mixer_input.push(tone)
+                nominal_arrivals[i] += periods[i]
+                arrivals[i] = nominal_arrivals[i] + random.normal(0, jitters[i])
+        mixer.mix(chunk_size)
+        if chunk >= chunks // 2:
+            ratios.append([mixer_input.statistics["ratio"] for mixer_input in inputs])
+
+    statistics = mixer.statistics
+    input_statistics = list(statistics["inputs"].values())
+    # Once settled, an input's mean ratio matches its drift, and any
+    # variation about it is heard as pitch wobble
+    settled_ratios = np.array(ratios)
+    tracking_errors = np.abs(settled_ratios.mean(axis=0) - 1 - drifts) * 1e6
+    ratio_jitter = settled_ratios.std(axis=0) * 1e6
+    return {
+        "inputs": input_count,
+        "mix_ms_mean": 1000 * statistics["mix_time_mean"],
+        "mix_ms_max": 1000 * statistics["mix_time_max"],
+        "chunk_period_ms": 1000 * chunk_period,
+        "load": statistics["mix_time_mean"] / chunk_period,
+        "underruns": sum(stats["underruns"] for stats in input_statistics),
+        "overflows": sum(stats["overflows"] for stats in input_statistics),
+        "max_tracking_error_ppm": float(tracking_errors.max()),
+        "max_ratio_jitter_ppm": float(ratio_jitter.max())
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--inputs", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--duration", type=float, default=300.0)
+    args = parser.parse_args()
+    for input_count in args.inputs:
+        results = run_benchmark(
+            input_count, args.chunk_size, args.chunk_size // 4, duration=args.duration
+        )
+        print(", ".join(
+            f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}"
+            for key, value in results.items()
+        ))
@@ -0,0 +1,137 @@
+""" Benchmark of networked audio distribution over localhost with simulated
+    loss and jitter
+
+Exports
+-------
+ClockedOutput: An output which consumes audio at the rate of a sound device
+run_benchmark: Stream synthetic audio through a UdpAudioSink to a ReceiverNode
+"""
+
+
+from argparse import ArgumentParser
+from array import array
+from math import pi, sin
+from socket import AF_INET, SOCK_DGRAM, socket
+from time import perf_counter, sleep
+
+from audio_receiver_node import JitterBuffer, ReceiverNode
+from audiosinks import UdpAudioSink
+
+
+class ClockedOutput:
+    """An output which consumes audio at the rate of a sound device whose
+    clock runs at a given offset from nominal
+
+    Methods
+    -------
+    write: Block for the duration of a chunk of audio
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        drift_ppm: float = 0.0
+    ) -> None:
+        """Parameters
+        ----------
+        sample_rate (Optional): The nominal sample rate of the device
+        audio_channels (Optional): The number of interleaved audio channels
+        drift_ppm (Optional): The device clock's offset from nominal in parts
+            per million
+        """
+        self.__frame_rate = sample_rate * (1 + drift_ppm / 1e6)
+        self.__frame_size = 2 * audio_channels
+        self.__deadline: float | None = None
+
+    def write(self, chunk: bytes) -> None:
+        """Block for the duration of a chunk of audio
+
+        Parameters
+        ----------
+        chunk: The chunk being played
+        """
+        if self.__deadline is None:
+            self.__deadline = perf_counter()
+        self.__deadline += len(chunk) / self.__frame_size / self.__frame_rate
+        remaining = self.__deadline - perf_counter()
+        if remaining > 0:
+            sleep(remaining)
+
+
+def run_benchmark(
+    duration: float = 10.0,
+    chunk_size: int = 1024,
+    loss_rate: float = 0.02,
+    jitter: float = 0.02,
+    drift_ppm: float = 200.0,
+    target_latency: float = 0.06,
+    sample_rate: int = 44100,
+    audio_channels: int = 2
+) -> dict[str, float]:
+    """Stream synthetic audio through a UdpAudioSink to a ReceiverNode
+
+    Parameters
+    ----------
+    duration (Optional): How long to stream for in seconds
+    chunk_size (Optional): The number of frames per packet
+    loss_rate (Optional): The simulated fraction of packets lost
+    jitter (Optional): The maximum simulated packet delay in seconds
+    drift_ppm (Optional): The receiver's device clock offset in parts per
+        million
+    target_latency (Optional): The jitter buffer's minimum target latency in
+        seconds
+    sample_rate (Optional): The sample rate of the audio
+    audio_channels (Optional): The number of interleaved audio channels
+
+    Returns
+    -------
+    The jitter buffer's statistics
+    """
+    with socket(AF_INET, SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    node = ReceiverNode(
+        ClockedOutput(sample_rate, audio_channels, drift_ppm),
+        port,
+        jitter_buffer=JitterBuffer(
+            sample_rate, audio_channels, target_latency=target_latency
+        ),
+        sample_rate=sample_rate,
+        audio_channels=audio_channels
+    )
+    node.start()
+    sink = UdpAudioSink(
+        [("127.0.0.1", port)], loss_rate=loss_rate, jitter=jitter, seed=0
+    )
+    tone = array("h", (
+        int(8000 * sin(2 * pi * 440 * i / sample_rate))
+        for i in range(chunk_size) for _ in range(audio_channels)
+    )).tobytes()
+    source = ClockedOutput(sample_rate, audio_channels)
+    end_time = perf_counter() + duration
+    while perf_counter() < end_time:
+        source.write(tone)  # Pace capture at the sender's nominal rate
+        sink.write(tone)
+    sleep(0.5)
+    sink.close()
+    node.close()
+    node.join()
+    return node.jitter_buffer.statistics
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--loss-rate", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--drift-ppm", type=float, default=200.0)
+    parser.add_argument("--target-latency", type=float, default=0.06)
+    args = parser.parse_args()
+    statistics = run_benchmark(
+        args.duration, args.chunk_size, args.loss_rate, args.jitter,
+        args.drift_ppm, args.target_latency
+    )
+    for name, value in statistics.items():
+        print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
@@ -0,0 +1,308 @@
+""" Benchmark suite of the audio pipeline over virtual sound devices, across
+    chunk sizes, channel counts and processing options
+
+Each configuration is streamed three times through the audio streamer with
+a fake PyAudio backend:
+
+- in real time with scheduling jitter, for the latency from each chunk's
+  capture to its playback and the underrun and overrun rates
+- in virtual time, as fast as possible, for the throughput
+- in virtual time under tracemalloc, for the memory allocated per chunk
+
+CPython does not count allocations, so allocations per chunk are measured
+as the peak bytes traced above the level at the start of each chunk, and
+the net blocks retained.
+
+Results are appended as a JSON line to an output file, by default in the
+untracked benchmarks/results directory, with the platform, Python version
+and commit, for comparing trends across runs.
+
+Exports
+-------
+PROCESSING_OPTIONS: The processing options benchmarked
+run_benchmark: Benchmark the audio pipeline across configurations
+run_configuration: Benchmark the audio pipeline in one configuration
+"""
+
+
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from json import dumps
+from os import devnull
+from pathlib import Path
+from platform import platform, python_version
+from socket import AF_INET, SOCK_DGRAM, socket
+from subprocess import DEVNULL, CalledProcessError, check_output
+from time import perf_counter, sleep
+from typing import Any, Callable
+
+import numpy as np
+
+from audio_monitor import AudioMonitor
+from audio_streamer import AudioStreamer
+from audiosinks import AdpcmAudioSink, UdpAudioSink
+from fake_pyaudio import (
+    FakePyAudio, SimulatedClock, VirtualInput, VirtualOutput, sine
+)
+
+
+PROCESSING_OPTIONS = ("none", "monitor", "highpass", "adpcm_udp")
+
+
+def _stream(
+    streamer: AudioStreamer, done: Callable[[], bool]
+) -> dict[str, float]:
+    """Stream until done and shut the streamer down
+
+    Parameters
+    ----------
+    streamer: The audio streamer
+    done: Polled until it returns True to stop streaming
+
+    Returns
+    -------
+    The streamer's statistics of the transmission
+    """
+    previous = streamer.statistics
+    streamer.start()
+    streamer.start_streaming()
+    while not done():
+        sleep(0.005)
+    streamer.stop_streaming()
+    while streamer.statistics is previous:
+        sleep(0.001)
+    statistics = streamer.statistics
+    streamer.close()
+    streamer.join()
+    return statistics
+
+
+def run_configuration(
+    chunk_size: int,
+    audio_channels: int,
+    processing: str,
+    duration: float = 2.0,
+    throughput_seconds: float = 20.0,
+    allocation_chunks: int = 200,
+    jitter: float = 0.0005,
+    sample_rate: int = 44100,
+    source: str | Path | None = None
+) -> dict[str, Any]:
+    """Benchmark the audio pipeline in one configuration
+
+    Parameters
+    ----------
+    chunk_size: The number of frames per chunk
+    audio_channels: The number of interleaved audio channels
+    processing: The processing option, one of PROCESSING_OPTIONS
+    duration (Optional): The seconds to stream in real time
+    throughput_seconds (Optional): The seconds of audio to stream as fast as
+        possible
+    allocation_chunks (Optional): The number of chunks to trace allocations
+        of
+    jitter (Optional): The mean scheduling delay of each read in real time,
+        in seconds
+    sample_rate (Optional): The sample rate of the audio
+    source (Optional): The WAV file to stream, or None for a sine tone
+
+    Returns
+    -------
+    The configuration and its measurements, with times in seconds
+
+    Raises
+    ------
+    ValueError: If the processing option is unknown
+    """
+    if processing not in PROCESSING_OPTIONS:
+        raise ValueError(f"Unknown processing option '{processing}'")
+    with socket(AF_INET, SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))  # Absorbs the UDP sink's packets
+
+        def make_streamer(
+            clock: SimulatedClock,
+            jitter: float,
+            on_write: Callable[[], None] | None = None
+        ) -> tuple[AudioStreamer, VirtualInput, VirtualOutput]:
+            microphone = VirtualInput("Virtual Microphone", source or sine(440))
+            headphones = VirtualOutput("Virtual Headphones", False, on_write)
+            monitor = None
+            sinks = []
+            if processing in ("monitor", "highpass"):
+                monitor = AudioMonitor(sample_rate, audio_channels)
+                if processing == "highpass":
+                    monitor.filter.highpass_cutoff = 100
+                    monitor.filter.gain = 0.8
+            elif processing == "adpcm_udp":
+                sinks = [AdpcmAudioSink(
+                    UdpAudioSink([receiver.getsockname()]), audio_channels
+                )]
+            streamer = AudioStreamer(
+                audio_channels, chunk_size, sample_rate,
+                microphone.name, headphones.name, sinks, monitor=monitor,
+                audio_backend=FakePyAudio([microphone], [headphones], clock, jitter)
+            )
+            return streamer, microphone, headphones
+
+        # Real time, for latency and underruns
+        streamer, microphone, headphones = make_streamer(SimulatedClock(), jitter)
+        clock_start = perf_counter()
+        statistics = _stream(streamer, lambda: perf_counter() - clock_start > duration)
+        chunks = len(headphones.writes)
+        latencies = np.array([
+            play_time - capture_time
+            for (_, play_time, _), capture_time
+            in zip(headphones.writes, microphone.capture_times)
+        ])
+
+        # Virtual time, for throughput
+        write_times: list[float] = []
+        target_chunks = max(int(throughput_seconds * sample_rate / chunk_size), 2)
+        streamer, _, headphones = make_streamer(
+            SimulatedClock(None), 0.0, lambda: write_times.append(perf_counter())
+        )
+        _stream(streamer, lambda: len(write_times) >= target_chunks)
+        throughput_chunks = len(write_times) - 1
+        throughput_time = write_times[-1] - write_times[0]
+
+        # Virtual time under tracemalloc, for allocations
+        allocated: list[int] = []
+        blocks: list[int] = []
+        levels = [0]
+
+        def sample_allocations() -> None:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated.append(peak - levels[-1])
+            levels.append(current)
+            tracemalloc.reset_peak()
+            blocks.append(sys.getallocatedblocks())
+
+        streamer, _, _ = make_streamer(SimulatedClock(None), 0.0, sample_allocations)
+        tracemalloc.start()
+        levels.append(tracemalloc.get_traced_memory()[0])
+        try:
+            _stream(streamer, lambda: len(allocated) >= allocation_chunks)
+        finally:
+            tracemalloc.stop()
+        allocated = allocated[1:]  # The first chunk includes starting up
+
+    return {
+        "chunk_size": chunk_size,
+        "audio_channels": audio_channels,
+        "processing": processing,
+        "chunks": chunks,
+        "throughput_realtime_factor": (
+            throughput_chunks * chunk_size / sample_rate / throughput_time
+        ),
+        "throughput_chunks_per_second": throughput_chunks / throughput_time,
+        "latency_p50": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "latency_p99": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "latency_max": float(latencies.max()) if len(latencies) else None,
+        "processing_mean": statistics["processing_mean"],
+        "processing_max": statistics["processing_max"],
+        "processing_p99": statistics["processing_p99"],
+        "loop_jitter_p99": statistics["jitter_p99"],
+        "underrun_rate": statistics["underruns"] / chunks if chunks else None,
+        "overrun_rate": statistics["overruns"] / chunks if chunks else None,
+        "allocated_bytes_per_chunk": float(np.median(allocated)),
+        "retained_blocks_per_chunk": (blocks[-1] - blocks[1]) / max(len(blocks) - 2, 1)
+    }
+
+
+def run_benchmark(
+    chunk_sizes: list[int],
+    channel_counts: list[int],
+    processing_options: list[str],
+    **options: Any
+) -> list[dict[str, Any]]:
+    """Benchmark the audio pipeline across configurations
+
+    Parameters
+    ----------
+    chunk_sizes: The numbers of frames per chunk to benchmark
+    channel_counts: The numbers of audio channels to benchmark
+    processing_options: The processing options to benchmark
+    options: Further arguments for run_configuration
+
+    Returns
+    -------
+    The results of each configuration
+    """
+    return [
+        run_configuration(chunk_size, audio_channels, processing, **options)
+        for chunk_size in chunk_sizes
+        for audio_channels in channel_counts
+        for processing in processing_options
+    ]
+
+
+def _get_commit() -> str | None:
+    """Get the current git commit, for comparing trends
+
+    Returns
+    -------
+    The short commit hash, or None if not in a git repository
+    """
+    try:
+        return check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=DEVNULL, text=True
+        ).strip()
+    except (OSError, CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 2])
+    parser.add_argument(
+        "--processing", nargs="+", default=list(PROCESSING_OPTIONS),
+        choices=PROCESSING_OPTIONS
+    )
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--throughput-seconds", type=float, default=20.0)
+    parser.add_argument("--allocation-chunks", type=int, default=200)
+    parser.add_argument("--jitter", type=float, default=0.0005)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--source", type=Path, default=None, help="WAV file to stream")
+    parser.add_argument(
+        "--output", type=Path,
+        default=Path(__file__).parent / "results" / "audio_pipeline_results.jsonl",
+        help="JSON lines file to append the results to"
+    )
+    args = parser.parse_args()
+    with open(devnull, "w", encoding="utf-8") as null, redirect_stdout(null):
+        results = run_benchmark(
+            args.chunk_sizes, args.channels, args.processing,
+            duration=args.duration,
+            throughput_seconds=args.throughput_seconds,
+            allocation_chunks=args.allocation_chunks,
+            jitter=args.jitter,
+            sample_rate=args.sample_rate,
+            source=args.source
+        )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "a", encoding="utf-8") as output_file:
+        output_file.write(dumps({
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "platform": platform(),
+            "python": python_version(),
+            "commit": _get_commit(),
+            "parameters": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+            "results": results
+        }) + "\n")
+    for result in results:
+        print(
+            f"{result['chunk_size']:5d} frames, {result['audio_channels']} ch,",
+            f"{result['processing']:10s}:",
+            f"{result['throughput_realtime_factor']:7.1f}x real time,",
+            f"latency p99 {(result['latency_p99'] or 0) * 1000:6.2f} ms,",
+            f"{result['allocated_bytes_per_chunk'] / 1024:7.1f} KiB/chunk,",
+            f"underruns {(result['underrun_rate'] or 0) * 100:.1f}%"
+        )
+    print("Results appended to", args.output)
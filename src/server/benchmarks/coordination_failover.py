@@ -0,0 +1,368 @@
+""" Benchmark of coordinated multi-server operation, with primary and standby
+    server processes sharing simulated network bridge nodes
+
+Exports
+-------
+run_benchmark: Measure failover time from a killed primary server to its
+    standby, recovery time from a killed standalone coordinator, and floor
+    request latency
+"""
+
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from json import dumps, loads
+from multiprocessing import Process, Queue
+from os import devnull
+from queue import Empty
+from socket import create_connection, create_server
+from statistics import median
+from time import monotonic, perf_counter, sleep
+
+from asyncmassclients import SocketMassClient
+from bridge_simulator import BridgeSimulator
+from channel_transmitter import ChannelTransmitter
+from coordination import CoordinationClient, Coordinator
+
+
+def _free_address() -> tuple[str, int]:
+    """Get a free local address for a coordinator
+
+    Returns
+    -------
+    The (host, port) of the address
+    """
+    with create_server(("127.0.0.1", 0)) as server:
+        return server.getsockname()
+
+
+def _lease_owners(address: tuple[str, int]) -> dict[str, str] | None:
+    """Read the owners of all leases from a coordinator, without acquiring
+    any
+
+    Parameters
+    ----------
+    address: The (host, port) of the coordinator
+
+    Returns
+    -------
+    A dictionary mapping resources to the owners of their leases, or None
+        if no coordinator is reachable
+    """
+    try:
+        with create_connection(address, timeout=1.0) as connection:
+            with connection.makefile("rwb") as stream:
+                for request in (
+                    {"op": "hello", "client": "probe"}, {"op": "sync", "version": -1}
+                ):
+                    stream.write(dumps(request).encode() + b"\n")
+                    stream.flush()
+                    response = loads(stream.readline())
+                return response["leases"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _run_coordinator(address: tuple[str, int]) -> None:
+    """Run a standalone coordinator process until killed
+
+    Parameters
+    ----------
+    address: The (host, port) to listen on
+    """
+    coordinator = Coordinator(address)
+    coordinator.start()
+    coordinator.join()
+
+
+def _run_server(
+    name: str,
+    hosts: list[str],
+    address: tuple[str, int],
+    lease_time: float,
+    events: Queue
+) -> None:
+    """Run a coordinated server process, reporting when it is ready and when
+    it becomes primary
+
+    Parameters
+    ----------
+    name: The name of the server
+    hosts: The bridge node names to share
+    address: The (host, port) of the coordinator
+    lease_time: The seconds a lease lasts without renewal
+    events: The queue to report events to
+    """
+    with open(devnull, "w", encoding="utf-8") as null, redirect_stdout(null):
+        coordinator = CoordinationClient(name, address, lease_time)
+        client = SocketMassClient(
+            hosts=hosts, max_workers=len(hosts), coordinator=coordinator
+        )
+        transmitter = ChannelTransmitter(9, client, coordinator)
+        events.put(("ready", name, transmitter.standby, len(client.ports)))
+        if not transmitter.standby:
+            sleep(3600)  # Serve as primary until killed
+        while transmitter.standby:
+            sleep(0.0005)
+        promoted_time = monotonic()
+        transmitter.channel = 1
+        transmitted = transmitter.transmit_channel()
+        events.put((
+            "primary", name, promoted_time, monotonic(), len(client.ports), transmitted
+        ))
+        sleep(3600)
+
+
+def run_benchmark(
+    transmitters: int = 16,
+    trials: int = 5,
+    lease_time: float = 2.0,
+    floor_requests: int = 200,
+    pulse_width: float = 0.005
+) -> dict[str, float]:
+    """Measure failover time from a killed primary server to its standby,
+    recovery time from a killed standalone coordinator, and floor request
+    latency
+
+    Each trial starts a primary server process, which hosts the coordinator
+    and validates the transmitters, then a standby server process, then
+    kills the primary. The standby must take over every transmitter from the
+    published state and transmit a channel to them. Each trial then repeats
+    with a standalone coordinator process, which is killed instead: a server
+    must host a replacement to which the primary reclaims every transmitter
+    while the standby stays on standby, and the standby must still take over
+    once the primary is killed too.
+
+    Parameters
+    ----------
+    transmitters (Optional): The number of simulated transmitters
+    trials (Optional): The number of failovers to time
+    lease_time (Optional): The seconds a lease lasts without renewal
+    floor_requests (Optional): The number of floor requests to time
+    pulse_width (Optional): The simulated MCU pulse width in seconds
+
+    Returns
+    -------
+    The median seconds from killing the primary until the standby held its
+    transmitters and until it had transmitted a channel to them, from
+    killing the coordinator until the primary held its transmitters on a
+    replacement, and from then killing the primary until the standby held
+    its transmitters, and the median seconds to request and release a
+    zone's floor
+
+    Raises
+    ------
+    RuntimeError: If servers contend for transmitters, floors are granted to
+        more than one server, or a failover fails
+    """
+    simulators = [BridgeSimulator(pulse_width=pulse_width) for _ in range(transmitters)]
+    for simulator in simulators:
+        simulator.start()
+    hosts = [simulator.port for simulator in simulators]
+    takeovers = []
+    first_transmissions = []
+    floor_times = []
+    recoveries = []
+    coordinator_takeovers = []
+    try:
+        for trial in range(trials):
+            recovery, takeover = _kill_coordinator(trial, hosts, lease_time)
+            recoveries.append(recovery)
+            coordinator_takeovers.append(takeover)
+            address = _free_address()
+            events: Queue = Queue()
+            servers = [
+                Process(
+                    target=_run_server,
+                    args=(f"server{trial}-{role}", hosts, address, lease_time, events),
+                    daemon=True
+                )
+                for role in ("primary", "standby")
+            ]
+            try:
+                readiness = []
+                for server in servers:
+                    server.start()
+                    readiness.append(events.get(timeout=30))
+                (_, _, primary_standby, primary_ports), (_, _, standby_standby, standby_ports) = readiness
+                if primary_standby or not standby_standby:
+                    raise RuntimeError("Servers did not settle into primary and standby")
+                if primary_ports != transmitters or standby_ports:
+                    raise RuntimeError(
+                        f"Servers contended for transmitters: primary opened"
+                        f" {primary_ports}, standby opened {standby_ports}"
+                    )
+
+                if trial == 0:
+                    floor_times = _time_floors(address, lease_time, floor_requests)
+
+                sleep(lease_time)  # Let the standby synchronize the published state
+                servers[0].kill()
+                kill_time = monotonic()
+                _, _, promoted_time, transmitted_time, ports, transmitted = events.get(
+                    timeout=30
+                )
+                if ports != transmitters or not transmitted:
+                    raise RuntimeError(
+                        f"Standby took over {ports} of {transmitters} transmitters"
+                    )
+                takeovers.append(promoted_time - kill_time)
+                first_transmissions.append(transmitted_time - kill_time)
+            finally:
+                for server in servers:
+                    server.kill()
+                    server.join()
+    finally:
+        for simulator in simulators:
+            simulator.close()
+    return {
+        "takeover": median(takeovers),
+        "first_transmission": median(first_transmissions),
+        "coordinator_recovery": median(recoveries),
+        "coordinator_takeover": median(coordinator_takeovers),
+        "floor": median(floor_times)
+    }
+
+
+def _kill_coordinator(
+    trial: int, hosts: list[str], lease_time: float
+) -> tuple[float, float]:
+    """Kill a standalone coordinator under a primary and standby server,
+    then the primary
+
+    Parameters
+    ----------
+    trial: The number of the trial, to name the servers
+    hosts: The bridge node names to share
+    lease_time: The seconds a lease lasts without renewal
+
+    Returns
+    -------
+    The seconds from killing the coordinator until the primary held its
+        role and transmitters on a replacement, and from then killing the
+        primary until the standby held its transmitters
+
+    Raises
+    ------
+    RuntimeError: If the primary does not reclaim its transmitters, the
+        standby takes over from the live primary, or a failover fails
+    """
+    address = _free_address()
+    events: Queue = Queue()
+    coordinator = Process(target=_run_coordinator, args=(address,), daemon=True)
+    names = [f"server{trial}-coordinated-{role}" for role in ("primary", "standby")]
+    servers = [
+        Process(
+            target=_run_server,
+            args=(name, hosts, address, lease_time, events),
+            daemon=True
+        )
+        for name in names
+    ]
+    processes = [coordinator, *servers]
+    try:
+        coordinator.start()
+        while _lease_owners(address) is None:
+            sleep(0.01)
+        for server in servers:
+            server.start()
+            _, name, standby, _ = events.get(timeout=30)
+            if standby != (name == names[1]):
+                raise RuntimeError("Servers did not settle into primary and standby")
+
+        sleep(lease_time)  # Let the servers synchronize the lease owners
+        coordinator.kill()
+        kill_time = monotonic()
+        expected = {f"port:{host}" for host in hosts} | {"role:primary"}
+        while monotonic() - kill_time < 10 * lease_time:
+            owners = _lease_owners(address) or {}
+            if all(owners.get(resource) == names[0] for resource in expected):
+                break
+            sleep(0.001)
+        else:
+            raise RuntimeError("Primary did not reclaim its transmitters")
+        recovery = monotonic() - kill_time
+        try:
+            event = events.get(timeout=2 * lease_time)
+            raise RuntimeError(f"Standby took over from a live primary: {event}")
+        except Empty:
+            pass
+
+        servers[0].kill()
+        kill_time = monotonic()
+        _, _, promoted_time, _, ports, transmitted = events.get(timeout=30)
+        if ports != len(hosts) or not transmitted:
+            raise RuntimeError(
+                f"Standby took over {ports} of {len(hosts)} transmitters"
+            )
+        return recovery, promoted_time - kill_time
+    finally:
+        for process in processes:
+            process.kill()
+            process.join()
+
+
+def _time_floors(
+    address: tuple[str, int], lease_time: float, requests: int
+) -> list[float]:
+    """Check floors are granted to one client at a time and time requesting
+    and releasing them
+
+    Parameters
+    ----------
+    address: The (host, port) of the coordinator
+    lease_time: The seconds a lease lasts without renewal
+    requests: The number of floor requests to time
+
+    Returns
+    -------
+    The seconds taken to request and release a floor, per request
+
+    Raises
+    ------
+    RuntimeError: If a floor is granted to more than one client
+    """
+    first = CoordinationClient("floor-a", address, lease_time, host=False)
+    second = CoordinationClient("floor-b", address, lease_time, host=False)
+    try:
+        if not first.request_floor("zone") or second.request_floor("zone"):
+            raise RuntimeError("Floor was not granted to exactly one server")
+        first.release_floor("zone")
+        if not second.request_floor("zone"):
+            raise RuntimeError("Released floor was not granted")
+        second.release_floor("zone")
+        times = []
+        for _ in range(requests):
+            start_time = perf_counter()
+            first.request_floor("zone")
+            first.release_floor("zone")
+            times.append(perf_counter() - start_time)
+        return times
+    finally:
+        first.close()
+        second.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--transmitters", type=int, default=16)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--lease-time", type=float, default=2.0)
+    parser.add_argument("--floor-requests", type=int, default=200)
+    parser.add_argument("--pulse-width", type=float, default=0.005)
+    args = parser.parse_args()
+    results = run_benchmark(
+        args.transmitters, args.trials, args.lease_time, args.floor_requests,
+        args.pulse_width
+    )
+    print(
+        f"Failover of {args.transmitters} transmitters:",
+        f"standby took over in {results['takeover'] * 1000:.2f} ms,",
+        f"first channel transmitted after {results['first_transmission'] * 1000:.2f} ms"
+    )
+    print(
+        "Failover of the standalone coordinator:",
+        f"primary reclaimed its transmitters in {results['coordinator_recovery'] * 1000:.2f} ms,",
+        f"standby then took over in {results['coordinator_takeover'] * 1000:.2f} ms"
+    )
+    print(f"Floor request and release: {results['floor'] * 1000:.3f} ms")
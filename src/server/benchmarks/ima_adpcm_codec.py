@@ -0,0 +1,166 @@
+""" Benchmark of IMA-ADPCM codec throughput and quality
+
+Exports
+-------
+load_wav: Load 16-bit audio from a WAV file
+run_benchmark: Measure codec throughput, per-chunk cost and SNR on audio
+synthesize_speech: Generate a speech-like test signal
+"""
+
+
+from argparse import ArgumentParser
+from array import array
+from math import log10, pi, sin
+from random import Random
+from time import perf_counter
+from wave import open as open_wav
+
+from ima_adpcm import ImaAdpcmDecoder, ImaAdpcmEncoder
+
+
+def load_wav(path: str) -> tuple[bytes, int, int]:
+    """Load 16-bit audio from a WAV file
+
+    Parameters
+    ----------
+    path: The path of the WAV file
+
+    Returns
+    -------
+    The interleaved frames, the sample rate and the number of channels
+
+    Raises
+    ------
+    ValueError: If the file is not 16-bit
+    """
+    with open_wav(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path} is not 16-bit audio")
+        return (
+            wav.readframes(wav.getnframes()),
+            wav.getframerate(),
+            wav.getnchannels()
+        )
+
+
+def synthesize_speech(
+    duration: float = 10.0,
+    sample_rate: int = 44100,
+    audio_channels: int = 2,
+    seed: int = 0
+) -> bytes:
+    """Generate a speech-like test signal of voiced syllables with gliding
+    pitch, formant-weighted harmonics and pauses
+
+    Parameters
+    ----------
+    duration (Optional): The duration of the signal in seconds
+    sample_rate (Optional): The sample rate of the signal
+    audio_channels (Optional): The number of interleaved audio channels
+    seed (Optional): The seed for syllable variation
+
+    Returns
+    -------
+    The interleaved 16-bit frames
+    """
+    random = Random(seed)
+    samples = array("h")
+    phase = 0.0
+    while len(samples) < duration * sample_rate * audio_channels:
+        length = int(random.uniform(0.12, 0.3) * sample_rate)
+        pitch = random.uniform(90, 220)
+        formants = (random.uniform(300, 900), random.uniform(900, 2500))
+        for i in range(length):
+            envelope = sin(pi * i / length)
+            phase += 2 * pi * pitch * (1 + 0.1 * i / length) / sample_rate
+            value = 0.0
+            for harmonic in range(1, 30):
+                frequency = harmonic * pitch
+                weight = sum(
+                    1 / (1 + ((frequency - formant) / 150) ** 2)
+                    for formant in formants
+                ) / harmonic
+                value += weight * sin(harmonic * phase)
+            sample = int(6000 * envelope * value)
+            samples.extend([max(min(sample, 32767), -32768)] * audio_channels)
+        samples.extend([0] * int(random.uniform(0.02, 0.15) * sample_rate) * audio_channels)
+    return samples.tobytes()
+
+
+def run_benchmark(
+    audio: bytes,
+    sample_rate: int = 44100,
+    audio_channels: int = 2,
+    chunk_size: int = 1024
+) -> dict[str, float]:
+    """Measure codec throughput, per-chunk cost and SNR on audio
+
+    Parameters
+    ----------
+    audio: The interleaved 16-bit frames to encode
+    sample_rate (Optional): The sample rate of the audio
+    audio_channels (Optional): The number of interleaved audio channels
+    chunk_size (Optional): The number of frames per chunk
+
+    Returns
+    -------
+    The benchmark results
+    """
+    chunk_bytes = 2 * audio_channels * chunk_size
+    chunks = [
+        audio[i:i + chunk_bytes]
+        for i in range(0, len(audio) - chunk_bytes + 1, chunk_bytes)
+    ]
+    encoder = ImaAdpcmEncoder(audio_channels)
+    decoder = ImaAdpcmDecoder(audio_channels)
+
+    start_time = perf_counter()
+    encoded = [encoder.encode(chunk) for chunk in chunks]
+    encode_time = perf_counter() - start_time
+    start_time = perf_counter()
+    decoded = [decoder.decode(chunk) for chunk in encoded]
+    decode_time = perf_counter() - start_time
+
+    original = array("h", b"".join(chunks))
+    restored = array("h", b"".join(decoded))
+    signal_energy = sum(sample * sample for sample in original)
+    noise_energy = sum((a - b) ** 2 for a, b in zip(original, restored))
+
+    # Segmental SNR over non-silent chunks, closer to perceived quality
+    segment_snrs = []
+    for chunk, result in zip(chunks, decoded):
+        segment = array("h", chunk)
+        segment_energy = sum(sample * sample for sample in segment)
+        if segment_energy < len(segment) * 100 ** 2:
+            continue
+        segment_noise = sum((a - b) ** 2 for a, b in zip(segment, array("h", result)))
+        segment_snrs.append(10 * log10(segment_energy / max(segment_noise, 1)))
+
+    megabytes = len(original) * 2 / 1e6
+    chunk_period = chunk_size / sample_rate
+    return {
+        "chunks": len(chunks),
+        "compression_ratio": len(original) * 2 / sum(len(chunk) for chunk in encoded),
+        "encode_mb_per_s": megabytes / encode_time,
+        "decode_mb_per_s": megabytes / decode_time,
+        "encode_ms_per_chunk": 1000 * encode_time / len(chunks),
+        "decode_ms_per_chunk": 1000 * decode_time / len(chunks),
+        "chunk_period_ms": 1000 * chunk_period,
+        "snr_db": 10 * log10(signal_energy / max(noise_energy, 1)),
+        "segmental_snr_db": sum(segment_snrs) / len(segment_snrs) if segment_snrs else 0.0
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("recordings", nargs="*", help="16-bit WAV speech recordings")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+    sources = [(path, *load_wav(path)) for path in args.recordings]
+    if not sources:
+        sources = [("synthetic speech", synthesize_speech(), 44100, 2)]
+    for name, audio, sample_rate, audio_channels in sources:
+        print(f"{name}:")
+        results = run_benchmark(audio, sample_rate, audio_channels, args.chunk_size)
+        for key, value in results.items():
+            print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -0,0 +1,94 @@
+""" Benchmark of latency calibration accuracy against simulated paths of known
+    delay and noise
+
+The default simulated path has an 8 kHz low-pass standing in for the solar
+cell, whose lag of the impulse response's peak, about 13 us, is reported as
+error against the pure delay. An unfiltered path is also measured, to
+separate that lag from the calibrator's own error.
+
+Exports
+-------
+run_benchmark: Measure calibration error and confidence over delays and noise
+    levels
+"""
+
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from calibrationchannels import SimulatedChannel
+from latency_calibration import LatencyCalibrator
+
+
+def run_benchmark(
+    delays: list[float],
+    noise_levels: list[float],
+    lowpass_cutoffs: list[float | None] | None = None,
+    runs: int = 3,
+    seed: int = 0
+) -> list[dict[str, float | None]]:
+    """Measure calibration error and confidence over delays and noise levels
+
+    Parameters
+    ----------
+    delays: The simulated delays in seconds
+    noise_levels: The simulated noise RMS levels relative to full scale
+    lowpass_cutoffs (Optional): The cutoffs of the simulated low-pass in
+        Hz, None for an unfiltered path, or None to measure the default
+        8 kHz low-pass and an unfiltered path
+    runs (Optional): The number of runs per calibration
+    seed (Optional): The seed for the simulated noise
+
+    Returns
+    -------
+    The results of each calibration
+    """
+    if lowpass_cutoffs is None:
+        lowpass_cutoffs = [8000.0, None]
+    results: list[dict[str, float | None]] = []
+    for lowpass_cutoff in lowpass_cutoffs:
+        for noise_level in noise_levels:
+            for delay in delays:
+                channel = SimulatedChannel(
+                    delay,
+                    noise_level=noise_level,
+                    lowpass_cutoff=lowpass_cutoff,
+                    seed=seed
+                )
+                start_time = perf_counter()
+                calibration = LatencyCalibrator(channel).calibrate(runs)
+                results.append({
+                    "lowpass_hz": lowpass_cutoff,
+                    "noise_level": noise_level,
+                    "delay_ms": 1000 * delay,
+                    "error_us": 1e6 * (calibration["delay"] - delay),
+                    "spread_us": 1e6 * calibration["delay_spread"],
+                    "confidence": calibration["confidence"],
+                    "snr_1000_db": calibration["snr_db"]["1000"],
+                    "seconds_per_run": (perf_counter() - start_time) / runs
+                })
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--delays", type=float, nargs="+", default=[0.0, 0.00731, 0.04258, 0.3]
+    )
+    parser.add_argument(
+        "--noise-levels", type=float, nargs="+", default=[0.0001, 0.01, 0.1]
+    )
+    parser.add_argument(
+        "--lowpass-cutoffs", type=float, nargs="+", default=None,
+        help="low-pass cutoffs in Hz, 0 for an unfiltered path"
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    cutoffs = None
+    if args.lowpass_cutoffs is not None:
+        cutoffs = [cutoff or None for cutoff in args.lowpass_cutoffs]
+    for result in run_benchmark(args.delays, args.noise_levels, cutoffs, args.runs):
+        print(", ".join(
+            f"{key}: {value if value is None else f'{value:.4f}'}"
+            for key, value in result.items()
+        ))
@@ -0,0 +1,172 @@
+""" Benchmark of audio loop jitter under CPU, GIL and garbage collector
+    stress, with and without the real-time profile
+
+Exports
+-------
+run_benchmark: Measure a simulated audio loop's jitter under stress with and
+    without the real-time profile
+"""
+
+
+from argparse import ArgumentParser
+from contextlib import nullcontext
+from multiprocessing import Process
+from os import cpu_count
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+import numpy as np
+
+from audio_monitor import FlickerFilter
+from realtime import RealtimeProfile, jitter_percentiles
+
+
+def _burn_cpu() -> None:
+    """Spin a CPU until killed, contending with the audio loop for cores"""
+    while True:
+        pass
+
+
+def _churn_objects(stop_flag: Event) -> None:
+    """Build and drop reference cycles until stopped, contending with the
+    audio loop for the GIL and triggering garbage collections
+
+    Parameters
+    ----------
+    stop_flag: Set to stop churning
+    """
+    while not stop_flag.is_set():
+        for _ in range(100):
+            node: list = [None]
+            node[0] = node
+        sleep(0.0001)
+
+
+def _audio_loop(
+    chunk_size: int,
+    sample_rate: int,
+    duration: float,
+    profile: RealtimeProfile | None,
+    results: dict
+) -> None:
+    """Run a simulated audio loop, waking each chunk period to filter a chunk,
+    and record how late each wake was
+
+    Parameters
+    ----------
+    chunk_size: The number of frames per chunk
+    sample_rate: The sample rate of the audio
+    duration: The seconds to run for
+    profile: The real-time profile to apply, or None
+    results: Filled with the achieved scheduling and the wake errors
+    """
+    if profile:
+        results["status"] = profile.apply()
+    audio_filter = FlickerFilter(sample_rate)
+    audio_filter.highpass_cutoff = 100
+    chunk = np.random.default_rng(0).integers(
+        -8000, 8000, 2 * chunk_size, dtype=np.int16
+    ).tobytes()
+    period = chunk_size / sample_rate
+    errors = []
+    deadline = perf_counter() + period
+    end_time = deadline + duration
+    while deadline < end_time:
+        remaining = deadline - perf_counter()
+        if remaining > 0:
+            sleep(remaining)
+        errors.append(perf_counter() - deadline)
+        audio_filter.process(chunk)
+        deadline += period
+    results["errors"] = errors
+
+
+def run_benchmark(
+    duration: float = 10.0,
+    chunk_size: int = 256,
+    sample_rate: int = 44100,
+    cpu_stressors: int | None = None,
+    gil_stressors: int = 2,
+    heap_objects: int = 2_000_000
+) -> dict[str, dict]:
+    """Measure a simulated audio loop's jitter under stress with and without
+    the real-time profile
+
+    Stress comes from processes spinning on every CPU, threads churning
+    reference cycles, and a large long-lived heap which makes full garbage
+    collections slow.
+
+    Parameters
+    ----------
+    duration (Optional): The seconds to run each configuration for
+    chunk_size (Optional): The number of frames per chunk
+    sample_rate (Optional): The sample rate of the audio
+    cpu_stressors (Optional): The number of CPU spinning processes, or None
+        for one per CPU
+    gil_stressors (Optional): The number of cycle churning threads
+    heap_objects (Optional): The number of long-lived objects on the heap
+
+    Returns
+    -------
+    A dictionary mapping "baseline" and "realtime" to the achieved
+    scheduling and jitter percentiles in seconds
+    """
+    heap = [[i] for i in range(heap_objects)]
+    burners = [
+        Process(target=_burn_cpu, daemon=True)
+        for _ in range(cpu_stressors if cpu_stressors is not None else cpu_count() or 1)
+    ]
+    for burner in burners:
+        burner.start()
+    results = {}
+    try:
+        for name, profile in (("baseline", None), ("realtime", RealtimeProfile())):
+            stop_flag = Event()
+            churners = [
+                Thread(target=_churn_objects, args=(stop_flag,), daemon=True)
+                for _ in range(gil_stressors)
+            ]
+            for churner in churners:
+                churner.start()
+            loop_results: dict = {"status": {"policy": "SCHED_OTHER", "priority": 0}}
+            loop = Thread(
+                target=_audio_loop,
+                args=(chunk_size, sample_rate, duration, profile, loop_results)
+            )
+            with profile.streaming() if profile else nullcontext():
+                loop.start()
+                loop.join()
+            stop_flag.set()
+            for churner in churners:
+                churner.join()
+            results[name] = {
+                **loop_results["status"], **jitter_percentiles(loop_results["errors"])
+            }
+    finally:
+        for burner in burners:
+            burner.kill()
+            burner.join()
+    del heap
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--cpu-stressors", type=int, default=None)
+    parser.add_argument("--gil-stressors", type=int, default=2)
+    parser.add_argument("--heap-objects", type=int, default=2_000_000)
+    args = parser.parse_args()
+    for name, result in run_benchmark(
+        args.duration, args.chunk_size, args.sample_rate, args.cpu_stressors,
+        args.gil_stressors, args.heap_objects
+    ).items():
+        print(
+            f"{name}: {result['policy']} priority {result['priority']},",
+            ", ".join(
+                f"{key.removeprefix('jitter_')} {result[key] * 1000:.2f} ms"
+                for key in ("jitter_p50", "jitter_p99", "jitter_p999", "jitter_max")
+            )
+        )
@@ -0,0 +1,79 @@
+""" Benchmark of channel transmission latency to many simulated network
+    bridge nodes
+
+Exports
+-------
+run_benchmark: Measure transmit_channel latency over a socket mass client
+"""
+
+
+from argparse import ArgumentParser
+from statistics import median, quantiles
+from time import perf_counter
+
+from asyncmassclients import SocketMassClient
+from bridge_simulator import BridgeSimulator
+from channel_transmitter import ChannelTransmitter
+
+
+def run_benchmark(
+    endpoints: int = 128,
+    iterations: int = 50,
+    pulse_width: float = 0.0,
+    udp_fanout: bool = False
+) -> list[float]:
+    """Measure transmit_channel latency over a socket mass client
+
+    Parameters
+    ----------
+    endpoints (Optional): The number of simulated bridge nodes
+    iterations (Optional): The number of channel transmissions to time
+    pulse_width (Optional): The simulated MCU pulse width in seconds
+    udp_fanout (Optional): Whether to fan writes out over UDP
+
+    Returns
+    -------
+    The latency of each channel transmission in seconds
+    """
+    simulators = [BridgeSimulator(pulse_width=pulse_width) for _ in range(endpoints)]
+    for simulator in simulators:
+        simulator.start()
+    client = SocketMassClient(
+        hosts=[simulator.port for simulator in simulators],
+        udp_fanout=udp_fanout,
+        max_workers=endpoints
+    )
+    transmitter = ChannelTransmitter(9, client)
+    latencies = []
+    try:
+        for i in range(iterations):
+            transmitter.channel = i % 10
+            start_time = perf_counter()
+            if not transmitter.transmit_channel():
+                raise RuntimeError("Channel transmission failed")
+            latencies.append(perf_counter() - start_time)
+    finally:
+        client.shutdown()
+        for simulator in simulators:
+            simulator.close()
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--endpoints", type=int, default=128)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--pulse-width", type=float, default=0.0)
+    parser.add_argument("--udp-fanout", action="store_true")
+    args = parser.parse_args()
+    results = run_benchmark(
+        args.endpoints, args.iterations, args.pulse_width, args.udp_fanout
+    )
+    percentiles = quantiles(results, n=100)
+    print(
+        f"transmit_channel to {args.endpoints} endpoints",
+        f"({'UDP' if args.udp_fanout else 'TCP'} writes):",
+        f"median {median(results) * 1000:.2f} ms,",
+        f"p95 {percentiles[94] * 1000:.2f} ms,",
+        f"max {max(results) * 1000:.2f} ms"
+    )
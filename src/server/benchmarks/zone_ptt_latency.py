@@ -0,0 +1,169 @@
+""" Benchmark of PTT latency with concurrent zones over simulated network
+    bridge nodes
+
+Exports
+-------
+run_benchmark: Measure zone PTT latency as the number of concurrent zones
+    grows
+"""
+
+
+from argparse import ArgumentParser
+from statistics import median
+from threading import Barrier, Thread
+from time import perf_counter
+
+from asyncmassclients import SocketMassClient
+from bridge_simulator import BridgeSimulator
+from channel_transmitter import ChannelTransmitter
+from zones import Zone, ZoneController
+
+
+def _key_concurrently(
+    controller: ZoneController,
+    names: list[str],
+    iterations: int
+) -> list[float]:
+    """Key each zone from its own thread at the same moment, repeatedly
+
+    Parameters
+    ----------
+    controller: The zone controller
+    names: The names of the zones to key
+    iterations: The number of times to key the zones
+
+    Returns
+    -------
+    The seconds each zone took to start transmitting, for every zone and
+    iteration
+
+    Raises
+    ------
+    RuntimeError: If a zone failed to start transmitting
+    """
+    barrier = Barrier(len(names))
+    latencies: list[float] = []
+    failures: list[str] = []
+
+    def key(name: str) -> None:
+        for _ in range(iterations):
+            barrier.wait()
+            start_time = perf_counter()
+            if not controller.start_transmission([name])[name]:
+                failures.append(name)
+            latencies.append(perf_counter() - start_time)
+            barrier.wait()  # Hold every zone keyed until all have started
+            controller.stop_transmission([name])
+
+    threads = [Thread(target=key, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise RuntimeError(f"Zone transmission failed on {sorted(set(failures))}")
+    return latencies
+
+
+def run_benchmark(
+    max_zones: int = 8,
+    transmitters_per_zone: int = 8,
+    iterations: int = 20,
+    pulse_width: float = 0.005
+) -> dict[int, dict[str, float]]:
+    """Measure zone PTT latency as the number of concurrent zones grows
+
+    For each zone count, one zone is keyed repeatedly while the others stay
+    keyed, all zones are keyed together in one batch, and each zone is keyed
+    from its own thread at the same moment, as operators keying their zones
+    independently would.
+
+    Parameters
+    ----------
+    max_zones (Optional): The largest number of concurrent zones
+    transmitters_per_zone (Optional): The number of simulated transmitters in
+        each zone
+    iterations (Optional): The number of PTTs to time per zone count
+    pulse_width (Optional): The simulated MCU pulse width in seconds
+
+    Returns
+    -------
+    A dictionary mapping zone counts to latencies in seconds: the medians of
+    keying one zone alongside the others, of keying all zones in one batch,
+    and of keying each zone concurrently, and the slowest concurrent keying
+    """
+    simulators = [
+        BridgeSimulator(pulse_width=pulse_width)
+        for _ in range(max_zones * transmitters_per_zone)
+    ]
+    for simulator in simulators:
+        simulator.start()
+    client = SocketMassClient(
+        hosts=[simulator.port for simulator in simulators],
+        max_workers=2 * len(simulators)  # Concurrent zones share the pool
+    )
+    transmitter = ChannelTransmitter(9, client)
+    zones = [
+        Zone(
+            f"zone{i}",
+            [
+                simulator.port for simulator in
+                simulators[i * transmitters_per_zone:(i + 1) * transmitters_per_zone]
+            ],
+            channel=i % 10
+        )
+        for i in range(max_zones)
+    ]
+    controller = ZoneController(transmitter, zones)
+    results = {}
+    try:
+        for zone_count in range(1, max_zones + 1):
+            names = [zone.name for zone in zones[:zone_count]]
+            controller.start_transmission(names[1:])
+            single = []
+            for _ in range(iterations):
+                start_time = perf_counter()
+                if not controller.start_transmission(names[:1])[names[0]]:
+                    raise RuntimeError("Zone transmission failed")
+                single.append(perf_counter() - start_time)
+                controller.stop_transmission(names[:1])
+            controller.stop_transmission(names)
+            batch = []
+            for _ in range(iterations):
+                start_time = perf_counter()
+                if not all(controller.start_transmission(names).values()):
+                    raise RuntimeError("Zone transmission failed")
+                batch.append(perf_counter() - start_time)
+                controller.stop_transmission(names)
+            concurrent = _key_concurrently(controller, names, iterations)
+            results[zone_count] = {
+                "single": median(single),
+                "batch": median(batch),
+                "concurrent": median(concurrent),
+                "concurrent_max": max(concurrent)
+            }
+    finally:
+        client.shutdown()
+        for simulator in simulators:
+            simulator.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--max-zones", type=int, default=8)
+    parser.add_argument("--transmitters-per-zone", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--pulse-width", type=float, default=0.005)
+    args = parser.parse_args()
+    for zone_count, latencies in run_benchmark(
+        args.max_zones, args.transmitters_per_zone, args.iterations,
+        args.pulse_width
+    ).items():
+        print(
+            f"{zone_count} zones:",
+            f"one zone keyed {latencies['single'] * 1000:.2f} ms,",
+            f"all zones keyed together {latencies['batch'] * 1000:.2f} ms,",
+            f"each zone keyed concurrently {latencies['concurrent'] * 1000:.2f} ms",
+            f"(slowest {latencies['concurrent_max'] * 1000:.2f} ms)"
+        )
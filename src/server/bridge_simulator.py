@@ -0,0 +1,158 @@
+""" A stand-in for a network bridge node and its transmitter MCU, for testing
+    and benchmarking network transport without hardware
+
+Exports
+-------
+BridgeSimulator: A thread emulating a network bridge node and the transmitter
+    MCU behind it
+"""
+
+
+from selectors import EVENT_READ, DefaultSelector
+from socket import (
+    AF_INET, SO_REUSEADDR, SOCK_DGRAM, SOCK_STREAM, SOL_SOCKET, socket
+)
+from threading import Event, Thread
+from time import sleep
+
+from asyncmassclients.socket_mass_client import (
+    DISCOVERY_PORT, DISCOVERY_PROBE, DISCOVERY_REPLY
+)
+
+
+class BridgeSimulator(Thread):
+    """A thread emulating a network bridge node and the transmitter MCU behind
+    it
+
+    Every byte received over TCP, or as a UDP datagram on the same port
+    number, is echoed XOR'd by 49 over the most recent TCP connection. Digit
+    bytes are delayed by the time the MCU takes to bit-bang the preamble and
+    channel onto the light.
+
+    Attributes
+    ----------
+    port: The name of the simulated bridge node in the form "host:port"
+
+    Methods
+    -------
+    close: Stop the simulator
+    run: Begin the simulator thread
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        pulse_width: float = 0.005,
+        discoverable: bool = False,
+        discovery_port: int = DISCOVERY_PORT
+    ) -> None:
+        """Parameters
+        ----------
+        host (Optional): The address to listen on
+        port (Optional): The TCP and UDP port to listen on, or 0 to pick a free
+            one
+        pulse_width (Optional): The simulated duration of the MCU's digital
+            signal pulses in seconds
+        discoverable (Optional): Whether to answer broadcast discovery probes
+        discovery_port (Optional): The UDP port on which to answer discovery
+            probes
+        """
+        super().__init__(daemon=True)
+        self.__pulse_width = pulse_width
+        self.__kill_flag = Event()
+        self.__selector = DefaultSelector()
+        self.__listener = socket(AF_INET, SOCK_STREAM)
+        self.__listener.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.__listener.bind((host, port))
+        self.__listener.listen()
+        host, port = self.__listener.getsockname()
+        self.port = f"{host}:{port}"
+        self.__datagrams = socket(AF_INET, SOCK_DGRAM)
+        self.__datagrams.bind((host, port))
+        self.__connection: socket | None = None
+        self.__selector.register(self.__listener, EVENT_READ)
+        self.__selector.register(self.__datagrams, EVENT_READ)
+        self.__discovery: socket | None = None
+        if discoverable:
+            self.__discovery = socket(AF_INET, SOCK_DGRAM)
+            self.__discovery.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+            try:
+                from socket import SO_REUSEPORT  # pylint: disable=import-outside-toplevel
+                self.__discovery.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+            except ImportError:
+                pass
+            self.__discovery.bind(("", discovery_port))
+            self.__selector.register(self.__discovery, EVENT_READ)
+
+    def close(self) -> None:
+        """Stop the simulator"""
+        self.__kill_flag.set()
+
+    def run(self) -> None:
+        """Begin the simulator thread"""
+        try:
+            while not self.__kill_flag.is_set():
+                for key, _ in self.__selector.select(timeout=0.1):
+                    self.__handle(key.fileobj)  # type: ignore[arg-type]
+        finally:
+            self.__selector.close()
+            for sock in (
+                self.__listener, self.__datagrams, self.__connection,
+                self.__discovery
+            ):
+                if sock is not None:
+                    sock.close()
+
+    def __echo(self, data: bytes) -> None:
+        """Emulate the transmitter MCU's response to received bytes
+
+        Parameters
+        ----------
+        data: The bytes received
+        """
+        for byte in data:
+            if chr(byte).isdigit():
+                sleep(16 * self.__pulse_width)  # Preamble and channel bits
+            if self.__connection is None:
+                continue
+            try:
+                self.__connection.sendall(bytes((byte ^ 49,)))
+            except OSError:
+                self.__drop_connection()
+
+    def __drop_connection(self) -> None:
+        """Close the current TCP connection"""
+        if self.__connection is not None:
+            self.__selector.unregister(self.__connection)
+            self.__connection.close()
+            self.__connection = None
+
+    def __handle(self, sock: socket) -> None:
+        """Handle a socket which is ready to be read
+
+        Parameters
+        ----------
+        sock: The socket to handle
+        """
+        if sock is self.__listener:
+            connection, _ = sock.accept()
+            self.__drop_connection()  # Only the latest console is served
+            self.__connection = connection
+            self.__selector.register(connection, EVENT_READ)
+        elif sock is self.__discovery:
+            probe, address = sock.recvfrom(64)
+            if probe == DISCOVERY_PROBE:
+                port = self.__listener.getsockname()[1]
+                sock.sendto(DISCOVERY_REPLY + str(port).encode(), address)
+        elif sock is self.__datagrams:
+            self.__echo(sock.recv(64))
+        else:
+            try:
+                data = sock.recv(64)
+            except OSError:
+                data = b""
+            if not data:
+                self.__drop_connection()
+                return
+            self.__echo(data)
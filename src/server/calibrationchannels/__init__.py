@@ -0,0 +1,55 @@
+""" A package of paths through which latency calibration stimuli are played
+    and captured
+
+Modules
+-------
+hardware_channel: A calibration channel playing through one sound device and
+    capturing through another, such as the transmit path's input and a
+    receiver's line-in
+interface: Interface for a path through which a calibration stimulus is
+    played and captured
+simulated_channel: A calibration channel simulating the transmit path with a
+    known delay, for testing calibration offline
+
+Exports
+-------
+Classes:
+    HardwareChannel: A calibration channel playing through one sound device
+        and capturing through another
+    ICalibrationChannel: Interface for a path through which a calibration
+        stimulus is played and captured
+    SimulatedChannel: A calibration channel simulating the transmit path with
+        a known delay
+
+HardwareChannel is imported on first use, so that calibrating against a
+simulated channel does not require PyAudio.
+"""
+
+from typing import TYPE_CHECKING, Any
+
+from .interface import ICalibrationChannel
+from .simulated_channel import SimulatedChannel
+
+if TYPE_CHECKING:
+    from .hardware_channel import HardwareChannel
+
+
+def __getattr__(name: str) -> Any:
+    """Import the hardware channel on first use
+
+    Parameters
+    ----------
+    name: The name of the attribute
+
+    Returns
+    -------
+    The attribute
+
+    Raises
+    ------
+    AttributeError: If the package has no such attribute
+    """
+    if name == "HardwareChannel":
+        from .hardware_channel import HardwareChannel  # pylint: disable=import-outside-toplevel
+        return HardwareChannel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,144 @@
+""" A calibration channel playing through one sound device and capturing
+    through another, such as the transmit path's input and a receiver's line-in
+
+Exports
+-------
+HardwareChannel: A calibration channel playing through one sound device and
+    capturing through another
+"""
+
+from threading import Event
+from time import sleep
+
+from pyaudio import PyAudio, paComplete, paContinue, paInt16
+
+from .interface import ICalibrationChannel
+
+
+class HardwareChannel(ICalibrationChannel):
+    """A calibration channel playing through one sound device and capturing
+    through another
+
+    Both streams use callbacks, and the capture is aligned to the stimulus
+    using the DAC and ADC times PortAudio reports for their first buffers, so
+    scheduling of this process's threads does not affect the result. Host
+    APIs which do not report these times fall back to the callbacks' current
+    times.
+
+    Methods
+    -------
+    close: Release the sound devices
+    play_and_capture: Play a stimulus through the output device and capture
+        the input device
+    """
+
+    def __init__(
+        self,
+        output_device_index: int | None = None,
+        input_device_index: int | None = None,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        chunk_size: int = 1024,
+        tail_time: float = 0.2
+    ) -> None:
+        """Parameters
+        ----------
+        output_device_index (Optional): The index of the device feeding the
+            transmit path, or None for the default output
+        input_device_index (Optional): The index of the device capturing the
+            receiver's output, or None for the default input
+        sample_rate (Optional): The sample rate of the audio
+        audio_channels (Optional): The number of interleaved audio channels
+        chunk_size (Optional): The number of frames per callback
+        tail_time (Optional): The seconds to keep capturing after the
+            stimulus has been played
+        """
+        self.__audio = PyAudio()
+        self.__output_device_index = output_device_index
+        self.__input_device_index = input_device_index
+        self.__sample_rate = sample_rate
+        self.__audio_channels = audio_channels
+        self.__chunk_size = chunk_size
+        self.__tail_time = tail_time
+
+    def close(self) -> None:
+        """Release the sound devices"""
+        self.__audio.terminate()
+
+    def play_and_capture(self, stimulus: bytes) -> bytes:
+        """Play a stimulus through the output device and capture the input
+        device
+
+        Parameters
+        ----------
+        stimulus: The interleaved 16-bit audio frames to play
+
+        Returns
+        -------
+        The interleaved 16-bit frames captured, the first captured at the
+            instant the first stimulus frame reached the output's DAC
+        """
+        frame_size = 2 * self.__audio_channels
+        captured: list[bytes] = []
+        capture_times: list[float] = []
+        play_times: list[float] = []
+        played = Event()
+        position = 0
+
+        def capture(in_data, frame_count, time_info, status):
+            if not captured:
+                capture_times.append(
+                    time_info["input_buffer_adc_time"] or time_info["current_time"]
+                )
+            captured.append(in_data)
+            return (None, paContinue)
+
+        def play(in_data, frame_count, time_info, status):
+            nonlocal position
+            if not play_times:
+                play_times.append(
+                    time_info["output_buffer_dac_time"] or time_info["current_time"]
+                )
+            chunk = stimulus[position:position + frame_count * frame_size]
+            position += len(chunk)
+            if len(chunk) < frame_count * frame_size:
+                played.set()
+                return (chunk + bytes(frame_count * frame_size - len(chunk)), paComplete)
+            return (chunk, paContinue)
+
+        stream_in = self.__audio.open(
+            channels=self.__audio_channels,
+            format=paInt16,
+            frames_per_buffer=self.__chunk_size,
+            rate=self.__sample_rate,
+            input=True,
+            input_device_index=self.__input_device_index,
+            stream_callback=capture
+        )
+        sleep(self.__tail_time)  # Let the input settle before playing
+        stream_out = self.__audio.open(
+            channels=self.__audio_channels,
+            format=paInt16,
+            frames_per_buffer=self.__chunk_size,
+            rate=self.__sample_rate,
+            output=True,
+            output_device_index=self.__output_device_index,
+            stream_callback=play
+        )
+        duration = len(stimulus) / frame_size / self.__sample_rate
+        played.wait(duration + 5)
+        sleep(stream_out.get_output_latency() + self.__tail_time)
+        stream_out.close()
+        stream_in.close()
+
+        if not (capture_times and play_times):
+            print("ERROR: Sound devices did not start")
+            return bytes(len(stimulus))
+        recording = b"".join(captured)
+        offset = round((play_times[0] - capture_times[0]) * self.__sample_rate)
+        if offset < 0:
+            recording = bytes(-offset * frame_size) + recording
+        else:
+            recording = recording[offset * frame_size:]
+        recording = recording[:len(stimulus)]
+        return recording + bytes(len(stimulus) - len(recording))
@@ -0,0 +1,35 @@
+""" Interface for a path through which a calibration stimulus is played and
+    captured
+
+Exports
+-------
+ICalibrationChannel: Interface for a path through which a calibration stimulus
+    is played and captured
+"""
+
+from abc import ABC, abstractmethod
+
+
+class ICalibrationChannel(ABC):
+    """Interface for a path through which a calibration stimulus is played and
+    captured
+
+    Abstract Methods
+    -------
+    play_and_capture: Play a stimulus into the path and capture its output
+    """
+
+    @abstractmethod
+    def play_and_capture(self, stimulus: bytes) -> bytes:
+        """Play a stimulus into the path and capture its output
+
+        Parameters
+        ----------
+        stimulus: The interleaved 16-bit audio frames to play
+
+        Returns
+        -------
+        The interleaved 16-bit frames captured from the path, with as many
+            frames as the stimulus, the first captured at the instant the
+            first stimulus frame was played
+        """
@@ -0,0 +1,97 @@
+""" A calibration channel simulating the transmit path with a known delay, for
+    testing calibration offline
+
+Exports
+-------
+SimulatedChannel: A calibration channel simulating the transmit path with a
+    known delay
+"""
+
+import numpy as np
+
+from .interface import ICalibrationChannel
+
+
+class SimulatedChannel(ICalibrationChannel):
+    """A calibration channel simulating the transmit path with a known delay
+
+    The stimulus is delayed by a possibly fractional number of frames with a
+    phase shift in the frequency domain, band-limited by a first-order
+    low-pass standing in for the solar cell and a first-order high-pass
+    standing in for the line-in's coupling, scaled, and has Gaussian noise
+    added.
+
+    Attributes
+    ----------
+    delay: The simulated delay in seconds
+
+    Methods
+    -------
+    play_and_capture: Pass a stimulus through the simulated path
+    """
+
+    def __init__(
+        self,
+        delay: float,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        gain: float = 0.5,
+        lowpass_cutoff: float | None = 8000.0,
+        highpass_cutoff: float | None = 20.0,
+        noise_level: float = 0.001,
+        seed: int | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        delay: The simulated delay in seconds
+        sample_rate (Optional): The sample rate of the audio
+        audio_channels (Optional): The number of interleaved audio channels
+        gain (Optional): The gain of the path
+        lowpass_cutoff (Optional): The cutoff of the path's low-pass in Hz,
+            or None for no low-pass
+        highpass_cutoff (Optional): The cutoff of the path's high-pass in Hz,
+            or None for no high-pass
+        noise_level (Optional): The RMS of the added noise relative to full
+            scale
+        seed (Optional): The seed for the added noise
+        """
+        self.delay = delay
+        self.__sample_rate = sample_rate
+        self.__audio_channels = audio_channels
+        self.__gain = gain
+        self.__lowpass_cutoff = lowpass_cutoff
+        self.__highpass_cutoff = highpass_cutoff
+        self.__noise_level = noise_level
+        self.__random = np.random.default_rng(seed)
+
+    def play_and_capture(self, stimulus: bytes) -> bytes:
+        """Pass a stimulus through the simulated path
+
+        Parameters
+        ----------
+        stimulus: The interleaved 16-bit audio frames to play
+
+        Returns
+        -------
+        The interleaved 16-bit frames output by the path
+        """
+        frames = np.frombuffer(stimulus, dtype=np.int16).reshape(
+            -1, self.__audio_channels
+        ).astype(np.float64)
+        delay_frames = self.delay * self.__sample_rate
+        # Pad so the delayed signal does not wrap around
+        size = 1 << int(np.ceil(np.log2(len(frames) + delay_frames + 1)))
+        frequencies = np.fft.rfftfreq(size, 1 / self.__sample_rate)
+        response = self.__gain * np.exp(-2j * np.pi * frequencies * self.delay)
+        if self.__lowpass_cutoff:
+            response /= 1 + 1j * frequencies / self.__lowpass_cutoff
+        if self.__highpass_cutoff:
+            ratio = 1j * frequencies / self.__highpass_cutoff
+            response *= ratio / (1 + ratio)
+        output = np.fft.irfft(
+            np.fft.rfft(frames, size, axis=0) * response[:, None], size, axis=0
+        )[:len(frames)]
+        output += self.__random.normal(
+            0, self.__noise_level * 32768, output.shape
+        )
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16).tobytes()
@@ -8,12 +8,15 @@ ChannelTransmitter: A class for sending integers representing channels over
 """
 
 
+from contextlib import AbstractContextManager, contextmanager
 from random import randint
-from time import time
-from typing import Any
+from time import perf_counter, time
+from typing import Any, Collection, Iterator
 
 from asyncmassclients import IAsyncMassClient
+from coordination import CoordinationClient
 from singleton_type import Singleton
+from tracer import TRACER
 
 
 _DEBUG = False
@@ -22,33 +25,54 @@ _DEBUG = False
 class ChannelTransmitter(Singleton):
     """A class for transmitting channels to LiFi transmitters
 
+    If a coordination client is given, one server at a time is primary and
+    owns the transmitters, publishing those it has validated. Other servers
+    stand by with no ports open, and when the primary fails the first of
+    them takes over, opening the published transmitters without
+    rediscovering or revalidating them.
+
     Attributes
     ----------
     channel: The currently set channel to transmit
-    transmitters: A list of connected transmitters to send channels to
+    standby: Whether this server is standing by for the primary server
+    transmitters: The connected transmitters' port names mapped to their
+        health
 
     Methods
     -------
+    pause_heartbeat: Pause background health checks of the transmitters
     print_transmitters: Print the port names of connected transmitters
     refresh_transmitters: Refresh the list of connected transmitters
     transmit_channel: Transmit the currently set channel to all connected
         transmitters
+    transmit_channels: Transmit a different channel to each of a set of
+        transmitters
     """
 
     def __init__(
         self,
         channels_upper_bound: int,
-        transmission_client: IAsyncMassClient
+        transmission_client: IAsyncMassClient,
+        coordinator: CoordinationClient | None = None
     ) -> None:
         """Parameters
         ----------
         channels_upper_bound: The maximum channel value
         transmission_client: The client for transmitting channels
+        coordinator (Optional): The coordination client through which to
+            share transmitters with other servers, or None to own all
+            transmitters
         """
         self.__channel: int = 0
         self.__channels_upper_bound: int = channels_upper_bound
+        self.__coordinator = coordinator
+        self.__published_ports: set[str] = set()
+        self.__standby = False
         self.__transmission_client: IAsyncMassClient = transmission_client
-        self.refresh_transmitters()
+        if coordinator and not coordinator.acquire("role:primary", self.__stand_by):
+            self.__stand_by()
+        else:
+            self.refresh_transmitters()
 
     @property
     def channel(self) -> int:
@@ -67,105 +91,300 @@ class ChannelTransmitter(Singleton):
         self.__channel = value
 
     @property
-    def transmitters(self) -> list[Any]:
-        """A list of connected transmitters to send channels to"""
-        return list(self.__transmission_client.ports.values())
+    def standby(self) -> bool:
+        """Whether this server is standing by for the primary server"""
+        return self.__standby
+
+    @property
+    def transmitters(self) -> dict[str, dict[str, Any]]:
+        """The connected transmitters' port names mapped to their health:
+        whether the transmitter is healthy, its smoothed round-trip time in
+        seconds (or None if unmeasured), and its number of consecutive failed
+        health checks
+        """
+        return self.__transmission_client.health
+
+    def pause_heartbeat(self) -> AbstractContextManager:
+        """Pause background health checks of the transmitters, so that they
+        do not interleave with a transmission
+
+        Returns
+        -------
+        A context manager holding the health checks paused, entered once any
+        health check in flight has finished
+        """
+        return self.__transmission_client.pause_heartbeat()
 
     def print_transmitters(self) -> None:
-        """Print the port names of connected transmitters"""
-        print(
-            "Transmitters on ports:",
-            list(self.__transmission_client.ports.keys())
-        )
+        """Print the port names of connected transmitters with their health"""
+        descriptions = []
+        for port_name, health in self.transmitters.items():
+            state = "healthy" if health["healthy"] else "not responding"
+            if health["rtt"] is not None:
+                state += f", {health['rtt'] * 1000:.1f} ms"
+            descriptions.append(f"{port_name} ({state})")
+        print("Transmitters on ports:", descriptions)
+
+    def __get_healthy_ports(self) -> dict[str, Any]:
+        """Get the connected transmitters known to be healthy
+
+        Returns
+        -------
+        A dictionary mapping port names to port objects
+        """
+        return {
+            port_name: self.__transmission_client.ports[port_name]
+            for port_name, health in self.transmitters.items()
+            if health["healthy"] and port_name in self.__transmission_client.ports
+        }
+
+    def __publish_transmitters(self) -> None:
+        """Publish the connected transmitters for standby servers if they
+        have changed
+        """
+        transmitters = self.transmitters
+        if not self.__coordinator or set(transmitters) == self.__published_ports:
+            return
+        self.__coordinator.publish("transmitters", transmitters)
+        self.__published_ports = set(transmitters)
+
+    @contextmanager
+    def __transmission(self) -> Iterator[None]:
+        """Pause the heartbeat around a transmission to the transmitters,
+        then publish any change to the connected transmitters
+        """
+        with self.__transmission_client.pause_heartbeat():
+            yield
+        self.__publish_transmitters()
 
+    @TRACER.traced("refresh_transmitters", "control")
     def refresh_transmitters(self) -> None:
         """Refresh the list of connected transmitters"""
-        print("Refreshing transmitters...")
-        start_time = time()
-        self.__transmission_client.mass_open()
-
-        # Send a byte to be echoed back by valid transmitters
-        message_int = randint(58, 126)
-        write_results = self.__transmission_client.mass_write(
-            chr(message_int).encode()
-        )
-        # Remove ports for which writing failed
-        for result in write_results:
-            port_name, async_results = result
-            if not async_results.get():
-                self.__transmission_client.close(port_name)
-
-        # If no ports were successfully written to, return
-        if not self.__transmission_client.ports:
-            if _DEBUG:
+        if self.__standby:
+            print("ERROR: Standing by for the primary server, which owns the transmitters")
+            return
+        with self.__transmission():
+            print("Refreshing transmitters...")
+            start_time = time()
+            self.__transmission_client.mass_open()
+
+            # Send a byte to be echoed back by valid transmitters
+            message_int = randint(58, 126)
+            write_results = self.__transmission_client.mass_write(
+                chr(message_int).encode(), reset_input=True
+            )
+            # Remove ports for which writing failed
+            for result in write_results:
+                port_name, async_results = result
+                if not async_results.get():
+                    self.__transmission_client.close(port_name)
+
+            # If no ports were successfully written to, return
+            if not self.__transmission_client.ports:
+                if _DEBUG:
+                    print(
+                        f"Refreshed transmitters in {time() - start_time} seconds"
+                    )
                 print(
-                    f"Refreshed transmitters in {time() - start_time} seconds"
+                    "ERROR: No valid transmitters found.",
+                    "Please check connections and refresh ports.",
+                    sep="\n"
                 )
-            print(
-                "ERROR: No valid transmitters found.",
-                "Please check connections and refresh ports.",
-                sep="\n"
-            )
-            return
+                return
 
-        # Read from ports to check for expected response
-        read_results = self.__transmission_client.mass_read(1)
-        # Remove ports for which reading failed or response is incorrect
-        for result in read_results:
-            port_name, async_results = result
-            if async_results.get() != chr(message_int ^ 49).encode():
-                self.__transmission_client.close(port_name)
+            # Read from ports to check for expected response
+            read_results = self.__transmission_client.mass_read(1)
+            # Remove ports for which reading failed or response is incorrect
+            for result in read_results:
+                port_name, async_results = result
+                if async_results.get() != chr(message_int ^ 49).encode():
+                    self.__transmission_client.close(port_name)
 
-        if _DEBUG:
-            print(
-                f"Refreshed transmitters in {time() - start_time} seconds"
-            )
+            if _DEBUG:
+                print(
+                    f"Refreshed transmitters in {time() - start_time} seconds"
+                )
 
-        if not self.__transmission_client.ports:
-            print(
-                "ERROR: No valid transmitters found.",
-                "Please check connections and refresh ports.",
-                sep="\n"
-            )
-            return
-        self.print_transmitters()
+            if not self.__transmission_client.ports:
+                print(
+                    "ERROR: No valid transmitters found.",
+                    "Please check connections and refresh ports.",
+                    sep="\n"
+                )
+                return
+            self.print_transmitters()
 
-    def transmit_channel(self) -> bool:
+    @TRACER.traced("transmit_channel", "control")
+    def transmit_channel(self, excluded_ports: Collection[str] = ()) -> bool:
         """Transmit the currently set channel to all connected transmitters
 
+        Parameters
+        ----------
+        excluded_ports (Optional): The port names of transmitters not to
+            transmit to, such as those of zones which are transmitting
+
         Returns
         -------
         Whether the channel was successfully transmitted to at least one
         transmitter
         """
-        # If no transmitters are available, return
-        if not self.__transmission_client.ports:
-            print(
-                "ERROR: No valid transmitters found.",
-                "Please check connections and refresh ports.",
-                sep="\n"
-            )
+        if self.__standby:
+            print("ERROR: Standing by for the primary server, which owns the transmitters")
             return False
-        start_time = time()
-        channel_str = str(self.__channel)
-        message = channel_str.encode()
-        expected_response = chr(ord(channel_str) ^ 49).encode()
-
-        self.__transmission_client.mass_write(message)  # Write the channel to all transmitters
-        results = self.__transmission_client.mass_read(1)  # Confirm the channel was echoed correctly
-
-        # Remove ports for which reading failed or response is incorrect
-        for result in results:
-            port_name, async_results = result
-            if async_results.get() != expected_response:
-                self.__transmission_client.close(port_name)
+        with self.__transmission():
+            # If no healthy transmitters are available, return
+            healthy_ports = self.__get_healthy_ports()
+            if not healthy_ports:
                 print(
-                    f"ERROR: Channel transmission failed on port {port_name}.",
-                    "Please check the connection and refresh ports.",
+                    "ERROR: No valid transmitters found.",
+                    "Please check connections and refresh ports.",
                     sep="\n"
                 )
-        if _DEBUG:
-            print(
-                f"Transmitted channel in {time() - start_time} seconds"
-            )
-        return bool(self.__transmission_client.ports)
+                return False
+            port_names = [
+                port_name for port_name in healthy_ports
+                if port_name not in excluded_ports
+            ]
+            if not port_names:
+                print("ERROR: All transmitters are in use by transmitting zones")
+                return False
+            ports = [healthy_ports[port_name] for port_name in port_names]
+            start_time = time()
+            channel_str = str(self.__channel)
+            message = channel_str.encode()
+            expected_response = chr(ord(channel_str) ^ 49).encode()
+
+            with TRACER.span("mass_write", "control"):
+                self.__transmission_client.mass_write(message, ports, reset_input=True)  # Write the channel to all healthy transmitters
+            with TRACER.span("mass_read", "control"):
+                results = self.__transmission_client.mass_read(1, ports)  # Confirm the channel was echoed correctly
+
+            # Remove ports for which reading failed or response is incorrect
+            for result in results:
+                port_name, async_results = result
+                if async_results.get() != expected_response:
+                    self.__transmission_client.close(port_name)
+                    print(
+                        f"ERROR: Channel transmission failed on port {port_name}.",
+                        "Please check the connection and refresh ports.",
+                        sep="\n"
+                    )
+            if _DEBUG:
+                print(
+                    f"Transmitted channel in {time() - start_time} seconds"
+                )
+            healthy_ports = self.__get_healthy_ports()
+            return any(port_name in healthy_ports for port_name in port_names)
+
+    @TRACER.traced("transmit_channels", "control")
+    def transmit_channels(self, channels: dict[str, int]) -> dict[str, bool]:
+        """Transmit a different channel to each of a set of transmitters, in a
+        single parallel batch
+
+        Parameters
+        ----------
+        channels: A dictionary mapping transmitter port names to the channel
+            to transmit to each
+
+        Returns
+        -------
+        A dictionary mapping each given port name to whether the channel was
+        successfully transmitted to it
+        """
+        if self.__standby:
+            print("ERROR: Standing by for the primary server, which owns the transmitters")
+            return dict.fromkeys(channels, False)
+        with self.__transmission():
+            succeeded = dict.fromkeys(channels, False)
+            for channel in channels.values():
+                if channel < 0 or channel > self.__channels_upper_bound:
+                    print(
+                        "ERROR: Channel must be between 0 and",
+                        self.__channels_upper_bound
+                    )
+                    return succeeded
+            healthy_ports = self.__get_healthy_ports()
+            ports = [
+                healthy_ports[port_name]
+                for port_name in channels
+                if port_name in healthy_ports
+            ]
+            if not ports:
+                print(
+                    "ERROR: No valid transmitters found.",
+                    "Please check connections and refresh ports.",
+                    sep="\n"
+                )
+                return succeeded
+            start_time = time()
+            messages = {
+                port_name: str(channel).encode()
+                for port_name, channel in channels.items()
+                if port_name in healthy_ports
+            }
+
+            with TRACER.span("mass_write_each", "control"):
+                self.__transmission_client.mass_write_each(messages, reset_input=True)  # Write each channel to its transmitters
+            with TRACER.span("mass_read", "control"):
+                results = self.__transmission_client.mass_read(1, ports)  # Confirm the channels were echoed correctly
+
+            # Remove ports for which reading failed or response is incorrect
+            for result in results:
+                port_name, async_results = result
+                expected_response = bytes((messages[port_name][0] ^ 49,))
+                if async_results.get() != expected_response:
+                    self.__transmission_client.close(port_name)
+                    print(
+                        f"ERROR: Channel transmission failed on port {port_name}.",
+                        "Please check the connection and refresh ports.",
+                        sep="\n"
+                    )
+                else:
+                    succeeded[port_name] = True
+            if _DEBUG:
+                print(
+                    f"Transmitted channels in {time() - start_time} seconds"
+                )
+            return succeeded
+
+    def __stand_by(self, resource: str | None = None) -> None:  # pylint: disable=unused-argument
+        """Close all transmitters and wait to take over from the primary
+        server
+
+        Parameters
+        ----------
+        resource (Optional): The name of the primary role's lease, if it was
+            lost to another server
+        """
+        self.__standby = True
+        with self.__transmission_client.pause_heartbeat():
+            self.__transmission_client.mass_close()
+        print("Standing by for the primary server")
+        self.__coordinator.wait_for(  # type: ignore
+            "role:primary", self.__take_over, self.__stand_by
+        )
+
+    def __take_over(self, resource: str) -> None:  # pylint: disable=unused-argument
+        """Take over as the primary server, opening the transmitters the
+        previous primary published without revalidating them
+
+        Parameters
+        ----------
+        resource: The name of the primary role's lease
+        """
+        start_time = perf_counter()
+        port_names = list(self.__coordinator.state.get("transmitters", {}))  # type: ignore
+        if not port_names:
+            print("Taking over as the primary server...")
+            self.__standby = False
+            self.refresh_transmitters()
+            return
+        with TRACER.span("take_over", "control"):
+            with self.__transmission_client.pause_heartbeat():
+                self.__transmission_client.mass_open(port_names)
+        self.__standby = False
+        self.__publish_transmitters()
+        print(
+            f"Took over as the primary server in {(perf_counter() - start_time) * 1000:.1f} ms"
+        )
+        self.print_transmitters()
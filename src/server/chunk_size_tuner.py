@@ -0,0 +1,174 @@
+""" A class for finding the smallest audio chunk size a host and device pair
+    can sustain, persisting the result per device
+
+Exports
+-------
+ChunkSizeTuner: A class for tuning the audio chunk size between transmissions
+"""
+
+
+from json import JSONDecodeError, dump, load
+from pathlib import Path
+
+
+class ChunkSizeTuner:
+    """A class for tuning the audio chunk size between transmissions
+
+    Starting from a small chunk size, each transmission's statistics are
+    recorded against the current size. A size which underruns, overruns or
+    leaves too little headroom over several consecutive transmissions is
+    marked unstable and doubled, so a single scheduling hiccup does not
+    inflate latency; a size which runs cleanly for enough chunks is halved,
+    unless the half has already proven unstable, in which case the tuner has
+    settled. Once settled, a size which keeps running cleanly retries the
+    half again, in case it only failed transiently. Results are persisted
+    per device so later runs start from the settled size.
+
+    Attributes
+    ----------
+    chunk_size: The chunk size to use for the next transmission
+    settled: Whether the tuner has found the smallest stable chunk size
+
+    Methods
+    -------
+    record: Record a transmission's statistics and get the next chunk size
+    """
+
+    def __init__(
+        self,
+        device_key: str,
+        tuning_file: str | Path,
+        min_chunk_size: int = 128,
+        max_chunk_size: int = 4096,
+        min_chunks: int = 200,
+        max_xrun_rate: float = 0.005,
+        max_load: float = 0.5,
+        unstable_transmissions: int = 2,
+        retry_chunks: int = 10000
+    ) -> None:
+        """Parameters
+        ----------
+        device_key: The key identifying the host and device pair
+        tuning_file: The JSON file in which tuning results are persisted
+        min_chunk_size (Optional): The smallest chunk size to try
+        max_chunk_size (Optional): The largest chunk size to fall back to
+        min_chunks (Optional): The number of clean chunks after which a size
+            is considered stable
+        max_xrun_rate (Optional): The largest fraction of chunks which may
+            underrun or overrun for a size to be considered stable
+        max_load (Optional): The largest fraction of a chunk's period which
+            may be spent processing it for a size to be considered stable
+        unstable_transmissions (Optional): The number of consecutive
+            transmissions which must fail for a size to be marked unstable
+        retry_chunks (Optional): The number of clean chunks at a settled size
+            after which the half is retried
+        """
+        self.__device_key = device_key
+        self.__tuning_file = Path(tuning_file)
+        self.__min_chunk_size = min_chunk_size
+        self.__max_chunk_size = max_chunk_size
+        self.__min_chunks = min_chunks
+        self.__max_xrun_rate = max_xrun_rate
+        self.__max_load = max_load
+        self.__unstable_transmissions = unstable_transmissions
+        self.__retry_chunks = retry_chunks
+        self.__chunks = 0
+        self.__failures = 0
+        self.__unstable: set[int] = set()
+        self.__chunk_size = min_chunk_size
+        self.settled = False
+        saved = self.__load().get(device_key)
+        if saved:
+            self.__chunk_size = saved["chunk_size"]
+            self.__unstable = set(saved["unstable"])
+            self.settled = saved["settled"]
+
+    @property
+    def chunk_size(self) -> int:
+        """The chunk size to use for the next transmission"""
+        return self.__chunk_size
+
+    def record(self, chunks: int, xruns: int, load: float) -> int:
+        """Record a transmission's statistics and get the next chunk size
+
+        Parameters
+        ----------
+        chunks: The number of chunks streamed
+        xruns: The number of underruns and overruns which occurred
+        load: A high percentile of the fraction of a chunk's period spent
+            processing it
+
+        Returns
+        -------
+        The chunk size to use for the next transmission
+        """
+        if not chunks:
+            return self.__chunk_size
+        if (
+            xruns / max(chunks, self.__min_chunks) > self.__max_xrun_rate
+            or load > self.__max_load
+        ):
+            self.__failures += 1
+            if self.__failures >= self.__unstable_transmissions:
+                self.__unstable.add(self.__chunk_size)
+                self.settled = False
+                self.__change(min(self.__chunk_size * 2, self.__max_chunk_size))
+            return self.__chunk_size
+        self.__failures = 0
+        self.__chunks += chunks
+        smaller = self.__chunk_size // 2
+        if smaller < self.__min_chunk_size:
+            if not self.settled and self.__chunks >= self.__min_chunks:
+                self.settled = True
+                self.__save()
+        elif self.settled:
+            if self.__chunks >= self.__retry_chunks and smaller in self.__unstable:
+                self.__unstable.discard(smaller)
+                self.settled = False
+                self.__change(smaller)
+        elif self.__chunks >= self.__min_chunks:
+            if smaller in self.__unstable:
+                self.settled = True
+                self.__save()
+            else:
+                self.__change(smaller)
+        return self.__chunk_size
+
+    def __change(self, chunk_size: int) -> None:
+        """Change to a new chunk size and reset its statistics
+
+        Parameters
+        ----------
+        chunk_size: The new chunk size
+        """
+        self.__chunk_size = chunk_size
+        self.__chunks = 0
+        self.__failures = 0
+        self.__save()
+
+    def __load(self) -> dict[str, dict]:
+        """Load all persisted tuning results
+
+        Returns
+        -------
+        A dictionary mapping device keys to tuning results
+        """
+        try:
+            with open(self.__tuning_file, encoding="utf-8") as tuning_file:
+                return load(tuning_file)
+        except (OSError, JSONDecodeError):
+            return {}
+
+    def __save(self) -> None:
+        """Persist the tuning results for this device"""
+        results = self.__load()
+        results[self.__device_key] = {
+            "chunk_size": self.__chunk_size,
+            "settled": self.settled,
+            "unstable": sorted(self.__unstable)
+        }
+        try:
+            with open(self.__tuning_file, "w", encoding="utf-8") as tuning_file:
+                dump(results, tuning_file, indent=2)
+        except OSError:
+            print("ERROR: Could not save audio tuning to", self.__tuning_file)
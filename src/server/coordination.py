@@ -0,0 +1,579 @@
+""" Classes for coordinating several server processes sharing a pool of
+    transmitters, with leases on transmitters, floor control of zones and
+    state shared with warm standbys, over a local socket
+
+The first server to start hosts the coordinator, and a standby hosts a new
+one if that server fails. Run this module to host a standalone coordinator
+instead, which outlives any server and keeps arbitrating if one hangs. A
+replacement coordinator holds the leases of the lost one's surviving owners
+for a lease time, so they reclaim their transmitters and roles rather than
+having them taken by standbys.
+
+Exports
+-------
+COORDINATOR_ADDRESS: The default (host, port) of the coordinator
+CoordinationClient: A client of the coordinator, hosting the coordinator
+    itself if none is running
+Coordinator: A thread arbitrating leases and shared state for server
+    processes
+"""
+
+
+from argparse import ArgumentParser
+from io import BufferedRWPair
+from json import dumps, loads
+from os import getpid
+from socket import create_connection, create_server, gethostname, socket
+from threading import Condition, Event, RLock, Thread
+from time import monotonic
+from typing import Any, Callable
+
+from asyncmassclients import ILeaseClient
+
+
+COORDINATOR_ADDRESS = ("127.0.0.1", 50919)  # Local address on which server processes coordinate
+
+
+class Coordinator(Thread):
+    """A thread arbitrating leases and shared state for server processes
+
+    Requests and responses are JSON lines over TCP. A lease is granted to
+    one client at a time and lapses when not renewed within its lease time,
+    or at once when all of its holder's connections close, so a crashed
+    server's transmitters and floors are freed immediately. Clients may
+    wait for a lease, and are granted it as soon as it is freed. Shared
+    state is a dictionary of published values with a version, so clients
+    only download it when it has changed. Synchronizing also returns the
+    owners of all leases and the name of the hosting client, from which a
+    client replacing a lost coordinator carries over the leases of owners
+    other than the lost host.
+
+    Methods
+    -------
+    close: Stop accepting connections
+    run: Begin accepting connections
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int] = COORDINATOR_ADDRESS,
+        host: str | None = None,
+        leases: dict[str, str] | None = None,
+        lease_time: float = 2.0
+    ) -> None:
+        """Parameters
+        ----------
+        address (Optional): The (host, port) to listen on
+        host (Optional): The name of the client hosting the coordinator, or
+            None for a standalone coordinator
+        leases (Optional): A dictionary mapping resources to the owners of
+            their leases on a lost coordinator, held for the owners to
+            reclaim
+        lease_time (Optional): The seconds carried over leases are held for
+
+        Raises
+        ------
+        OSError: If the address is already in use, such as by another
+            coordinator
+        """
+        super().__init__(name="coordinator", daemon=True)
+        self.__server = create_server(address)
+        self.__condition = Condition()
+        self.__connections: dict[str, int] = {}
+        self.__host = host
+        expiry = monotonic() + lease_time
+        self.__leases: dict[str, tuple[str, float]] = {
+            resource: (owner, expiry) for resource, owner in (leases or {}).items()
+        }
+        self.__state: dict[str, Any] = {}
+        self.__version = 0
+
+    def close(self) -> None:
+        """Stop accepting connections"""
+        self.__server.close()
+
+    def run(self) -> None:
+        """Begin accepting connections, serving each on its own thread"""
+        while True:
+            try:
+                connection, _ = self.__server.accept()
+            except OSError:
+                return
+            Thread(target=self.__serve, args=(connection,), daemon=True).start()
+
+    def __acquire(self, client: str, request: dict) -> dict:
+        """Grant a lease if it is free, lapsed or already held by the client,
+        waiting for it to be freed if requested
+
+        Parameters
+        ----------
+        client: The name of the requesting client
+        request: The request, with the resource, lease time and whether to
+            wait
+
+        Returns
+        -------
+        Whether the lease was granted, and its owner
+        """
+        resource = request["resource"]
+        while True:
+            now = monotonic()
+            owner, expiry = self.__leases.get(resource, (client, 0.0))
+            if owner == client or expiry <= now:
+                self.__leases[resource] = (client, now + request["lease_time"])
+                return {"granted": True, "owner": client}
+            if not request.get("wait"):
+                return {"granted": False, "owner": owner}
+            self.__condition.wait(expiry - now)
+
+    def __handle(self, client: str, request: dict) -> dict:
+        """Handle a request from a client
+
+        Parameters
+        ----------
+        client: The name of the requesting client
+        request: The request
+
+        Returns
+        -------
+        The response
+        """
+        operation = request["op"]
+        with self.__condition:
+            if operation == "acquire":
+                return self.__acquire(client, request)
+            if operation == "release":
+                if self.__leases.get(request["resource"], ("",))[0] == client:
+                    del self.__leases[request["resource"]]
+                    self.__condition.notify_all()
+                return {}
+            if operation == "renew":
+                expiry = monotonic() + request["lease_time"]
+                held = [
+                    resource for resource in request["resources"]
+                    if self.__leases.get(resource, ("",))[0] == client
+                ]
+                for resource in held:
+                    self.__leases[resource] = (client, expiry)
+                return {"held": held}
+            if operation == "publish":
+                self.__state[request["key"]] = request["value"]
+                self.__version += 1
+                return {"version": self.__version}
+            if operation == "sync":
+                response = {
+                    "version": self.__version,
+                    "host": self.__host,
+                    "leases": {
+                        resource: owner
+                        for resource, (owner, _) in self.__leases.items()
+                    }
+                }
+                if request["version"] != self.__version:
+                    response["state"] = self.__state
+                return response
+        return {"error": f"Unknown operation {operation}"}
+
+    def __serve(self, connection: socket) -> None:
+        """Serve a client's connection, freeing the client's leases once all
+        of its connections have closed
+
+        Parameters
+        ----------
+        connection: The client's connection
+        """
+        client = None
+        try:
+            with connection, connection.makefile("rwb") as stream:
+                for line in stream:
+                    request = loads(line)
+                    if request["op"] == "hello":
+                        client = request["client"]
+                        with self.__condition:
+                            self.__connections[client] = self.__connections.get(client, 0) + 1
+                        response: dict = {}
+                    elif client is None:
+                        response = {"error": "Expected hello"}
+                    else:
+                        response = self.__handle(client, request)
+                    stream.write(dumps(response).encode() + b"\n")
+                    stream.flush()
+        except (OSError, ValueError, KeyError):
+            pass
+        if client is None:
+            return
+        with self.__condition:
+            self.__connections[client] -= 1
+            if self.__connections[client]:
+                return
+            del self.__connections[client]
+            for resource, (owner, _) in list(self.__leases.items()):
+                if owner == client:
+                    del self.__leases[resource]
+            self.__condition.notify_all()
+
+
+class CoordinationClient(ILeaseClient):
+    """A client of the coordinator, hosting the coordinator itself if none
+    is running
+
+    Held leases are renewed, and shared state synchronized, from a
+    background thread several times per lease time. If the coordinator is
+    lost, the client reconnects, hosting a new coordinator if none has
+    taken its place, then reacquires its leases and republishes its state;
+    a lease which has been taken by another client meanwhile is reported as
+    lost. A hosted replacement holds the last synchronized leases of every
+    owner but the lost coordinator's host, which is presumed to have failed
+    with it, so a standby hosting it does not take over from a live primary.
+
+    Attributes
+    ----------
+    name: The name identifying this client to the coordinator
+    state: The most recently synchronized shared state
+
+    Methods
+    -------
+    acquire: Acquire a lease on a resource
+    close: Release all leases and disconnect
+    publish: Publish a value to the shared state
+    release: Release a lease on a resource
+    release_floor: Release the floor of a zone
+    request_floor: Request the floor of a zone
+    wait_for: Acquire a lease on a resource as soon as it is freed
+    """
+
+    def __init__(
+        self,
+        name: str | None = None,
+        address: tuple[str, int] = COORDINATOR_ADDRESS,
+        lease_time: float = 2.0,
+        host: bool = True
+    ) -> None:
+        """Parameters
+        ----------
+        name (Optional): The name identifying this client to the coordinator,
+            or None to use the host name and process ID
+        address (Optional): The (host, port) of the coordinator
+        lease_time (Optional): The seconds a lease lasts without renewal
+        host (Optional): Whether to host a coordinator if none is running
+
+        Raises
+        ------
+        OSError: If the coordinator could neither be reached nor hosted
+        """
+        self.name = name or f"{gethostname()}:{getpid()}"
+        self.state: dict[str, Any] = {}
+        self.__address = address
+        self.__closed = Event()
+        self.__coordinator: Coordinator | None = None
+        self.__held: dict[str, Callable[[str], None] | None] = {}
+        self.__host = host
+        self.__lease_time = lease_time
+        self.__published: dict[str, Any] = {}
+        self.__request_lock = RLock()
+        self.__stream: BufferedRWPair | None = None
+        self.__synced_host: str | None = None
+        self.__synced_leases: dict[str, str] = {}
+        self.__version = -1
+        self.__stream = self.__connect(lease_time)
+        Thread(target=self.__maintain, name="coordination", daemon=True).start()
+
+    def acquire(
+        self, resource: str, on_lost: Callable[[str], None] | None = None
+    ) -> bool:
+        """Acquire a lease on a resource, renewing it until released
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        on_lost (Optional): Called with the resource's name if the lease is
+            lost to another client
+
+        Returns
+        -------
+        Whether the lease was acquired
+        """
+        response = self.__request({
+            "op": "acquire", "resource": resource, "lease_time": self.__lease_time
+        })
+        if not response.get("granted"):
+            return False
+        self.__held[resource] = on_lost
+        return True
+
+    def close(self) -> None:
+        """Release all leases and disconnect, stopping any hosted coordinator"""
+        self.__closed.set()
+        with self.__request_lock:
+            if self.__stream:
+                self.__stream.close()
+            self.__stream = None
+        if self.__coordinator:
+            self.__coordinator.close()
+
+    def publish(self, key: str, value: Any) -> None:
+        """Publish a value to the shared state, republishing it if the
+        coordinator is replaced
+
+        Parameters
+        ----------
+        key: The key of the value
+        value: The JSON-serializable value
+        """
+        self.__published[key] = value
+        self.__request({"op": "publish", "key": key, "value": value})
+
+    def release(self, resource: str) -> None:
+        """Release a lease on a resource
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        """
+        if self.__held.pop(resource, False) is not False:
+            self.__request({"op": "release", "resource": resource})
+
+    def release_floor(self, zone_name: str) -> None:
+        """Release the floor of a zone
+
+        Parameters
+        ----------
+        zone_name: The name of the zone
+        """
+        self.release(f"floor:{zone_name}")
+
+    def request_floor(self, zone_name: str) -> bool:
+        """Request the floor of a zone, which one server at a time may hold
+        to transmit on the zone
+
+        Parameters
+        ----------
+        zone_name: The name of the zone
+
+        Returns
+        -------
+        Whether the floor was granted
+        """
+        return self.acquire(f"floor:{zone_name}")
+
+    def wait_for(
+        self,
+        resource: str,
+        on_acquired: Callable[[str], None],
+        on_lost: Callable[[str], None] | None = None
+    ) -> None:
+        """Acquire a lease on a resource as soon as it is freed, waiting on a
+        background thread
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        on_acquired: Called with the resource's name once it is acquired
+        on_lost (Optional): Called with the resource's name if the lease is
+            later lost to another client
+        """
+        Thread(
+            target=self.__wait_for,
+            args=(resource, on_acquired, on_lost),
+            name=f"wait {resource}",
+            daemon=True
+        ).start()
+
+    def __connect(self, timeout: float | None) -> BufferedRWPair:
+        """Connect to the coordinator, hosting it if none is running
+
+        Parameters
+        ----------
+        timeout: The seconds to wait for each response, or None to wait
+            indefinitely
+
+        Returns
+        -------
+        The connection's stream
+
+        Raises
+        ------
+        OSError: If the coordinator could neither be reached nor hosted
+        """
+        try:
+            connection = create_connection(self.__address, timeout=self.__lease_time)
+        except OSError:
+            if not self.__host:
+                raise
+            try:
+                coordinator = Coordinator(
+                    self.__address,
+                    self.name,
+                    {
+                        resource: owner
+                        for resource, owner in self.__synced_leases.items()
+                        if owner != self.__synced_host
+                    },
+                    self.__lease_time
+                )
+                coordinator.start()
+                self.__coordinator = coordinator
+                print("Hosting the server coordinator")
+            except OSError:
+                pass  # Another process started hosting it first
+            connection = create_connection(self.__address, timeout=self.__lease_time)
+        connection.settimeout(timeout)
+        stream = connection.makefile("rwb")
+        connection.close()  # The stream keeps the socket open
+        self.__send(stream, {"op": "hello", "client": self.name})
+        return stream
+
+    def __maintain(self) -> None:
+        """Renew held leases and synchronize shared state, reconnecting if
+        the coordinator is lost
+        """
+        while not self.__closed.wait(self.__lease_time / 3):
+            response = self.__request({
+                "op": "renew",
+                "resources": list(self.__held),
+                "lease_time": self.__lease_time
+            })
+            if "held" not in response:
+                continue
+            for resource in set(self.__held) - set(response["held"]):
+                self.__lose(resource)
+            response = self.__request({"op": "sync", "version": self.__version})
+            # Merge, so a restarted coordinator does not erase cached state
+            self.state.update(response.get("state", {}))
+            self.__version = response.get("version", self.__version)
+            self.__synced_host = response.get("host")
+            self.__synced_leases = response.get("leases", self.__synced_leases)
+
+    def __lose(self, resource: str) -> None:
+        """Forget a lease lost to another client and report it
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        """
+        on_lost = self.__held.pop(resource, None)
+        print(f"WARNING: Lost lease on {resource} to another server")
+        if on_lost:
+            on_lost(resource)
+
+    def __reconnect(self) -> None:
+        """Reconnect to the coordinator, reacquiring held leases and
+        republishing state, and report leases taken meanwhile as lost
+
+        Raises
+        ------
+        OSError: If the coordinator could neither be reached nor hosted
+        """
+        self.__stream = self.__connect(self.__lease_time)
+        self.__version = -1
+        for resource in list(self.__held):
+            response = self.__send(self.__stream, {
+                "op": "acquire", "resource": resource, "lease_time": self.__lease_time
+            })
+            if not response.get("granted"):
+                self.__lose(resource)
+        for key, value in self.__published.items():
+            self.__send(self.__stream, {"op": "publish", "key": key, "value": value})
+
+    def __request(self, request: dict) -> dict:
+        """Send a request over the main connection, reconnecting once if the
+        coordinator was lost
+
+        Parameters
+        ----------
+        request: The request
+
+        Returns
+        -------
+        The response, or an empty dictionary if the coordinator could not be
+            reached
+        """
+        with self.__request_lock:
+            if self.__closed.is_set():
+                return {}
+            for _ in range(2):
+                try:
+                    if self.__stream is None:
+                        self.__reconnect()
+                    return self.__send(self.__stream, request)  # type: ignore
+                except (OSError, ValueError):
+                    if self.__stream:
+                        self.__stream.close()
+                    self.__stream = None
+            print("ERROR: Could not reach the server coordinator")
+            return {}
+
+    @staticmethod
+    def __send(stream: BufferedRWPair, request: dict) -> dict:
+        """Send a request and read its response
+
+        Parameters
+        ----------
+        stream: The connection's stream
+        request: The request
+
+        Returns
+        -------
+        The response
+
+        Raises
+        ------
+        OSError: If the connection was lost
+        """
+        stream.write(dumps(request).encode() + b"\n")
+        stream.flush()
+        line = stream.readline()
+        if not line:
+            raise ConnectionResetError("Coordinator closed the connection")
+        return loads(line)
+
+    def __wait_for(
+        self,
+        resource: str,
+        on_acquired: Callable[[str], None],
+        on_lost: Callable[[str], None] | None
+    ) -> None:
+        """Wait on a dedicated connection for a lease to be granted,
+        reconnecting if the coordinator is lost
+
+        Parameters
+        ----------
+        resource: The name of the resource
+        on_acquired: Called with the resource's name once it is acquired
+        on_lost: Called with the resource's name if the lease is later lost
+        """
+        while not self.__closed.is_set():
+            try:
+                stream = self.__connect(None)
+                response = self.__send(stream, {
+                    "op": "acquire",
+                    "resource": resource,
+                    "lease_time": self.__lease_time,
+                    "wait": True
+                })
+            except (OSError, ValueError):
+                self.__closed.wait(0.01)
+                continue
+            if response.get("granted"):
+                self.__held[resource] = on_lost
+                # Renew over the main connection before this one is closed
+                self.__request({
+                    "op": "acquire", "resource": resource, "lease_time": self.__lease_time
+                })
+                stream.close()
+                on_acquired(resource)
+                return
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Host a standalone server coordinator")
+    parser.add_argument("--host", default=COORDINATOR_ADDRESS[0])
+    parser.add_argument("--port", type=int, default=COORDINATOR_ADDRESS[1])
+    args = parser.parse_args()
+    coordinator = Coordinator((args.host, args.port))
+    print(f"Coordinating servers on {args.host}:{args.port}")
+    coordinator.start()
+    try:
+        coordinator.join()
+    except KeyboardInterrupt:
+        coordinator.close()
@@ -0,0 +1,623 @@
+""" A deterministic stand-in for PyAudio, for testing and benchmarking the
+    audio pipeline without sound hardware
+
+Exports
+-------
+FakePyAudio: A stand-in for PyAudio whose devices are virtual inputs and
+    outputs on a simulated clock
+FakeStream: A stream on a virtual device
+SimulatedClock: A device clock shared by virtual devices
+sine: Get a generator source of a sine tone
+VirtualInput: A virtual input device fed from a WAV file or a generator
+VirtualOutput: A virtual output device recording what is written to it
+"""
+
+
+import wave
+from pathlib import Path
+from random import Random
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from typing import Any, Callable
+
+import numpy as np
+
+
+_PA_CONTINUE = 0  # pyaudio.paContinue
+_PA_INPUT_OVERFLOWED = -9981  # pyaudio.paInputOverflowed
+_PA_INT16 = 8  # pyaudio.paInt16
+
+
+def sine(frequency: float, amplitude: float = 0.5) -> Callable[[int, int, int], np.ndarray]:
+    """Get a generator source of a sine tone
+
+    Parameters
+    ----------
+    frequency: The frequency of the tone in Hz
+    amplitude (Optional): The amplitude of the tone relative to full scale
+
+    Returns
+    -------
+    A source taking the first frame, number of frames and sample rate, and
+    returning the frames as floats relative to full scale
+    """
+    def source(start_frame: int, frames: int, sample_rate: int) -> np.ndarray:
+        times = np.arange(start_frame, start_frame + frames) / sample_rate
+        return amplitude * np.sin(2 * np.pi * frequency * times)
+    return source
+
+
+class SimulatedClock:
+    """A device clock shared by virtual devices
+
+    A paced clock follows the wall clock at a given speed, so devices
+    deliver and consume audio in real time (or faster). An unpaced clock is
+    virtual time: waiting jumps it forward instantly, so the pipeline runs as
+    fast as it can, deterministically, and output can never underrun.
+
+    Attributes
+    ----------
+    paced: Whether the clock follows the wall clock
+
+    Methods
+    -------
+    now: Get the device time
+    wait_until: Wait until a device time
+    """
+
+    def __init__(self, speed: float | None = 1.0) -> None:
+        """Parameters
+        ----------
+        speed (Optional): The device seconds per wall second, or None for
+            virtual time
+        """
+        self.__lock = Lock()
+        self.__speed = speed
+        self.__start_time = perf_counter()
+        self.__virtual_time = 0.0
+
+    @property
+    def paced(self) -> bool:
+        """Whether the clock follows the wall clock"""
+        return self.__speed is not None
+
+    def now(self) -> float:
+        """Get the device time
+
+        Returns
+        -------
+        The seconds since the clock was created
+        """
+        if self.__speed is None:
+            return self.__virtual_time
+        return (perf_counter() - self.__start_time) * self.__speed
+
+    def wait_until(self, time: float) -> None:
+        """Wait until a device time
+
+        Parameters
+        ----------
+        time: The device time to wait until
+        """
+        if self.__speed is None:
+            with self.__lock:
+                self.__virtual_time = max(self.__virtual_time, time)
+            return
+        remaining = time - self.now()
+        if remaining > 0:
+            sleep(remaining / self.__speed)
+
+
+class VirtualInput:
+    """A virtual input device fed from a WAV file or a generator
+
+    Attributes
+    ----------
+    capture_times: The device time at which each chunk read had been fully
+        captured
+    name: The name of the device
+
+    Methods
+    -------
+    frames: Get frames from the source
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source: str | Path | Callable[[int, int, int], np.ndarray],
+        loop: bool = True
+    ) -> None:
+        """Parameters
+        ----------
+        name: The name of the device
+        source: The path of a 16-bit WAV file, or a generator taking the
+            first frame, number of frames and sample rate and returning the
+            frames, mono or per channel, as 16-bit integers or as floats
+            relative to full scale
+        loop (Optional): Whether to loop a WAV file, rather than fall silent,
+            once it ends
+
+        Raises
+        ------
+        ValueError: If a WAV file is not 16-bit
+        """
+        self.capture_times: list[float] = []
+        self.name = name
+        self.__loop = loop
+        self.__generator: Callable[[int, int, int], np.ndarray] | None = None
+        self.__recording = np.zeros((0, 1), dtype=np.int16)
+        if callable(source):
+            self.__generator = source
+            return
+        with wave.open(str(source), "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise ValueError(f"WAV file '{source}' is not 16-bit")
+            self.__recording = np.frombuffer(
+                wav_file.readframes(wav_file.getnframes()), dtype=np.int16
+            ).reshape(-1, wav_file.getnchannels())
+
+    def frames(
+        self, start_frame: int, frames: int, audio_channels: int, sample_rate: int
+    ) -> bytes:
+        """Get frames from the source
+
+        Parameters
+        ----------
+        start_frame: The index of the first frame
+        frames: The number of frames
+        audio_channels: The number of interleaved audio channels
+        sample_rate: The sample rate of the audio
+
+        Returns
+        -------
+        The interleaved 16-bit audio frames, with mono sources copied to
+        every channel and other sources mixed down to mono first if their
+        channel count differs
+        """
+        if self.__generator:
+            samples = np.asarray(self.__generator(start_frame, frames, sample_rate))
+            if samples.dtype.kind == "f":
+                samples = np.clip(samples * 32767, -32768, 32767)
+            samples = samples.astype(np.int16).reshape(frames, -1)
+        elif not len(self.__recording):
+            samples = np.zeros((frames, 1), dtype=np.int16)
+        elif self.__loop:
+            samples = np.take(
+                self.__recording, np.arange(start_frame, start_frame + frames),
+                axis=0, mode="wrap"
+            )
+        else:
+            samples = self.__recording[start_frame:start_frame + frames]
+            samples = np.concatenate((
+                samples,
+                np.zeros((frames - len(samples), samples.shape[1]), dtype=np.int16)
+            ))
+        if samples.shape[1] != audio_channels:
+            samples = np.repeat(
+                samples.mean(axis=1, keepdims=True).astype(np.int16),
+                audio_channels, axis=1
+            )
+        return samples.tobytes()
+
+
+class VirtualOutput:
+    """A virtual output device recording what is written to it
+
+    Attributes
+    ----------
+    data: The interleaved 16-bit audio frames written, if recorded
+    name: The name of the device
+    underruns: The number of times the device ran out of audio between
+        writes
+    writes: The device time of each write, the device time at which its
+        first frame plays, and its number of frames
+
+    Methods
+    -------
+    record_write: Record a write to the device
+    """
+
+    def __init__(
+        self,
+        name: str,
+        record: bool = True,
+        on_write: Callable[[], None] | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        name: The name of the device
+        record (Optional): Whether to keep the audio frames written
+        on_write (Optional): Called after each write, such as to sample
+            instrumentation once per chunk
+        """
+        self.data = bytearray()
+        self.name = name
+        self.underruns = 0
+        self.writes: list[tuple[float, float, int]] = []
+        self.__on_write = on_write
+        self.__record = record
+
+    def record_write(
+        self, write_time: float, play_time: float, chunk: bytes, frames: int
+    ) -> None:
+        """Record a write to the device
+
+        Parameters
+        ----------
+        write_time: The device time of the write
+        play_time: The device time at which the chunk's first frame plays
+        chunk: The interleaved 16-bit audio frames written
+        frames: The number of frames written
+        """
+        self.writes.append((write_time, play_time, frames))
+        if self.__record:
+            self.data += chunk
+        if self.__on_write:
+            self.__on_write()
+
+
+class FakeStream:
+    """A stream on a virtual device, emulating the blocking and callback
+    interfaces of a PyAudio stream
+
+    Input is captured continuously from when the stream starts: a read waits
+    until its frames have been captured, plus a random scheduling delay,
+    and overflows if the reader has fallen more than the stream's buffers
+    behind. Output plays continuously from the first write: a write waits
+    while the stream's buffers are full, and an underrun is recorded if the
+    device ran out of audio before it.
+
+    Methods
+    -------
+    close: Close the stream
+    get_write_available: Get the number of frames which can be written
+        without waiting
+    is_active: Whether the stream is started
+    read: Read captured frames
+    start_stream: Start the stream
+    stop_stream: Stop the stream
+    write: Write frames to be played
+    """
+
+    def __init__(
+        self,
+        device: VirtualInput | VirtualOutput,
+        clock: SimulatedClock,
+        audio_channels: int,
+        sample_rate: int,
+        frames_per_buffer: int,
+        buffers: int,
+        jitter: Callable[[], float],
+        stream_callback: Callable | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        device: The virtual device
+        clock: The device clock
+        audio_channels: The number of interleaved audio channels
+        sample_rate: The sample rate of the audio
+        frames_per_buffer: The number of frames per buffer, and per callback
+        buffers: The number of buffers the stream holds
+        jitter: Called for the scheduling delay of each read or callback in
+            seconds
+        stream_callback (Optional): Called with each captured buffer, for a
+            callback input stream
+        """
+        self.__active = False
+        self.__audio_channels = audio_channels
+        self.__callback = stream_callback
+        self.__callback_thread: Thread | None = None
+        self.__capacity = frames_per_buffer * buffers
+        self.__clock = clock
+        self.__device = device
+        self.__frames_per_buffer = frames_per_buffer
+        self.__jitter = jitter
+        self.__play_end = 0.0
+        self.__position = 0
+        self.__sample_rate = sample_rate
+        self.__start_time = 0.0
+        self.__stop_flag = Event()
+
+    def close(self) -> None:
+        """Close the stream"""
+        self.stop_stream()
+
+    def get_write_available(self) -> int:
+        """Get the number of frames which can be written without waiting
+
+        Returns
+        -------
+        The number of frames
+        """
+        queued = max(self.__play_end - self.__clock.now(), 0.0) * self.__sample_rate
+        return max(self.__capacity - int(queued), 0)
+
+    def is_active(self) -> bool:
+        """Whether the stream is started"""
+        return self.__active
+
+    def read(self, num_frames: int, exception_on_overflow: bool = True) -> bytes:
+        """Read captured frames, waiting until they have been captured
+
+        Parameters
+        ----------
+        num_frames: The number of frames to read
+        exception_on_overflow (Optional): Whether to raise if the stream
+            overflowed before the read
+
+        Returns
+        -------
+        The interleaved 16-bit audio frames
+
+        Raises
+        ------
+        OSError: With errno paInputOverflowed if frames were lost because the
+            reader fell behind
+        """
+        deadline = self.__start_time + (self.__position + num_frames) / self.__sample_rate
+        captured = int((self.__clock.now() - self.__start_time) * self.__sample_rate)
+        if captured - self.__position > self.__capacity:
+            self.__position = captured - num_frames  # The oldest frames are lost
+            deadline = self.__start_time + captured / self.__sample_rate
+            if exception_on_overflow:
+                raise OSError(_PA_INPUT_OVERFLOWED, "Input overflowed")
+        return self.__capture(num_frames, deadline)
+
+    def start_stream(self) -> None:
+        """Start the stream, from which input is captured or once output has
+        been written
+        """
+        if self.__active:
+            return
+        self.__active = True
+        self.__start_time = self.__clock.now()
+        self.__play_end = self.__start_time
+        self.__position = 0
+        if self.__callback:
+            self.__stop_flag.clear()
+            self.__callback_thread = Thread(target=self.__run_callback, daemon=True)
+            self.__callback_thread.start()
+
+    def stop_stream(self) -> None:
+        """Stop the stream"""
+        self.__active = False
+        self.__stop_flag.set()
+        if self.__callback_thread:
+            self.__callback_thread.join()
+            self.__callback_thread = None
+
+    def write(self, frames: bytes, num_frames: int | None = None) -> None:
+        """Write frames to be played, waiting while the buffers are full
+
+        Parameters
+        ----------
+        frames: The interleaved 16-bit audio frames
+        num_frames (Optional): The number of frames, or None to infer it
+        """
+        if num_frames is None:
+            num_frames = len(frames) // (2 * self.__audio_channels)
+        now = self.__clock.now()
+        if self.__play_end < now:
+            if self.__device.writes:  # type: ignore[union-attr]
+                self.__device.underruns += 1  # type: ignore[union-attr]
+            self.__play_end = now
+        space_time = self.__play_end - (self.__capacity - num_frames) / self.__sample_rate
+        if space_time > now:
+            self.__clock.wait_until(space_time)
+            now = self.__clock.now()
+        self.__device.record_write(now, self.__play_end, frames, num_frames)  # type: ignore[union-attr]
+        self.__play_end += num_frames / self.__sample_rate
+
+    def __capture(self, num_frames: int, deadline: float) -> bytes:
+        """Wait until frames have been captured, plus a scheduling delay, and
+        take them from the device
+
+        Parameters
+        ----------
+        num_frames: The number of frames
+        deadline: The device time at which the last frame is captured
+
+        Returns
+        -------
+        The interleaved 16-bit audio frames
+        """
+        self.__clock.wait_until(deadline + self.__jitter())
+        chunk = self.__device.frames(  # type: ignore[union-attr]
+            self.__position, num_frames, self.__audio_channels, self.__sample_rate
+        )
+        self.__position += num_frames
+        self.__device.capture_times.append(deadline)  # type: ignore[union-attr]
+        return chunk
+
+    def __run_callback(self) -> None:
+        """Pass each captured buffer to the stream callback until stopped"""
+        while not self.__stop_flag.is_set():
+            deadline = self.__start_time + (
+                self.__position + self.__frames_per_buffer
+            ) / self.__sample_rate
+            chunk = self.__capture(self.__frames_per_buffer, deadline)
+            time_info = {
+                "input_buffer_adc_time": deadline - self.__frames_per_buffer / self.__sample_rate,
+                "current_time": self.__clock.now(),
+                "output_buffer_dac_time": 0.0
+            }
+            _, status = self.__callback(  # type: ignore[misc]
+                chunk, self.__frames_per_buffer, time_info, 0
+            )
+            if status != _PA_CONTINUE:
+                break
+
+
+class FakePyAudio:
+    """A stand-in for PyAudio whose devices are virtual inputs and outputs on
+    a simulated clock, for injection into the audio streamer
+
+    Device indices number the inputs first, then the outputs, and the first
+    of each is the default. Scheduling jitter delays each read and callback
+    by a random amount, from a seeded generator so runs are repeatable.
+
+    Attributes
+    ----------
+    clock: The device clock
+    inputs: The virtual input devices
+    outputs: The virtual output devices
+
+    Methods
+    -------
+    get_device_count: Get the number of devices
+    get_device_info_by_index: Get a device's description
+    open: Open a stream on a device
+    terminate: Release the stand-in
+    """
+
+    def __init__(
+        self,
+        inputs: list[VirtualInput],
+        outputs: list[VirtualOutput],
+        clock: SimulatedClock | None = None,
+        jitter: float = 0.0,
+        buffers: int = 4,
+        seed: int | None = 0
+    ) -> None:
+        """Parameters
+        ----------
+        inputs: The virtual input devices
+        outputs: The virtual output devices
+        clock (Optional): The device clock, or None for a real-time clock
+        jitter (Optional): The mean scheduling delay of each read and
+            callback in seconds, exponentially distributed
+        buffers (Optional): The number of buffers each stream holds, beyond
+            which input overflows and output waits
+        seed (Optional): The seed for scheduling jitter
+        """
+        self.clock = clock or SimulatedClock()
+        self.inputs = inputs
+        self.outputs = outputs
+        self.__buffers = buffers
+        self.__jitter = jitter
+        self.__random = Random(seed)
+
+    def get_device_count(self) -> int:
+        """Get the number of devices
+
+        Returns
+        -------
+        The number of virtual inputs and outputs
+        """
+        return len(self.inputs) + len(self.outputs)
+
+    def get_device_info_by_index(self, device_index: int) -> dict[str, Any]:
+        """Get a device's description
+
+        Parameters
+        ----------
+        device_index: The index of the device
+
+        Returns
+        -------
+        The device's index, name and maximum input and output channels
+        """
+        is_input = device_index < len(self.inputs)
+        device = self.__get_device(device_index)
+        return {
+            "index": device_index,
+            "name": device.name,
+            "maxInputChannels": 2 if is_input else 0,
+            "maxOutputChannels": 0 if is_input else 2,
+            "defaultSampleRate": 44100.0
+        }
+
+    def open(
+        self,
+        rate: int,
+        channels: int,
+        format: int,  # pylint: disable=redefined-builtin
+        input: bool = False,  # pylint: disable=redefined-builtin
+        output: bool = False,
+        input_device_index: int | None = None,
+        output_device_index: int | None = None,
+        frames_per_buffer: int = 1024,
+        start: bool = True,
+        stream_callback: Callable | None = None
+    ) -> FakeStream:
+        """Open a stream on a device
+
+        Parameters
+        ----------
+        rate: The sample rate of the audio
+        channels: The number of interleaved audio channels
+        format: The sample format, which must be paInt16
+        input (Optional): Whether to open an input stream
+        output (Optional): Whether to open an output stream
+        input_device_index (Optional): The index of the input device, or
+            None for the default
+        output_device_index (Optional): The index of the output device, or
+            None for the default
+        frames_per_buffer (Optional): The number of frames per buffer
+        start (Optional): Whether to start the stream immediately
+        stream_callback (Optional): Called with each captured buffer, for a
+            callback input stream
+
+        Returns
+        -------
+        The stream
+
+        Raises
+        ------
+        ValueError: If the stream is not 16-bit, not exactly one of input and
+            output, or a callback stream on an unpaced clock
+        """
+        if format != _PA_INT16:
+            raise ValueError("Only 16-bit streams are supported")
+        if input == output:
+            raise ValueError("A stream must be exactly one of input and output")
+        if stream_callback and not self.clock.paced:
+            raise ValueError("Callback streams need a paced clock")
+        if input:
+            device = self.__get_device(input_device_index or 0)
+        else:
+            device = self.__get_device(
+                len(self.inputs) if output_device_index is None else output_device_index
+            )
+        stream = FakeStream(
+            device, self.clock, channels, rate, frames_per_buffer,
+            self.__buffers, self.__next_jitter, stream_callback
+        )
+        if start:
+            stream.start_stream()
+        return stream
+
+    def terminate(self) -> None:
+        """Release the stand-in, which holds no resources"""
+
+    def __get_device(self, device_index: int) -> VirtualInput | VirtualOutput:
+        """Get a device by index
+
+        Parameters
+        ----------
+        device_index: The index of the device
+
+        Returns
+        -------
+        The virtual device
+
+        Raises
+        ------
+        IOError: If there is no device with the index
+        """
+        devices: list = [*self.inputs, *self.outputs]
+        if not 0 <= device_index < len(devices):
+            raise IOError(f"Invalid device index {device_index}")
+        return devices[device_index]
+
+    def __next_jitter(self) -> float:
+        """Get the next scheduling delay
+
+        Returns
+        -------
+        The delay in seconds
+        """
+        if not self.__jitter:
+            return 0.0
+        return self.__random.expovariate(1 / self.__jitter)
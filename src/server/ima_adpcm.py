@@ -0,0 +1,200 @@
+""" A stateful IMA-ADPCM codec compressing 16-bit audio chunks 4:1 for
+    transport and storage
+
+Each encoded chunk begins with a header holding its frame count and, for
+each channel, the predictor and step index before its first sample, so
+every chunk can be decoded on its own even if earlier chunks were lost.
+The header is followed by the interleaved 4-bit codes, two per byte, low
+nibble first.
+
+Exports
+-------
+ImaAdpcmDecoder: A decoder for chunks of IMA-ADPCM encoded audio
+ImaAdpcmEncoder: A stateful encoder of 16-bit audio chunks to IMA-ADPCM
+"""
+
+
+from array import array
+from struct import Struct
+
+
+_CHUNK_HEADER = Struct("<H")  # Frames in the chunk
+_CHANNEL_HEADER = Struct("<hBx")  # Predictor and step index of a channel
+_MAX_FRAMES = 0xFFFF  # The most frames the chunk header can hold
+
+_INDEX_ADJUSTMENTS = (-1, -1, -1, -1, 2, 4, 6, 8)
+_STEP_SIZES = (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41,
+    45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209,
+    230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876,
+    963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749,
+    3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630,
+    9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385,
+    24623, 27086, 29794, 32767
+)
+
+
+def _build_tables() -> tuple[list[int], list[int]]:
+    """Precompute the decoded difference and next step index for every step
+    index and code, flattened to index * 16 + code
+
+    Returns
+    -------
+    The difference table and the next step index table
+    """
+    differences = []
+    next_indices = []
+    for index, step in enumerate(_STEP_SIZES):
+        for code in range(16):
+            difference = step >> 3
+            if code & 4:
+                difference += step
+            if code & 2:
+                difference += step >> 1
+            if code & 1:
+                difference += step >> 2
+            differences.append(-difference if code & 8 else difference)
+            next_indices.append(
+                min(max(index + _INDEX_ADJUSTMENTS[code & 7], 0), 88)
+            )
+    return differences, next_indices
+
+
+_DIFFERENCES, _NEXT_INDICES = _build_tables()
+
+
+class ImaAdpcmEncoder:
+    """A stateful encoder of 16-bit audio chunks to IMA-ADPCM
+
+    Methods
+    -------
+    encode: Encode a chunk of interleaved 16-bit audio
+    reset: Reset the encoder's state
+    """
+
+    def __init__(self, audio_channels: int = 2) -> None:
+        """Parameters
+        ----------
+        audio_channels (Optional): The number of interleaved audio channels
+        """
+        self.__audio_channels = audio_channels
+        self.__predictors = [0] * audio_channels
+        self.__indices = [0] * audio_channels
+
+    def encode(self, chunk: bytes) -> bytes:
+        """Encode a chunk of interleaved 16-bit audio
+
+        Parameters
+        ----------
+        chunk: The interleaved 16-bit frames to encode
+
+        Returns
+        -------
+        The encoded chunk
+
+        Raises
+        ------
+        ValueError: If the chunk is not whole frames, or has more frames
+            than the chunk header can hold
+        """
+        channels = self.__audio_channels
+        if len(chunk) % (2 * channels):
+            raise ValueError("Chunk is not a whole number of frames")
+        samples = array("h", chunk)
+        frames = len(samples) // channels
+        if frames > _MAX_FRAMES:
+            raise ValueError(f"Chunk has more than {_MAX_FRAMES} frames")
+        header = bytearray(_CHUNK_HEADER.pack(frames))
+        codes = bytearray(frames * channels + (frames * channels) % 2)
+        differences = _DIFFERENCES
+        next_indices = _NEXT_INDICES
+        steps = _STEP_SIZES
+        for channel in range(channels):
+            predictor = self.__predictors[channel]
+            index = self.__indices[channel]
+            header += _CHANNEL_HEADER.pack(predictor, index)
+            position = channel
+            for sample in samples[channel::channels]:
+                difference = sample - predictor
+                if difference < 0:
+                    code = min((-difference << 2) // steps[index], 7) | 8
+                else:
+                    code = min((difference << 2) // steps[index], 7)
+                entry = (index << 4) | code
+                predictor += differences[entry]
+                if predictor > 32767:
+                    predictor = 32767
+                elif predictor < -32768:
+                    predictor = -32768
+                index = next_indices[entry]
+                codes[position] = code
+                position += channels
+            self.__predictors[channel] = predictor
+            self.__indices[channel] = index
+        return bytes(header) + bytes(
+            low | (high << 4) for low, high in zip(codes[0::2], codes[1::2])
+        )
+
+    def reset(self) -> None:
+        """Reset the encoder's state, such as between transmissions"""
+        self.__predictors = [0] * self.__audio_channels
+        self.__indices = [0] * self.__audio_channels
+
+
+class ImaAdpcmDecoder:
+    """A decoder for chunks of IMA-ADPCM encoded audio
+
+    Methods
+    -------
+    decode: Decode a chunk of IMA-ADPCM encoded audio
+    """
+
+    def __init__(self, audio_channels: int = 2) -> None:
+        """Parameters
+        ----------
+        audio_channels (Optional): The number of interleaved audio channels
+        """
+        self.__audio_channels = audio_channels
+
+    def decode(self, chunk: bytes) -> bytes:
+        """Decode a chunk of IMA-ADPCM encoded audio
+
+        Parameters
+        ----------
+        chunk: The encoded chunk
+
+        Returns
+        -------
+        The interleaved 16-bit frames
+
+        Raises
+        ------
+        ValueError: If the chunk is truncated
+        """
+        channels = self.__audio_channels
+        (frames,) = _CHUNK_HEADER.unpack_from(chunk)
+        offset = _CHUNK_HEADER.size + channels * _CHANNEL_HEADER.size
+        if len(chunk) < offset + (frames * channels + 1) // 2:
+            raise ValueError("Truncated IMA-ADPCM chunk")
+        codes = bytearray(2 * (len(chunk) - offset))
+        codes[0::2] = bytes(byte & 15 for byte in chunk[offset:])
+        codes[1::2] = bytes(byte >> 4 for byte in chunk[offset:])
+        samples = array("h", bytes(2 * frames * channels))
+        differences = _DIFFERENCES
+        next_indices = _NEXT_INDICES
+        for channel in range(channels):
+            predictor, index = _CHANNEL_HEADER.unpack_from(
+                chunk, _CHUNK_HEADER.size + channel * _CHANNEL_HEADER.size
+            )
+            position = channel
+            for code in codes[channel:frames * channels:channels]:
+                entry = (index << 4) | code
+                predictor += differences[entry]
+                if predictor > 32767:
+                    predictor = 32767
+                elif predictor < -32768:
+                    predictor = -32768
+                index = next_indices[entry]
+                samples[position] = predictor
+                position += channels
+        return samples.tobytes()
@@ -0,0 +1,389 @@
+""" A command for calibrating the end-to-end latency and frequency response of
+    the transmit path by playing an exponential sine sweep through it and
+    deconvolving the capture
+
+Run from the server directory with `python latency_calibration.py`, passing
+--simulate-delay to calibrate against a simulated path instead of hardware.
+
+Exports
+-------
+LatencyCalibrator: A class for measuring the delay, frequency response and SNR
+    of a calibration channel
+OCTAVE_BANDS: The centre frequencies of the bands in which SNR and gain are
+    reported
+generate_sweep: Generate an exponential sine sweep
+print_results: Print a calibration's summary
+"""
+
+
+from argparse import ArgumentParser
+from json import dump
+from statistics import median
+from sys import exit as sys_exit
+
+import numpy as np
+
+from calibrationchannels import ICalibrationChannel, SimulatedChannel
+
+
+OCTAVE_BANDS = (63, 125, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def generate_sweep(
+    duration: float,
+    sample_rate: int = 44100,
+    start_frequency: float = 40.0,
+    end_frequency: float = 18000.0,
+    fade: float = 0.01
+) -> np.ndarray:
+    """Generate an exponential sine sweep, which spends equal time in each
+    octave and compresses to a sharp peak when deconvolved
+
+    Parameters
+    ----------
+    duration: The duration of the sweep in seconds
+    sample_rate (Optional): The sample rate of the sweep
+    start_frequency (Optional): The frequency at which the sweep starts in Hz
+    end_frequency (Optional): The frequency at which the sweep ends in Hz
+    fade (Optional): The seconds over which the sweep fades in and out
+
+    Returns
+    -------
+    The sweep's samples, with unit amplitude
+    """
+    times = np.arange(int(duration * sample_rate)) / sample_rate
+    rate = np.log(end_frequency / start_frequency)
+    sweep = np.sin(
+        2 * np.pi * start_frequency * duration / rate
+        * (np.exp(times * rate / duration) - 1)
+    )
+    fade_length = int(fade * sample_rate)
+    if fade_length:
+        ramp = np.hanning(2 * fade_length)
+        sweep[:fade_length] *= ramp[:fade_length]
+        sweep[-fade_length:] *= ramp[fade_length:]
+    return sweep
+
+
+class LatencyCalibrator:
+    """A class for measuring the delay, frequency response and SNR of a
+    calibration channel
+
+    Each run plays silence followed by an exponential sine sweep, deconvolves
+    the capture by the sweep to get the path's impulse response, and takes
+    the delay from its peak, refined to a fraction of a frame on an
+    oversampled copy. The peak of a band-limited path lags its pure delay,
+    by about 13 us through the simulated channel's default 8 kHz low-pass,
+    so the delay includes the path's filtering as a listener hears it. The
+    confidence compares the peak with the largest response away from it,
+    and SNR is measured per octave band against the silence captured before
+    the sweep.
+
+    Methods
+    -------
+    calibrate: Measure the channel over several runs and summarise them
+    measure: Measure the channel once
+    """
+
+    def __init__(
+        self,
+        channel: ICalibrationChannel,
+        sample_rate: int = 44100,
+        audio_channels: int = 2,
+        sweep_duration: float = 1.0,
+        lead_in: float = 0.25,
+        max_delay: float = 0.5,
+        level: float = 0.5,
+        capture_channel: int = 0,
+        oversampling: int = 16
+    ) -> None:
+        """Parameters
+        ----------
+        channel: The channel through which to play and capture the sweep
+        sample_rate (Optional): The sample rate of the audio
+        audio_channels (Optional): The number of interleaved audio channels
+        sweep_duration (Optional): The duration of the sweep in seconds
+        lead_in (Optional): The seconds of silence before the sweep, from
+            which the noise floor is measured
+        max_delay (Optional): The longest delay in seconds to search for
+        level (Optional): The amplitude of the sweep relative to full scale
+        capture_channel (Optional): The captured channel to analyse
+        oversampling (Optional): The factor by which the impulse response is
+            oversampled to refine the delay
+        """
+        self.__channel = channel
+        self.__sample_rate = sample_rate
+        self.__audio_channels = audio_channels
+        self.__lead_in_length = int(lead_in * sample_rate)
+        self.__max_delay_length = int(max_delay * sample_rate)
+        self.__capture_channel = capture_channel
+        self.__oversampling = oversampling
+        self.__start_frequency = 40.0
+        self.__end_frequency = min(18000.0, 0.45 * sample_rate)
+        self.__sweep = level * generate_sweep(
+            sweep_duration, sample_rate, self.__start_frequency, self.__end_frequency
+        )
+        self.__reference = np.concatenate((
+            np.zeros(self.__lead_in_length),
+            self.__sweep,
+            np.zeros(self.__max_delay_length + self.__lead_in_length)
+        ))
+        self.__stimulus = np.repeat(
+            np.rint(self.__reference * 32767).astype(np.int16)[:, None],
+            audio_channels,
+            axis=1
+        ).tobytes()
+        self.__bands = [
+            band for band in OCTAVE_BANDS
+            if self.__start_frequency <= band <= self.__end_frequency
+        ]
+
+    def calibrate(self, runs: int = 5) -> dict:
+        """Measure the channel over several runs and summarise them
+
+        Parameters
+        ----------
+        runs (Optional): The number of runs
+
+        Returns
+        -------
+        The median delay in seconds, the delay's spread across runs, the
+            lowest confidence, the median gain and SNR per band in dB, and
+            each run's measurements
+        """
+        results = [self.measure() for _ in range(runs)]
+        delays = [result["delay"] for result in results]
+        return {
+            "delay": median(delays),
+            "delay_spread": max(delays) - min(delays),
+            "confidence": min(result["confidence"] for result in results),
+            "gain_db": {
+                band: median(result["gain_db"][band] for result in results)
+                for band in results[0]["gain_db"]
+            },
+            "snr_db": {
+                band: median(result["snr_db"][band] for result in results)
+                for band in results[0]["snr_db"]
+            },
+            "runs": results
+        }
+
+    def measure(self) -> dict:
+        """Measure the channel once
+
+        Returns
+        -------
+        The delay in seconds, the confidence between 0 and 1, the impulse
+            response's peak-to-noise ratio in dB, and the gain and SNR per
+            band in dB
+        """
+        capture = np.frombuffer(
+            self.__channel.play_and_capture(self.__stimulus), dtype=np.int16
+        ).reshape(-1, self.__audio_channels)[:, self.__capture_channel] / 32767
+
+        size = 1 << int(np.ceil(np.log2(2 * len(self.__reference))))
+        frequencies = np.fft.rfftfreq(size, 1 / self.__sample_rate)
+        reference_spectrum = np.fft.rfft(self.__reference, size)
+        capture_spectrum = np.fft.rfft(capture, size)
+        power = np.abs(reference_spectrum) ** 2
+        response = capture_spectrum * np.conj(reference_spectrum) / (
+            power + 1e-6 * power.max()
+        )
+        in_band = (
+            (frequencies >= self.__start_frequency)
+            & (frequencies <= self.__end_frequency)
+        )
+        response[~in_band] = 0
+
+        delay, confidence, peak_to_noise = self.__find_delay(response, size)
+        offset = self.__lead_in_length + round(delay * self.__sample_rate)
+        signal = capture[offset:offset + len(self.__sweep)]
+        noise = capture[:self.__lead_in_length]
+        gain_db = {}
+        snr_db = {}
+        signal_power = self.__band_powers(signal)
+        noise_power = self.__band_powers(noise)
+        for band in self.__bands:
+            in_octave = (
+                (frequencies >= band / np.sqrt(2)) & (frequencies < band * np.sqrt(2))
+            )
+            gain_db[str(band)] = float(
+                10 * np.log10(np.mean(np.abs(response[in_octave]) ** 2) + 1e-20)
+            )
+            snr_db[str(band)] = float(10 * np.log10(
+                max(signal_power[band] - noise_power[band], 1e-20)
+                / max(noise_power[band], 1e-20)
+            ))
+        return {
+            "delay": delay,
+            "confidence": confidence,
+            "peak_to_noise_db": peak_to_noise,
+            "gain_db": gain_db,
+            "snr_db": snr_db
+        }
+
+    def __band_powers(self, samples: np.ndarray) -> dict[int, float]:
+        """Measure the mean power spectral density of samples in each band
+
+        Parameters
+        ----------
+        samples: The samples to measure
+
+        Returns
+        -------
+        A dictionary mapping band centre frequencies to power
+        """
+        window = np.hanning(len(samples))
+        density = np.abs(np.fft.rfft(samples * window)) ** 2 / np.sum(window ** 2)
+        frequencies = np.fft.rfftfreq(len(samples), 1 / self.__sample_rate)
+        powers = {}
+        for band in self.__bands:
+            in_octave = (
+                (frequencies >= band / np.sqrt(2)) & (frequencies < band * np.sqrt(2))
+            )
+            powers[band] = float(np.mean(density[in_octave])) if in_octave.any() else 0.0
+        return powers
+
+    def __find_delay(
+        self, response: np.ndarray, size: int
+    ) -> tuple[float, float, float]:
+        """Find the delay of the impulse response's peak to a fraction of a
+        frame, and how clearly it stands out
+
+        Parameters
+        ----------
+        response: The path's frequency response
+        size: The transform size of the response
+
+        Returns
+        -------
+        The delay in seconds, the confidence between 0 and 1, and the peak to
+            noise ratio in dB
+        """
+        impulse = np.abs(np.fft.irfft(response, size))
+        search = impulse[:self.__max_delay_length + 1]
+        peak_index = int(np.argmax(search))
+        peak = search[peak_index]
+
+        # Away from the main lobe, the largest response is a reflection,
+        # ringing or noise which could have been mistaken for the peak
+        guard = int(0.002 * self.__sample_rate)
+        outside = np.concatenate((
+            search[:max(peak_index - guard, 0)], search[peak_index + guard + 1:]
+        ))
+        if not peak or not outside.size:
+            return peak_index / self.__sample_rate, 0.0, 0.0
+        confidence = float(np.clip(1 - outside.max() / peak, 0, 1))
+        peak_to_noise = float(
+            20 * np.log10(peak / (np.sqrt(np.mean(outside ** 2)) + 1e-20))
+        )
+
+        # Interpolate the band-limited response around the peak by
+        # oversampling it in the frequency domain
+        oversampled_size = size * self.__oversampling
+        oversampled = np.abs(np.fft.irfft(response, oversampled_size)) * self.__oversampling
+        # A delay near zero has its neighbourhood wrap around to negative lags
+        centre = peak_index * self.__oversampling
+        offsets = np.arange(-self.__oversampling, self.__oversampling + 1)
+        neighbourhood = oversampled.take(centre + offsets, mode="wrap")
+        fine_index = centre + int(offsets[np.argmax(neighbourhood)])
+        before, at, after = oversampled.take(
+            np.arange(fine_index - 1, fine_index + 2), mode="wrap"
+        )
+        curvature = before - 2 * at + after
+        vertex = 0.5 * (before - after) / curvature if curvature else 0.0
+        delay = (fine_index + vertex) / self.__oversampling / self.__sample_rate
+        return float(delay), confidence, peak_to_noise
+
+
+def print_results(results: dict) -> None:
+    """Print a calibration's summary
+
+    Parameters
+    ----------
+    results: The calibration's summary
+    """
+    print(f"Delay: {results['delay'] * 1000:.3f} ms", end="")
+    print(f" (spread {results['delay_spread'] * 1000:.3f} ms)")
+    print(f"Confidence: {results['confidence']:.3f}")
+    print("Band (Hz)   Gain (dB)   SNR (dB)")
+    for band, gain in results["gain_db"].items():
+        print(f"{band:>9} {gain:>11.1f} {results['snr_db'][band]:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--audio-channels", type=int, default=2)
+    parser.add_argument("--sweep-duration", type=float, default=1.0)
+    parser.add_argument("--max-delay", type=float, default=0.5)
+    parser.add_argument("--level", type=float, default=0.5)
+    parser.add_argument("--capture-channel", type=int, default=0)
+    parser.add_argument("--output-device-index", type=int, default=None)
+    parser.add_argument("--input-device-index", type=int, default=None)
+    parser.add_argument(
+        "--simulate-delay", type=float, default=None,
+        help="calibrate a simulated path with this delay in seconds"
+    )
+    parser.add_argument("--noise-level", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument(
+        "--expect-delay", type=float, default=None,
+        help="exit with an error if the delay differs from this by more than "
+            "the tolerance"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.001)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    args = parser.parse_args()
+
+    hardware_channel = None
+    if args.simulate_delay is not None:
+        channel: ICalibrationChannel = SimulatedChannel(
+            args.simulate_delay,
+            args.sample_rate,
+            args.audio_channels,
+            noise_level=args.noise_level,
+            seed=args.seed
+        )
+    else:
+        from calibrationchannels import HardwareChannel  # Requires PyAudio
+        hardware_channel = HardwareChannel(
+            args.output_device_index,
+            args.input_device_index,
+            args.sample_rate,
+            args.audio_channels
+        )
+        channel = hardware_channel
+    calibrator = LatencyCalibrator(
+        channel,
+        args.sample_rate,
+        args.audio_channels,
+        args.sweep_duration,
+        max_delay=args.max_delay,
+        level=args.level,
+        capture_channel=args.capture_channel
+    )
+    results = calibrator.calibrate(args.runs)
+    if hardware_channel:
+        hardware_channel.close()
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            dump(results, json_file, indent=2)
+
+    failures = []
+    if results["confidence"] < args.min_confidence:
+        failures.append(f"confidence {results['confidence']:.3f} is too low")
+    if (
+        args.expect_delay is not None
+        and abs(results["delay"] - args.expect_delay) > args.tolerance
+    ):
+        failures.append(
+            f"delay {results['delay'] * 1000:.3f} ms is not within "
+            f"{args.tolerance * 1000:.3f} ms of {args.expect_delay * 1000:.3f} ms"
+        )
+    for failure in failures:
+        print("ERROR: Calibration", failure)
+    sys_exit(1 if failures else 0)
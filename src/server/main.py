@@ -11,25 +11,47 @@ print_help: Print help text
 # pylint: disable=redefined-outer-name
 
 
+from contextlib import ExitStack
 from winsound import Beep
 
 from pynput.keyboard import Key, KeyCode, Listener
 from serial import Serial  # type: ignore[import-untyped]
 
+from audio_mixer import AudioMixer, MixerInput
+from audio_monitor import AudioMonitor
 from audio_streamer import AudioStreamer
 from asyncmassclients import SerialMassClient
 from channel_transmitter import ChannelTransmitter
+from coordination import CoordinationClient
+from realtime import RealtimeProfile
 from singleton_type import Singleton
+from tracer import TRACER
+from zones import Zone, ZoneController
 
 
 BAUD = 9600  # Baud rate for serial communication
 SERIAL_TIMEOUT_SECONDS = 1 # Timeout for serial communication (read and write)
+HEARTBEAT_INTERVAL_SECONDS: float | None = 2  # Interval between health checks of each idle transmitter, or None to disable them
 TRANSMISSION_CHANNELS_UPPER_BOUND = 9 # Maximum number of transmission channels
+TRACE_FILE: str | None = None  # Chrome trace file to record thread timelines to, or None to disable tracing
+AUTO_TUNE_AUDIO = False  # Tune the audio chunk size to the lowest latency the devices sustain
+MONITOR_AUDIO = False  # Warn of outgoing audio which will clip or cause visible flicker
+AUTO_CORRECT_AUDIO = False  # Attenuate clipping and high-pass flickering audio when monitored
+REALTIME_AUDIO = False  # Give audio threads a dedicated CPU and real-time priority (Linux), and hold off garbage collection while streaming
+ZONES: dict[str, tuple[list[str], str]] = {}  # Zone names mapped to their transmitter ports and audio output device, keyed with F1-F12 in order; each zone opens its own stream on the input device, which must allow several opens (as shared-mode Windows devices do)
+ZONE_KEYS = [getattr(Key, f"f{i}") for i in range(1, 13)]  # Push-to-talk keys for zones
+MIXER_INPUTS: dict[str, tuple[str, float]] = {}  # Mixer input names mapped to their input device and gain, keyed with MIXER_KEYS in order; the first sets the mix's clock
+MIXER_KEYS = [KeyCode.from_char(char) for char in "asdfgjkl"]  # Push-to-talk keys for mixer inputs
+COORDINATE_SERVERS = False  # Share transmitters with other servers on this machine, standing by while another is primary
 
 
 class KeyboardCallbacks(Singleton):
     """A class for handling keyboard input callbacks
 
+    The transmitters' health checks are paused from the key press starting a
+    transmission until the key release ending the last one, so pings never
+    interleave with a push-to-talk session.
+
     Methods
     -------
     on_press: Handle key press events
@@ -39,16 +61,31 @@ class KeyboardCallbacks(Singleton):
     def __init__(
         self,
         audio_streamer: AudioStreamer,
-        channel_transmitter: ChannelTransmitter
+        channel_transmitter: ChannelTransmitter,
+        zone_controller: ZoneController | None = None,
+        mixer: AudioMixer | None = None
     ) -> None:
         """Parameters
         ----------
         audio_streamer: The audio streamer to control
         channel_transmitter: The channel transmitter to control
+        zone_controller (Optional): The zone controller to control
+        mixer (Optional): The audio streamer's mixer, whose inputs to control
         """
         self.__audio_streamer = audio_streamer
         self.__channel_transmitter = channel_transmitter
+        self.__heartbeat_pause = ExitStack()
+        self.__heartbeat_paused = False
         self.__key_states: dict[Key, bool] = {}
+        self.__mixer = mixer
+        self.__mixer_keys: dict[KeyCode, str] = {}
+        if mixer:
+            self.__mixer_keys = dict(zip(MIXER_KEYS, mixer.inputs))
+        self.__selected_zone: Zone | None = None
+        self.__zone_keys: dict[Key, str] = {}
+        if zone_controller:
+            self.__zone_keys = dict(zip(ZONE_KEYS, zone_controller.zones))
+        self.__zone_controller = zone_controller
 
     def on_press(self, key: Key) -> bool:
         """Handle key press events
@@ -61,28 +98,48 @@ class KeyboardCallbacks(Singleton):
         -------
         Whether the key event listener should be closed
         """
-        if not self.__key_states.get(key, False):
-            for i in range(10):  # Set channel 0-9
-                if key == KeyCode.from_char(str(i)):
-                    self.__channel_transmitter.channel = i
-                    print("Channel set to", self.__channel_transmitter.channel)
-                    break
-            if key == Key.esc:  # Exit program
-                return False
-            elif key == Key.space:  # Start transmitting
-                if self.__channel_transmitter.transmit_channel():
-                    self.__audio_streamer.start_streaming()
-                else:  # Alert if channel transmission failed
-                    for _ in range(3):
-                        Beep(1000, 100)
-            elif key == KeyCode.from_char("r"):  # Refresh ports
-                self.__channel_transmitter.refresh_transmitters()
-            elif key == KeyCode.from_char("p"):  # Print ports
-                self.__channel_transmitter.print_transmitters()
-            elif key == KeyCode.from_char("h"):  # Print help
-                print_help()
-        self.__key_states[key] = True
-        return True
+        with TRACER.span("on_press %s", "keyboard", key):
+            if not self.__key_states.get(key, False):
+                for i in range(10):  # Set channel 0-9
+                    if key == KeyCode.from_char(str(i)):
+                        if self.__selected_zone:
+                            self.__selected_zone.channel = i
+                            print(
+                                f"Zone {self.__selected_zone.name} channel set to",
+                                self.__selected_zone.channel
+                            )
+                            break
+                        self.__channel_transmitter.channel = i
+                        print("Channel set to", self.__channel_transmitter.channel)
+                        break
+                if key == Key.esc:  # Exit program
+                    return False
+                elif key == Key.space:  # Start transmitting
+                    self.__pause_heartbeat()
+                    self.__start_mixer_inputs(list(self.__mixer_keys.values()))
+                elif key in self.__mixer_keys:  # Start transmitting on a mixer input
+                    self.__pause_heartbeat()
+                    self.__start_mixer_inputs([self.__mixer_keys[key]])
+                elif key == KeyCode.from_char("r"):  # Refresh ports
+                    self.__channel_transmitter.refresh_transmitters()
+                elif key == KeyCode.from_char("p"):  # Print ports
+                    self.__channel_transmitter.print_transmitters()
+                elif key == KeyCode.from_char("h"):  # Print help
+                    print_help()
+                elif key == KeyCode.from_char("t") and TRACER.enabled:  # Dump trace
+                    TRACER.dump()
+                elif key == KeyCode.from_char("z") and self.__zone_controller:  # Select zone
+                    self.__select_next_zone()
+                elif key in self.__zone_keys:  # Start transmitting on a zone
+                    self.__pause_heartbeat()
+                    if not self.__zone_controller.start_transmission(  # type: ignore
+                        [self.__zone_keys[key]]
+                    )[self.__zone_keys[key]]:
+                        self.__resume_heartbeat()
+                        for _ in range(3):  # Alert if channel transmission failed
+                            Beep(1000, 100)
+            self.__key_states[key] = True
+            return True
 
     def on_release(self, key: Key) -> bool:
         """Handle key release events
@@ -97,10 +154,99 @@ class KeyboardCallbacks(Singleton):
         """
         if self.__key_states.get(key, True):
             if key == Key.space:  # Stop transmitting
-                self.__audio_streamer.stop_streaming()
+                with TRACER.span("on_release space", "keyboard"):
+                    self.__stop_mixer_inputs([
+                        name for mixer_key, name in self.__mixer_keys.items()
+                        if not self.__key_states.get(mixer_key, False)
+                    ])
+            elif key in self.__mixer_keys:  # Stop transmitting on a mixer input
+                if not self.__key_states.get(Key.space, False):
+                    self.__stop_mixer_inputs([self.__mixer_keys[key]])
+            elif key in self.__zone_keys:  # Stop transmitting on a zone
+                self.__zone_controller.stop_transmission(  # type: ignore
+                    [self.__zone_keys[key]]
+                )
+                self.__resume_heartbeat()
         self.__key_states[key] = False
         return True
 
+    def __start_mixer_inputs(self, names: list[str]) -> None:
+        """Add inputs to the mix, transmitting the channel and starting
+        streaming if not already streaming
+
+        Parameters
+        ----------
+        names: The names of the mixer inputs to add, if there is a mixer
+        """
+        if not self.__audio_streamer.streaming:
+            if not self.__channel_transmitter.transmit_channel(
+                self.__zone_controller.transmitting_ports
+                if self.__zone_controller else ()
+            ):
+                self.__resume_heartbeat()
+                for _ in range(3):  # Alert if channel transmission failed
+                    Beep(1000, 100)
+                return
+            self.__audio_streamer.start_streaming()
+        if self.__mixer:
+            for name in names:
+                self.__mixer.start_input(name)
+
+    def __stop_mixer_inputs(self, names: list[str]) -> None:
+        """Remove inputs from the mix, stopping streaming once none remain
+
+        Parameters
+        ----------
+        names: The names of the mixer inputs to remove, if there is a mixer
+        """
+        if self.__mixer:
+            for name in names:
+                self.__mixer.stop_input(name)
+            if self.__mixer.active_inputs:
+                return
+        self.__audio_streamer.stop_streaming()
+        self.__resume_heartbeat()
+
+    def __pause_heartbeat(self) -> None:
+        """Pause the transmitters' health checks for the length of a
+        transmission, if not already paused
+        """
+        if not self.__heartbeat_paused:
+            self.__heartbeat_pause.enter_context(
+                self.__channel_transmitter.pause_heartbeat()
+            )
+            self.__heartbeat_paused = True
+
+    def __resume_heartbeat(self) -> None:
+        """Resume the transmitters' health checks once nothing is
+        transmitting
+        """
+        if self.__audio_streamer.streaming or self.__zone_controller and any(
+            zone.transmitting for zone in self.__zone_controller.zones.values()
+        ):
+            return
+        self.__heartbeat_pause.close()
+        self.__heartbeat_paused = False
+
+    def __select_next_zone(self) -> None:
+        """Cycle the zone whose channel is set by the number keys, ending
+        with no zone selected to set the global channel again
+        """
+        zones = list(self.__zone_controller.zones.values())  # type: ignore
+        if self.__selected_zone is None:
+            self.__selected_zone = zones[0]
+        elif self.__selected_zone is zones[-1]:
+            self.__selected_zone = None
+        else:
+            self.__selected_zone = zones[zones.index(self.__selected_zone) + 1]
+        if self.__selected_zone:
+            print(
+                f"Zone {self.__selected_zone.name} selected on channel",
+                self.__selected_zone.channel
+            )
+        else:
+            print("No zone selected")
+
 
 def print_help() -> None:
     """Print help text"""
@@ -109,6 +255,10 @@ def print_help() -> None:
         "\"r\" to refresh ports,",
         "\"p\" to print ports,",
         "\"h\" to print help,",
+        "\"t\" to write a thread timeline trace (if tracing is enabled),",
+        "\"z\" to select the zone whose channel 0-9 sets (if zones are configured),",
+        "\"F1\"-\"F12\" to start/stop transmitting on each zone,",
+        "\"a\"-\"l\" to start/stop transmitting on each mixer input (if inputs are configured),",
         "\"esc\" to exit the program\n",
         sep="\n"
     )
@@ -116,11 +266,27 @@ def print_help() -> None:
 
 if __name__ == "__main__":
     print("Initializing...")
+    if TRACE_FILE:
+        TRACER.enable(dump_path=TRACE_FILE)
     print_help()
+    realtime = RealtimeProfile() if REALTIME_AUDIO else None
+    if realtime:
+        realtime.reserve_cpus()  # Before starting any other threads, so they inherit it
+    mixer = None
+    if MIXER_INPUTS:
+        mixer = AudioMixer([
+            MixerInput(name, device_name, gain)
+            for name, (device_name, gain) in MIXER_INPUTS.items()
+        ])
     audio_streamer = AudioStreamer(
         input_device_name="Microphone Array",
-        output_device_name="Headphones"
+        output_device_name="Headphones",
+        auto_tune=AUTO_TUNE_AUDIO,
+        monitor=AudioMonitor(auto_correct=AUTO_CORRECT_AUDIO) if MONITOR_AUDIO else None,
+        mixer=mixer,
+        realtime=realtime
     )
+    coordinator = CoordinationClient() if COORDINATE_SERVERS else None
     channel_transmitter = ChannelTransmitter(
         TRANSMISSION_CHANNELS_UPPER_BOUND,
         SerialMassClient(
@@ -128,10 +294,40 @@ if __name__ == "__main__":
                 baudrate=BAUD,
                 timeout=SERIAL_TIMEOUT_SECONDS,
                 write_timeout=SERIAL_TIMEOUT_SECONDS
-            )
+            ),
+            heartbeat_interval=HEARTBEAT_INTERVAL_SECONDS,
+            coordinator=coordinator
+        ),
+        coordinator
+    )
+    zone_controller = None
+    if ZONES:
+        zone_controller = ZoneController(
+            channel_transmitter,
+            [
+                Zone(
+                    name,
+                    port_names,
+                    audio_streamer=AudioStreamer(
+                        # Opened once per zone, alongside the global streamer
+                        input_device_name="Microphone Array",
+                        output_device_name=output_device_name,
+                        auto_tune=AUTO_TUNE_AUDIO,
+                        monitor=AudioMonitor(
+                            auto_correct=AUTO_CORRECT_AUDIO
+                        ) if MONITOR_AUDIO else None,
+                        realtime=realtime
+                    )
+                )
+                for name, (port_names, output_device_name) in ZONES.items()
+            ],
+            coordinator
         )
+        for zone in zone_controller.zones.values():
+            zone.audio_streamer.start()  # type: ignore
+    keyboard_callbacks = KeyboardCallbacks(
+        audio_streamer, channel_transmitter, zone_controller, mixer
     )
-    keyboard_callbacks = KeyboardCallbacks(audio_streamer, channel_transmitter)
     audio_streamer.start()
     with Listener(
         on_press=keyboard_callbacks.on_press,  # type: ignore
@@ -140,3 +336,7 @@ if __name__ == "__main__":
         listener.join()
     audio_streamer.close()
     audio_streamer.join()
+    if zone_controller:
+        zone_controller.close()
+    if coordinator:
+        coordinator.close()
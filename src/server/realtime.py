@@ -0,0 +1,207 @@
+""" A real-time profile for audio threads, dedicating CPUs, requesting
+    real-time scheduling and holding off the garbage collector while
+    streaming, with measurement of the resulting loop jitter
+
+Exports
+-------
+jitter_percentiles: Summarize a loop's timing errors as percentiles
+RealtimeProfile: A real-time profile for audio threads
+"""
+
+
+import gc
+import os
+import sys
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Iterator
+
+import numpy as np
+
+
+_POLICY_NAMES = {
+    getattr(os, name): name
+    for name in ("SCHED_OTHER", "SCHED_BATCH", "SCHED_IDLE", "SCHED_FIFO", "SCHED_RR")
+    if hasattr(os, name)
+}
+
+_streaming_lock = Lock()
+_streaming_holds = 0
+_saved_switch_interval = 0.005
+
+
+def jitter_percentiles(errors: list[float] | np.ndarray) -> dict[str, float]:
+    """Summarize a loop's timing errors as percentiles
+
+    Parameters
+    ----------
+    errors: The seconds by which each iteration deviated from its period
+
+    Returns
+    -------
+    The median, 99th and 99.9th percentile and maximum absolute error in
+    seconds, all zero if there were no errors
+    """
+    if not len(errors):
+        return dict.fromkeys(("jitter_p50", "jitter_p99", "jitter_p999", "jitter_max"), 0.0)
+    magnitudes = np.abs(np.asarray(errors))
+    p50, p99, p999 = np.percentile(magnitudes, (50, 99, 99.9))
+    return {
+        "jitter_p50": float(p50),
+        "jitter_p99": float(p99),
+        "jitter_p999": float(p999),
+        "jitter_max": float(magnitudes.max())
+    }
+
+
+class RealtimeProfile:
+    """A real-time profile for audio threads
+
+    Applied from an audio thread, the thread is pinned to dedicated CPUs and
+    given a real-time scheduling policy, falling back to round-robin, then
+    to normal scheduling, where not permitted. While any audio thread is
+    streaming, the garbage collector is frozen and disabled, so collections
+    triggered by other threads cannot stall it, and the interpreter's switch
+    interval is shortened, so a woken audio thread waits less for the GIL.
+    Scheduling is only available on Linux; elsewhere the garbage collector
+    and switch interval are still managed.
+
+    Attributes
+    ----------
+    cpus: The CPUs dedicated to audio threads, or None to leave affinity
+        unchanged
+    status: The scheduling achieved by the most recent application
+
+    Methods
+    -------
+    apply: Apply the profile to the calling thread
+    reserve_cpus: Move the calling thread, and threads it later starts, off
+        the dedicated CPUs
+    streaming: Hold the garbage collector and switch interval tuned while
+        streaming
+    """
+
+    def __init__(
+        self,
+        cpus: set[int] | None = None,
+        policy: str = "fifo",
+        priority: int = 10,
+        freeze_gc: bool = True,
+        switch_interval: float | None = 0.0005
+    ) -> None:
+        """Parameters
+        ----------
+        cpus (Optional): The CPUs to dedicate to audio threads, or None for
+            the last CPU the process may run on, if it may run on more than
+            one
+        policy (Optional): The real-time scheduling policy to request, "fifo"
+            or "rr"
+        priority (Optional): The real-time priority to request, from 1 to 99
+        freeze_gc (Optional): Whether to freeze and disable the garbage
+            collector while streaming
+        switch_interval (Optional): The interpreter's switch interval in
+            seconds while streaming, or None to leave it unchanged
+
+        Raises
+        ------
+        ValueError: If the policy is not "fifo" or "rr"
+        """
+        if policy not in ("fifo", "rr"):
+            raise ValueError(f"Unknown real-time scheduling policy '{policy}'")
+        self.cpus = cpus
+        if cpus is None and hasattr(os, "sched_getaffinity"):
+            allowed = os.sched_getaffinity(0)
+            if len(allowed) > 1:
+                self.cpus = {max(allowed)}
+        self.status: dict[str, Any] = {}
+        self.__freeze_gc = freeze_gc
+        self.__policies = ["SCHED_FIFO", "SCHED_RR"]
+        if policy == "rr":
+            self.__policies.reverse()
+        self.__priority = priority
+        self.__switch_interval = switch_interval
+
+    def apply(self) -> dict[str, Any]:
+        """Apply the profile to the calling thread, falling back gracefully
+        where not permitted
+
+        Returns
+        -------
+        The scheduling achieved: the policy's name, the real-time priority,
+        and the CPUs the thread may run on (or None if unknown)
+        """
+        cpus = None
+        if hasattr(os, "sched_setaffinity"):
+            if self.cpus:
+                try:
+                    os.sched_setaffinity(0, self.cpus)
+                except OSError as error:
+                    print(f"WARNING: Could not pin audio thread to CPUs {sorted(self.cpus)}: {error}")
+            cpus = sorted(os.sched_getaffinity(0))
+        policy = "unsupported"
+        priority = 0
+        if hasattr(os, "sched_setscheduler"):
+            for name in self.__policies:
+                try:
+                    os.sched_setscheduler(
+                        0, getattr(os, name), os.sched_param(self.__priority)
+                    )
+                    break
+                except OSError as error:
+                    failure = error
+            else:
+                print(
+                    "WARNING: Real-time scheduling is not permitted",
+                    f"({failure}), so the audio thread uses normal scheduling"
+                )
+            policy = _POLICY_NAMES.get(os.sched_getscheduler(0), "unknown")
+            priority = os.sched_getparam(0).sched_priority
+        self.status = {"policy": policy, "priority": priority, "cpus": cpus}
+        return self.status
+
+    def reserve_cpus(self) -> None:
+        """Move the calling thread, and threads it later starts, off the
+        dedicated CPUs, if any others remain
+        """
+        if not self.cpus or not hasattr(os, "sched_setaffinity"):
+            return
+        others = os.sched_getaffinity(0) - self.cpus
+        if not others:
+            print("WARNING: No CPUs remain to reserve CPUs for audio threads")
+            return
+        os.sched_setaffinity(0, others)
+
+    @contextmanager
+    def streaming(self) -> Iterator[None]:
+        """Hold the garbage collector frozen and disabled, and the switch
+        interval shortened, while any audio thread is streaming
+
+        Objects existing when streaming starts are frozen out of collections,
+        and garbage cycles created while streaming are collected once it
+        stops.
+
+        Returns
+        -------
+        A context manager holding the tuning while streaming
+        """
+        global _streaming_holds, _saved_switch_interval  # pylint: disable=global-statement
+        with _streaming_lock:
+            if not _streaming_holds:
+                if self.__freeze_gc:
+                    gc.disable()
+                    gc.freeze()
+                if self.__switch_interval:
+                    _saved_switch_interval = sys.getswitchinterval()
+                    sys.setswitchinterval(self.__switch_interval)
+            _streaming_holds += 1
+        try:
+            yield
+        finally:
+            with _streaming_lock:
+                _streaming_holds -= 1
+                if not _streaming_holds:
+                    if self.__freeze_gc:
+                        gc.unfreeze()
+                        gc.enable()
+                    if self.__switch_interval:
+                        sys.setswitchinterval(_saved_switch_interval)
@@ -0,0 +1,232 @@
+""" An opt-in, low-overhead tracer recording begin/end spans across threads for
+    viewing as a Chrome/Perfetto timeline
+
+Exports
+-------
+TRACER: The process-wide tracer, disabled until enabled
+Tracer: A tracer recording begin/end spans into a preallocated ring buffer
+"""
+
+
+from array import array
+from atexit import register, unregister
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from functools import wraps
+from itertools import count
+from json import dump
+from os import getpid
+from threading import current_thread, get_native_id
+from time import perf_counter_ns
+from typing import Any, Callable, Iterator, TypeVar
+
+
+_BEGIN = ord("B")
+_END = ord("E")
+_NULL_SPAN = nullcontext()
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+
+class Tracer:
+    """A tracer recording begin/end spans into a preallocated ring buffer
+
+    Recording takes no lock, so once the buffer is full the oldest events are
+    overwritten and, rarely, concurrent writers may interleave in a slot.
+    Span names may be %-style format strings with arguments, which are only
+    formatted while recording, so tracing costs one check while disabled.
+
+    Attributes
+    ----------
+    enabled: Whether events are currently being recorded
+
+    Methods
+    -------
+    begin: Record the beginning of a span on the calling thread
+    disable: Stop recording events
+    dump: Write recorded events to a Chrome/Perfetto trace file
+    enable: Start recording events into a fresh ring buffer
+    end: Record the end of a span on the calling thread
+    span: Get a context manager recording a span around its body
+    traced: Get a decorator recording a span around each call of a function
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.__capacity = 0
+        self.__categories: list[str | None] = []
+        self.__counter = count()
+        self.__names: list[str | None] = []
+        self.__phases = bytearray()
+        self.__thread_ids = array("q")
+        self.__thread_names: dict[int, str] = {}
+        self.__timestamps = array("q")
+        self.__dump_path: str | None = None
+
+    def begin(self, name: str, category: str = "", *args: Any) -> None:
+        """Record the beginning of a span on the calling thread
+
+        Parameters
+        ----------
+        name: The name of the span
+        category (Optional): The category of the span
+        args (Optional): The arguments formatted into the name
+        """
+        if self.enabled:
+            self.__record(_BEGIN, name % args if args else name, category)
+
+    def disable(self) -> None:
+        """Stop recording events, keeping those already recorded"""
+        self.enabled = False
+
+    def dump(self, path: str | None = None) -> None:
+        """Write recorded events to a Chrome/Perfetto trace file
+
+        Parameters
+        ----------
+        path (Optional): The path of the trace file, or None to use the path
+            given when enabled
+        """
+        path = path or self.__dump_path
+        if not path:
+            print("ERROR: No trace file path given")
+            return
+        process_id = getpid()
+        events: list[dict] = [
+            {
+                "name": "thread_name", "ph": "M", "pid": process_id,
+                "tid": thread_id, "args": {"name": thread_name}
+            }
+            for thread_id, thread_name in self.__thread_names.items()
+        ]
+        slots = sorted(
+            (slot for slot in range(self.__capacity) if self.__names[slot] is not None),
+            key=self.__timestamps.__getitem__
+        )
+        for slot in slots:
+            events.append({
+                "name": self.__names[slot],
+                "cat": self.__categories[slot],
+                "ph": chr(self.__phases[slot]),
+                "ts": self.__timestamps[slot] / 1000,
+                "pid": process_id,
+                "tid": self.__thread_ids[slot]
+            })
+        with open(path, "w", encoding="utf-8") as trace_file:
+            dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        print(f"Trace of {len(slots)} events written to {path}")
+
+    def enable(self, capacity: int = 65536, dump_path: str | None = None) -> None:
+        """Start recording events into a fresh ring buffer
+
+        Parameters
+        ----------
+        capacity (Optional): The number of events the ring buffer holds
+        dump_path (Optional): The path of the trace file to write on demand
+            and on exit, or None to only write when given a path
+        """
+        self.__capacity = capacity
+        self.__categories = [None] * capacity
+        self.__counter = count()
+        self.__names = [None] * capacity
+        self.__phases = bytearray(capacity)
+        self.__thread_ids = array("q", bytes(8 * capacity))
+        self.__thread_names = {}
+        self.__timestamps = array("q", bytes(8 * capacity))
+        unregister(self.dump)
+        self.__dump_path = dump_path
+        if dump_path:
+            register(self.dump)
+        self.enabled = True
+
+    def end(self, name: str, category: str = "", *args: Any) -> None:
+        """Record the end of a span on the calling thread
+
+        Parameters
+        ----------
+        name: The name of the span
+        category (Optional): The category of the span
+        args (Optional): The arguments formatted into the name
+        """
+        if self.enabled:
+            self.__record(_END, name % args if args else name, category)
+
+    def span(
+        self, name: str, category: str = "", *args: Any
+    ) -> AbstractContextManager:
+        """Get a context manager recording a span around its body
+
+        Parameters
+        ----------
+        name: The name of the span
+        category (Optional): The category of the span
+        args (Optional): The arguments formatted into the name
+
+        Returns
+        -------
+        The context manager, which does nothing while the tracer is disabled
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self.__span(name % args if args else name, category)
+
+    def traced(
+        self, name: str, category: str = ""
+    ) -> Callable[[_Function], _Function]:
+        """Get a decorator recording a span around each call of a function
+
+        Parameters
+        ----------
+        name: The name of the span
+        category (Optional): The category of the span
+
+        Returns
+        -------
+        The decorator
+        """
+        def decorate(function: _Function) -> _Function:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.__span(name, category):
+                    return function(*args, **kwargs)
+            return wrapper  # type: ignore[return-value]
+        return decorate
+
+    def __record(self, phase: int, name: str, category: str) -> None:
+        """Record an event into the next slot of the ring buffer
+
+        Parameters
+        ----------
+        phase: The Chrome trace phase of the event
+        name: The name of the span
+        category: The category of the span
+        """
+        timestamp = perf_counter_ns()
+        thread_id = get_native_id()
+        slot = next(self.__counter) % self.__capacity
+        self.__names[slot] = name
+        self.__categories[slot] = category
+        self.__phases[slot] = phase
+        self.__timestamps[slot] = timestamp
+        self.__thread_ids[slot] = thread_id
+        if thread_id not in self.__thread_names:
+            self.__thread_names[thread_id] = current_thread().name
+
+    @contextmanager
+    def __span(self, name: str, category: str) -> Iterator[None]:
+        """Record a span around the body of a with statement
+
+        Parameters
+        ----------
+        name: The name of the span
+        category: The category of the span
+        """
+        self.__record(_BEGIN, name, category)
+        try:
+            yield
+        finally:
+            self.__record(_END, name, category)
+
+
+TRACER = Tracer()
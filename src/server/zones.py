@@ -0,0 +1,189 @@
+""" Classes for running concurrent talk groups on disjoint zones of LiFi
+    transmitters
+
+Exports
+-------
+Zone: A group of transmitters sharing a channel and an audio output
+ZoneController: A class for starting and stopping transmissions on zones
+    independently
+"""
+
+
+from typing import TYPE_CHECKING
+
+from channel_transmitter import ChannelTransmitter
+from coordination import CoordinationClient
+from singleton_type import Singleton
+
+if TYPE_CHECKING:
+    from audio_streamer import AudioStreamer
+
+
+class Zone:
+    """A group of transmitters sharing a channel and an audio output
+
+    Attributes
+    ----------
+    audio_streamer: The audio streamer feeding the zone's transmitters, or
+        None for a channel-only zone
+    channel: The channel to transmit to the zone
+    name: The name of the zone
+    port_names: The port names of the zone's transmitters
+    transmitting: Whether the zone is currently transmitting
+    """
+
+    def __init__(
+        self,
+        name: str,
+        port_names: list[str],
+        channel: int = 0,
+        audio_streamer: "AudioStreamer | None" = None
+    ) -> None:
+        """Parameters
+        ----------
+        name: The name of the zone
+        port_names: The port names of the zone's transmitters
+        channel (Optional): The channel to transmit to the zone
+        audio_streamer (Optional): The audio streamer feeding the zone's
+            transmitters, or None for a channel-only zone
+        """
+        self.audio_streamer = audio_streamer
+        self.channel = channel
+        self.name = name
+        self.port_names = port_names
+        self.transmitting = False
+
+
+class ZoneController(Singleton):
+    """A class for starting and stopping transmissions on zones independently
+
+    Zones keyed together are sent their channels in a single parallel batch,
+    and a zone keyed while others are transmitting only touches its own
+    transmitters, so concurrent zones cost about the same as a single one.
+    Zones may also be keyed concurrently from several threads. Transmissions
+    to all transmitters should exclude the transmitting ports, so that they
+    do not overwrite the channels of zones mid-transmission.
+    If a coordination client is given, a zone is only keyed once this server
+    holds its floor, so one server at a time transmits on each zone.
+
+    Attributes
+    ----------
+    transmitting_ports: The port names of the transmitters of zones which
+        are transmitting
+    zones: A dictionary mapping zone names to zones
+
+    Methods
+    -------
+    close: Close the audio streamers of all zones
+    start_transmission: Start transmitting on zones
+    stop_transmission: Stop transmitting on zones
+    """
+
+    def __init__(
+        self,
+        channel_transmitter: ChannelTransmitter,
+        zones: list[Zone],
+        coordinator: CoordinationClient | None = None
+    ) -> None:
+        """Parameters
+        ----------
+        channel_transmitter: The channel transmitter connected to the zones'
+            transmitters
+        zones: The zones to control
+        coordinator (Optional): The coordination client through which to
+            request the zones' floors, or None to key zones freely
+
+        Raises
+        ------
+        ValueError: If a transmitter belongs to more than one zone
+        """
+        owners: dict[str, str] = {}
+        for zone in zones:
+            for port_name in zone.port_names:
+                if port_name in owners:
+                    raise ValueError(
+                        f"Port '{port_name}' is in zones '{owners[port_name]}'"
+                        f" and '{zone.name}'"
+                    )
+                owners[port_name] = zone.name
+        self.__channel_transmitter = channel_transmitter
+        self.__coordinator = coordinator
+        self.__zones = {zone.name: zone for zone in zones}
+
+    @property
+    def transmitting_ports(self) -> set[str]:
+        """The port names of the transmitters of zones which are transmitting"""
+        return {
+            port_name
+            for zone in self.__zones.values() if zone.transmitting
+            for port_name in zone.port_names
+        }
+
+    @property
+    def zones(self) -> dict[str, Zone]:
+        """A dictionary mapping zone names to zones"""
+        return self.__zones
+
+    def close(self) -> None:
+        """Close the audio streamers of all zones"""
+        for zone in self.__zones.values():
+            if zone.audio_streamer is not None:
+                zone.audio_streamer.close()
+                zone.audio_streamer.join()
+
+    def start_transmission(self, zone_names: list[str]) -> dict[str, bool]:
+        """Start transmitting on zones, sending each its channel before
+        streaming its audio
+
+        Parameters
+        ----------
+        zone_names: The names of the zones to start transmitting on
+
+        Returns
+        -------
+        A dictionary mapping each zone name to whether it is transmitting
+        """
+        zones = [
+            self.__zones[name] for name in zone_names
+            if not self.__zones[name].transmitting
+        ]
+        if self.__coordinator:
+            floored = []
+            for zone in zones:
+                if self.__coordinator.request_floor(zone.name):
+                    floored.append(zone)
+                else:
+                    print(f"ERROR: Zone {zone.name} is in use by another server")
+            zones = floored
+        channels = {
+            port_name: zone.channel
+            for zone in zones for port_name in zone.port_names
+        }
+        results = {}
+        if channels:
+            results = self.__channel_transmitter.transmit_channels(channels)
+        for zone in zones:
+            if not any(results.get(port_name) for port_name in zone.port_names):
+                print(f"ERROR: Channel transmission failed on zone {zone.name}")
+                if self.__coordinator:
+                    self.__coordinator.release_floor(zone.name)
+                continue
+            zone.transmitting = True
+            if zone.audio_streamer is not None:
+                zone.audio_streamer.start_streaming()
+        return {name: self.__zones[name].transmitting for name in zone_names}
+
+    def stop_transmission(self, zone_names: list[str]) -> None:
+        """Stop transmitting on zones
+
+        Parameters
+        ----------
+        zone_names: The names of the zones to stop transmitting on
+        """
+        for name in zone_names:
+            zone = self.__zones[name]
+            if zone.audio_streamer is not None:
+                zone.audio_streamer.stop_streaming()
+            if zone.transmitting and self.__coordinator:
+                self.__coordinator.release_floor(zone.name)
+            zone.transmitting = False